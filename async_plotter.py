@@ -0,0 +1,237 @@
+"""An asyncio interface to a plotter, so that a drawing can run in an event loop alongside other
+tasks, such as a control API."""
+
+import asyncio
+
+from telemetry import RunRecord
+
+
+class AsyncPlotter:
+    """Drives a :class:`~plotter.Plotter` (or ``BrachioGraph``, etc) from an asyncio event loop.
+
+    Each movement is compiled into a :class:`~plotter.Trajectory`, whose steps are then played one
+    by one, awaiting the plotter's ``scheduler`` between them rather than sleeping - so other tasks
+    can run while the plotter is drawing.
+
+    Between any two steps, a drawing can be paused (with the pen lifted), resumed, or cancelled (by
+    cancelling the task that is running it, in the usual way); the plotter's position is always
+    kept up to date with the last step played.
+    """
+
+    def __init__(self, plotter):
+
+        self.plotter = plotter
+        self.running = asyncio.Event()
+        self.running.set()
+
+        # the trajectory being played, and how many of its steps have been played so far
+        self.trajectory = None
+        self.step = 0
+
+    # ----------------- control -----------------
+
+    def pause(self):
+        """Pauses the drawing (or the next one) before its next step."""
+
+        self.running.clear()
+
+    def resume(self):
+        """Continues a paused drawing."""
+
+        self.running.set()
+
+    @property
+    def paused(self):
+        return not self.running.is_set()
+
+    # ----------------- drawing -----------------
+
+    async def plot_lines(
+        self,
+        lines=[],
+        bounds=None,
+        angular_step=None,
+        wait=None,
+        resolution=None,
+        flip=False,
+        rotate=False,
+        gap=None,
+        fix=None,
+        telemetry=None,
+        textfile=None,
+    ):
+        """As :meth:`Plotter.plot_lines() <plotter.Plotter.plot_lines>`."""
+
+        await self.plot_layers(
+            [{"lines": lines, "repeat": 1}],
+            bounds,
+            angular_step,
+            wait,
+            resolution,
+            flip,
+            rotate,
+            gap=gap,
+            fix=fix,
+            telemetry=telemetry,
+            textfile=textfile,
+        )
+
+    async def plot_layers(
+        self,
+        layers=[],
+        bounds=None,
+        angular_step=None,
+        wait=None,
+        resolution=None,
+        flip=False,
+        rotate=False,
+        fit_lines=None,
+        gap=None,
+        fix=None,
+        telemetry=None,
+        textfile=None,
+    ):
+        """As :meth:`Plotter.plot_layers() <plotter.Plotter.plot_layers>`, without jobs or
+        checkpoints: the lines are checked before anything moves, lines that start within ``gap``
+        of the one before are joined to it, and the drawing is recorded in the plotter's
+        ``last_run``."""
+
+        plotter = self.plotter
+        bounds = bounds or plotter.bounds
+
+        record = plotter.run_record = RunRecord(plotter)
+        record.start()
+        finished = False
+
+        try:
+            layers = plotter.checked_layers(layers, bounds, resolution, fit_lines, fix)
+
+            for layer in layers:
+                for r in range(layer.get("repeat", 1)):
+                    # compiled from wherever the plotter is, in case the last pass was interrupted
+                    trajectory = plotter.compile_lines(
+                        layer["lines"], angular_step, resolution, gap=gap
+                    )
+                    plotter.scheduler.reset()
+                    await self.play(trajectory, wait)
+
+            record.mark("travel")
+            await self.park()
+            finished = True
+
+        finally:
+            record.finish(finished)
+            plotter.run_record, plotter.last_run = None, record
+            if telemetry:
+                record.write(telemetry)
+            if textfile:
+                record.write_textfile(textfile)
+
+    async def xy(self, x=None, y=None, angular_step=None, wait=None, resolution=None, draw=False):
+        """As :meth:`Plotter.xy() <plotter.Plotter.xy>`."""
+
+        plotter = self.plotter
+        x = x if x is not None else plotter.x
+        y = y if y is not None else plotter.y
+
+        if draw:
+            line = [[plotter.x, plotter.y], [x, y]]
+        else:
+            line = [[x, y]]
+
+        trajectory = plotter.compile_lines([line], angular_step, resolution)
+        plotter.scheduler.reset()
+        await self.play(trajectory, wait)
+
+    async def park(self):
+        """As :meth:`Plotter.park() <plotter.Plotter.park>`."""
+
+        plotter = self.plotter
+
+        if plotter.virtual:
+            print("Parking")
+
+        await self.pen("up")
+
+        # a pen-up move is a straight line in servo angles, just as in move_angles()
+        x, y = plotter.angles_to_xy(plotter.servo_1_parked_angle, plotter.servo_2_parked_angle)
+        trajectory = plotter.compile_lines([[[x, y]]])
+        plotter.scheduler.reset()
+        await self.play(trajectory)
+
+    async def play(self, trajectory, wait=None):
+        """Plays a :class:`~plotter.Trajectory` step by step, as :meth:`Plotter.play()
+        <plotter.Plotter.play>` does."""
+
+        plotter = self.plotter
+        wait = wait if wait is not None else plotter.wait
+
+        scheduler = plotter.scheduler
+        set_pulse_widths = plotter.set_pulse_widths
+        turtle = plotter.turtle
+        record = plotter.run_record
+        angles_1, angles_2 = trajectory.angles_1.tolist(), trajectory.angles_2.tolist()
+        pws_1, pws_2 = trajectory.pws_1.tolist(), trajectory.pws_2.tolist()
+        draw = trajectory.draw.tolist()
+        waits = trajectory.waits.tolist() if trajectory.waits is not None else [wait] * len(draw)
+
+        self.trajectory, self.step = trajectory, 0
+
+        if record:
+            record.mark("drawing" if plotter.pen.position == "down" else "travel")
+
+        try:
+            for step in range(len(trajectory)):
+
+                if self.paused:
+                    await self.pen("up")
+                    await self.running.wait()
+                    if record:
+                        record.mark("travel")
+                    scheduler.reset()
+
+                if await self.pen("down" if draw[step] else "up"):
+                    if record:
+                        record.mark("drawing" if draw[step] else "travel")
+                    scheduler.reset()
+
+                await scheduler.wait_async(waits[step])
+
+                if turtle:
+                    turtle.set_angles(angles_1[step], angles_2[step])
+
+                set_pulse_widths(pws_1[step], pws_2[step])
+                self.step = step + 1
+
+        except asyncio.CancelledError:
+            await asyncio.shield(self.pen("up"))
+            raise
+
+        finally:
+            if record:
+                record.mark("compute")
+            plotter.finish_trajectory(trajectory, self.step)
+            self.trajectory = None
+
+    async def pen(self, position):
+        """Moves the pen up or down, if it isn't already. Returns ``True`` if it moved."""
+
+        pen = self.plotter.pen
+
+        if pen.position == position:
+            return False
+
+        move = pen.up if position == "up" else pen.down
+        record = self.plotter.run_record
+        if record:
+            record.mark("pen")
+
+        # easing the pen takes a while, so it's done in another thread - but the turtle has to be
+        # updated in the event loop's thread
+        if self.plotter.virtual:
+            move()
+        else:
+            await asyncio.to_thread(move, turtle=False)
+            pen.show_on_turtle()
+
+        return True
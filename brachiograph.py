@@ -17,6 +17,8 @@ class BrachioGraph(Plotter):
         turtle_coarseness=None,  # a factor in degrees representing servo resolution
         #  ----------------- geometry of the plotter -----------------
         bounds: tuple = [-8, 4, 6, 13],  # the maximum rectangular drawing area
+        servo_1_angle_limits: tuple = None,  # the lowest and highest angles each servo may reach
+        servo_2_angle_limits: tuple = None,
         inner_arm: float = 8,  # the lengths of the arms
         outer_arm: float = 8,
         #  ----------------- naive calculation values -----------------
@@ -38,10 +40,21 @@ class BrachioGraph(Plotter):
         #  ----------------- the pen -----------------
         pw_up: int = 1500,  # pulse-widths for pen up/down
         pw_down: int = 1100,
+        pen_width: float = None,  # the width of the pen's line in mm
+        pen_ease_step: int = 1,  # how the pen is eased up and down; see Pen.ease_pen()
+        pen_ease_duration: float = None,
+        pen_lift_overlap: bool = False,  # move the arms while the pen is still being lifted
         #  ----------------- physical control -----------------
         wait: float = None,  # default wait time between operations
         angular_step: float = None,  # default step of the servos in degrees
         resolution: float = None,  # default resolution of the plotter in cm
+        tolerance: float = None,  # default deviation from straight lines allowed, in cm
+        gap: float = None,  # gaps between lines up to this size in cm are drawn across
+        #  ----------------- motion limits for compiled drawing -----------------
+        servo_1_max_speed: float = None,  # degrees per second; None for steps at a constant rate
+        servo_2_max_speed: float = None,
+        servo_1_max_acceleration: float = None,  # degrees per second per second
+        servo_2_max_acceleration: float = None,
     ):
 
         # set the geometry
@@ -54,6 +67,8 @@ class BrachioGraph(Plotter):
 
         super().__init__(
             bounds=bounds,
+            servo_1_angle_limits=servo_1_angle_limits,
+            servo_2_angle_limits=servo_2_angle_limits,
             servo_1_parked_pw=servo_1_parked_pw,
             servo_2_parked_pw=servo_2_parked_pw,
             servo_1_degree_ms=servo_1_degree_ms,
@@ -68,9 +83,19 @@ class BrachioGraph(Plotter):
             servo_2_angle_pws_bidi=servo_2_angle_pws_bidi,
             pw_up=pw_up,
             pw_down=pw_down,
+            pen_width=pen_width,
+            pen_ease_step=pen_ease_step,
+            pen_ease_duration=pen_ease_duration,
+            pen_lift_overlap=pen_lift_overlap,
             wait=wait,
             angular_step=angular_step,
             resolution=resolution,
+            tolerance=tolerance,
+            gap=gap,
+            servo_1_max_speed=servo_1_max_speed,
+            servo_2_max_speed=servo_2_max_speed,
+            servo_1_max_acceleration=servo_1_max_acceleration,
+            servo_2_max_acceleration=servo_2_max_acceleration,
             virtual=virtual,
             turtle=turtle,
             turtle_coarseness=turtle_coarseness,
@@ -139,6 +164,40 @@ class BrachioGraph(Plotter):
 
         return (math.degrees(shoulder_motor_angle), math.degrees(elbow_motor_angle))
 
+    def xy_to_angles_array(self, x, y, strict=True):
+        """Return arrays of the servo angles required to reach arrays of x/y positions (``nan``
+        for those that can't be reached, unless ``strict``)."""
+
+        x, y = numpy.asarray(x, dtype=float), numpy.asarray(y, dtype=float)
+        hypotenuse = numpy.hypot(x, y)
+
+        too_far = hypotenuse > self.inner_arm + self.outer_arm
+        if strict and too_far.any():
+            raise Exception(
+                f"Cannot reach {hypotenuse[too_far][0]}; total arm length is {self.inner_arm + self.outer_arm}"
+            )
+
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+            hypotenuse_angle = numpy.arcsin(x / hypotenuse)
+
+            inner_angle = numpy.arccos(
+                (hypotenuse**2 + self.inner_arm**2 - self.outer_arm**2)
+                / (2 * hypotenuse * self.inner_arm)
+            )
+            outer_angle = numpy.arccos(
+                (self.inner_arm**2 + self.outer_arm**2 - hypotenuse**2)
+                / (2 * self.inner_arm * self.outer_arm)
+            )
+
+        shoulder_motor_angle = hypotenuse_angle - inner_angle
+        elbow_motor_angle = numpy.pi - outer_angle
+
+        unreachable = numpy.isnan(shoulder_motor_angle) | numpy.isnan(elbow_motor_angle)
+        if strict and unreachable.any():
+            raise ValueError(f"Cannot reach {x[unreachable][0]}, {y[unreachable][0]}")
+
+        return (numpy.degrees(shoulder_motor_angle), numpy.degrees(elbow_motor_angle))
+
     def angles_to_xy(self, shoulder_motor_angle, elbow_motor_angle):
         """Return the x/y co-ordinates represented by a pair of servo angles."""
 
@@ -166,9 +225,30 @@ class BrachioGraph(Plotter):
 
         return (x, y)
 
+    def angles_to_xy_array(self, shoulder_motor_angles, elbow_motor_angles):
+        """Return arrays of the x/y co-ordinates represented by arrays of servo angles."""
+
+        elbow_motor_angles = numpy.radians(elbow_motor_angles)
+        shoulder_motor_angles = numpy.radians(shoulder_motor_angles)
+
+        hypotenuse = numpy.sqrt(
+            self.inner_arm**2
+            + self.outer_arm**2
+            - 2 * self.inner_arm * self.outer_arm * numpy.cos(numpy.pi - elbow_motor_angles)
+        )
+        base_angle = numpy.arccos(
+            (hypotenuse**2 + self.inner_arm**2 - self.outer_arm**2)
+            / (2 * hypotenuse * self.inner_arm)
+        )
+        inner_angle = base_angle + shoulder_motor_angles
+
+        return (numpy.sin(inner_angle) * hypotenuse, numpy.cos(inner_angle) * hypotenuse)
+
     # ----------------- reporting methods -----------------
 
     def report(self):
+        """Prints the servos' current positions, and the range of movement recorded since
+        ``reset_report()``."""
 
         print(f"               -----------------|-----------------")
         print(f"               Servo 1          |  Servo 2        ")
@@ -192,37 +272,71 @@ class BrachioGraph(Plotter):
         print(f"               min   max   mid  |  min   max   mid")
         print(f"               -----------------|-----------------")
 
-        if (
-            self.angles_used_1
-            and self.angles_used_2
-            and self.pulse_widths_used_1
-            and self.pulse_widths_used_2
-        ):
+        movement = self.movement
+        ranges = movement and [movement.range(column) for column in movement.columns]
 
-            min1 = min(self.pulse_widths_used_1)
-            max1 = max(self.pulse_widths_used_1)
-            mid1 = (min1 + max1) / 2
-            min2 = min(self.pulse_widths_used_2)
-            max2 = max(self.pulse_widths_used_2)
-            mid2 = (min2 + max2) / 2
+        if ranges and all(ranges):
 
-            print(
-                f"pulse-widths  {min1:>4.0f}  {max1:>4.0f}  {mid1:>4.0f}  | {min2:>4.0f}  {max2:>4.0f}  {mid2:>4.0f}"
-            )
+            angles_1, pws_1, angles_2, pws_2 = ranges
 
-            min1 = min(self.angles_used_1)
-            max1 = max(self.angles_used_1)
-            mid1 = (min1 + max1) / 2
-            min2 = min(self.angles_used_2)
-            max2 = max(self.angles_used_2)
-            mid2 = (min2 + max2) / 2
+            for label, (min1, max1), (min2, max2) in (
+                ("pulse-widths", pws_1, pws_2),
+                ("      angles", angles_1, angles_2),
+            ):
+                mid1 = (min1 + max1) / 2
+                mid2 = (min2 + max2) / 2
 
-            print(
-                f"      angles  {min1:>4.0f}  {max1:>4.0f}  {mid1:>4.0f}  | {min2:>4.0f}  {max2:>4.0f}  {mid2:>4.0f}"
-            )
+                print(
+                    f"{label}  {min1:>4.0f}  {max1:>4.0f}  {mid1:>4.0f}  | {min2:>4.0f}  {max2:>4.0f}  {mid2:>4.0f}"
+                )
+
+            if self.lifts_saved:
+                print(f"               -----------------|-----------------")
+                print(f"pen lifts      {self.lifts_saved} saved by drawing across gaps")
+
+            if movement.histograms:
+                self.report_distributions()
+
+            self.report_timing()
 
         else:
 
             print(
                 "No data recorded yet. Try calling the BrachioGraph.box() method first."
             )
+
+    def report_timing(self):
+        """Prints how closely the steps kept to their schedule, as recorded by the plotter's
+        ``scheduler``."""
+
+        timing = self.scheduler.statistics()
+        if not timing["steps"]:
+            return
+
+        print(f"               -----------------|-----------------")
+        print(f"timing         {timing['steps']} steps")
+        print(
+            f"      late     mean {timing['mean'] * 1000:.3f}ms, "
+            f"p99 {timing['p99'] * 1000:.3f}ms, max {timing['max'] * 1000:.3f}ms"
+        )
+        print(f"      lost     {timing['lost']:.3f}s")
+
+    def report_distributions(self, width=40):
+        """Prints how often each range of angles and pulse-widths was used by each servo, as
+        recorded when ``reset_report(histograms=True)`` has been called."""
+
+        for column, title in zip(
+            self.movement.columns,
+            ("Servo 1 angles", "Servo 1 pulse-widths", "Servo 2 angles", "Servo 2 pulse-widths"),
+        ):
+            distribution = self.movement.distribution(column)
+            if not distribution:
+                continue
+
+            print()
+            print(title)
+            most = max(count for start, end, count in distribution)
+
+            for start, end, count in distribution:
+                bar = "#" * round(count / most * width)
+                print(f"  {start:>5} to {end:>5}  {bar:<{width}}  {count}")
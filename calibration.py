@@ -0,0 +1,97 @@
+"""Fast conversion of servo angles to pulse-widths, using pre-computed lookup tables."""
+
+import hashlib
+import json
+import os
+import zipfile
+import numpy
+
+
+default_cache = os.path.join(os.path.expanduser("~"), ".cache", "brachiograph")
+
+
+class CalibrationTable:
+    """A function of a servo angle that returns its pulse-width, based on angle/pulse-width values
+    measured for that servo.
+
+    As before, ``numpy.polyfit()`` provides a polynomial that matches the measured values. But
+    rather than evaluate the polynomial for every step, which is slow for single values, we
+    evaluate it once for every ``spacing`` degrees across the calibrated range (and a margin
+    either side), and interpolate linearly between those values. Outside that range, the
+    polynomial itself is used.
+
+    The table is saved in ``cache`` (a directory), named by a hash of the values it was made from,
+    so that it only needs to be made once. ``cache=None`` means that it won't be saved. A saved
+    table that can't be read is made again.
+    """
+
+    def __init__(self, angle_pws, spacing=0.01, degree=3, margin=20, cache=default_cache):
+
+        angle_pws = numpy.array(angle_pws, dtype=float)
+        self.spacing = spacing
+
+        key = hashlib.sha1(
+            json.dumps([angle_pws.tolist(), spacing, degree, margin]).encode()
+        ).hexdigest()
+
+        filename = os.path.join(cache, f"calibration-{key}.npz") if cache else None
+
+        table = None
+
+        if filename and os.path.exists(filename):
+            try:
+                with numpy.load(filename) as saved:
+                    coefficients, table = saved["coefficients"], saved["table"]
+                    self.start = float(saved["start"])
+            except (OSError, EOFError, ValueError, zipfile.BadZipFile, KeyError):
+                table = None  # a damaged table is made again, and saved over it
+
+        if table is None:
+            coefficients = numpy.polyfit(angle_pws[:, 0], angle_pws[:, 1], degree)
+
+            self.start = float(angle_pws[:, 0].min() - margin)
+            end = angle_pws[:, 0].max() + margin
+            table = numpy.poly1d(coefficients)(
+                self.start + numpy.arange(int(round((end - self.start) / spacing)) + 1) * spacing
+            )
+
+            if filename:
+                # saved whole or not at all, so that another plotter never reads half a table
+                temporary = filename + ".tmp"
+                try:
+                    os.makedirs(cache, exist_ok=True)
+                    with open(temporary, "wb") as table_file:
+                        numpy.savez(
+                            table_file, coefficients=coefficients, start=self.start, table=table
+                        )
+                    os.replace(temporary, filename)
+                except OSError:
+                    pass  # the table works just as well if it can't be saved
+
+        self.polynomial = numpy.poly1d(coefficients)
+        self.table = table
+        self.angles = self.start + numpy.arange(len(table)) * spacing
+
+        # for single values, plain Python is much faster than numpy
+        self.table_list = table.tolist()
+        self.last = len(table) - 1
+        self.steps_per_degree = 1 / spacing
+
+    def __call__(self, angle):
+
+        if isinstance(angle, (int, float)):
+            position = (angle - self.start) * self.steps_per_degree
+            if 0 <= position < self.last:
+                i = int(position)
+                low = self.table_list[i]
+                return low + (self.table_list[i + 1] - low) * (position - i)
+            return float(self.polynomial(angle))
+
+        angle = numpy.asarray(angle, dtype=float)
+        pws = numpy.interp(angle, self.angles, self.table)
+
+        outside = (angle < self.angles[0]) | (angle > self.angles[-1])
+        if outside.any():
+            pws = numpy.where(outside, self.polynomial(angle), pws)
+
+        return pws
@@ -0,0 +1,105 @@
+"""Checkpoints for long drawings, so that an interrupted drawing can be resumed where it stopped."""
+
+import hashlib
+import json
+import os
+
+import numpy
+
+
+def geometry_hash(layers):
+    """Returns a hash of the (scaled) lines of ``layers`` and their repeats, to check that a
+    checkpoint belongs to the same drawing, drawn the same size in the same place."""
+
+    digest = hashlib.sha1()
+
+    for layer in layers:
+        lines = layer["lines"]
+        digest.update(json.dumps([layer.get("repeat", 1), [len(line) for line in lines]]).encode())
+        for line in lines:
+            if len(line):
+                digest.update(numpy.asarray(line, dtype=float)[:, :2].tobytes())
+
+    return digest.hexdigest()
+
+
+class Checkpoint:
+    """Saves the progress of a drawing to ``filename``, every ``interval`` seconds of plotting
+    (judged by the number of steps played, so that it costs nothing to check).
+
+    Each checkpoint is a small JSON file recording the layer and repetition being drawn, the line
+    and the point in it that was being moved towards, the hash of the drawing's geometry, and the
+    position of the plotter. It's written to a temporary file first and then renamed, so that a
+    checkpoint is never left half-written.
+    """
+
+    def __init__(self, filename, geometry_hash, wait=0, interval=10):
+
+        self.filename = filename
+        self.geometry_hash = geometry_hash
+        self.every = max(int(interval / wait), 1) if wait else 1000
+
+        # the pass being played; the offsets are those of a pass that resumes part-way through
+        self.layer = self.repetition = 0
+        self.line_offset = self.point_offset = 0
+
+    def start_pass(self, layer, repetition, line_offset=0, point_offset=0):
+
+        self.layer, self.repetition = layer, repetition
+        self.line_offset, self.point_offset = line_offset, point_offset
+
+    def save(self, trajectory, step):
+        """Records that the first ``step`` steps of ``trajectory`` have been played."""
+
+        if not len(trajectory):
+            return
+
+        # the point being moved towards by the next step (or the last, if it was finished)
+        next_step = min(step, len(trajectory) - 1)
+        line = int(trajectory.lines[next_step])
+        point = int(trajectory.points[next_step])
+        if line == 0:
+            point += self.point_offset
+
+        last_step = max(step - 1, 0)
+
+        state = {
+            "geometry_hash": self.geometry_hash,
+            "layer": self.layer,
+            "repetition": self.repetition,
+            "line": line + self.line_offset,
+            "point": point,
+            "angle_1": float(trajectory.angles_1[last_step]),
+            "angle_2": float(trajectory.angles_2[last_step]),
+        }
+
+        temporary = self.filename + ".tmp"
+        try:
+            with open(temporary, "w") as checkpoint_file:
+                json.dump(state, checkpoint_file)
+            os.replace(temporary, self.filename)
+        except OSError:
+            pass  # a drawing that can't be checkpointed can still be drawn
+
+    def load(self):
+        """Returns the last checkpoint saved, or ``None`` if there isn't one. Raises
+        ``ValueError`` if it belongs to a different drawing."""
+
+        if not os.path.exists(self.filename):
+            return None
+
+        with open(self.filename) as checkpoint_file:
+            state = json.load(checkpoint_file)
+
+        if state["geometry_hash"] != self.geometry_hash:
+            raise ValueError(
+                f"The checkpoint in {self.filename} is for a different drawing, or for this one "
+                "at a different size or position."
+            )
+
+        return state
+
+    def remove(self):
+
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
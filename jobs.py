@@ -0,0 +1,114 @@
+"""Plotting in the background: drawings are queued as jobs for a worker thread, and each job is a
+future that reports its progress."""
+
+from concurrent.futures import Future, CancelledError
+from time import monotonic
+import queue
+import threading
+
+
+class PlotJob(Future):
+    """A drawing queued by ``Plotter.submit()``. As well as being a
+    :class:`concurrent.futures.Future` (``done()``, ``result()``, ``add_done_callback()``, etc),
+    it shows how far the drawing has got: ``lines_done`` of ``lines``, ``steps_done`` of ``steps``,
+    and an ``eta`` in seconds.
+
+    ``cancel()`` removes the job from the queue if it hasn't started yet; as for any future, a job
+    that is already running can't be cancelled. ``stop()`` stops it either way.
+    """
+
+    def __init__(self, layers, **options):
+
+        super().__init__()
+        self.layers = layers
+        self.options = options
+        self.stopping = threading.Event()
+
+        self.lines = self.steps = 0
+        self.started = None
+
+        # the passes already played, and the trajectory being played and how far into it we are
+        self.finished_lines = self.finished_steps = 0
+        self.trajectory = None
+        self.step = 0
+
+    def stop(self):
+        """Cancels the job if it hasn't started yet. If it has, the drawing stops before its next
+        step, leaving the pen up, and ``result()`` then raises ``CancelledError`` (although
+        ``cancelled()`` remains ``False``, as the job was already running). Returns ``False`` if
+        the job had already finished."""
+
+        if self.cancel():
+            return True
+
+        if self.running():
+            self.stopping.set()
+            return True
+
+        return False
+
+    def plan(self, passes):
+        """Records the work to be done: the passes that ``Plotter.plot_layers()`` will make, each
+        a dictionary of the ``trajectory``, the number of ``times`` to play it, and the number of
+        ``lines`` in it."""
+
+        self.lines = sum(p["times"] * p["lines"] for p in passes)
+        self.steps = sum(p["times"] * len(p["trajectory"]) for p in passes)
+        self.started = monotonic()
+
+    def finish_pass(self, trajectory, lines):
+
+        self.finished_lines += lines
+        self.finished_steps += len(trajectory)
+        self.trajectory, self.step = None, 0
+
+    @property
+    def steps_done(self):
+        return self.finished_steps + self.step
+
+    @property
+    def lines_done(self):
+        trajectory, step = self.trajectory, self.step
+        # every line before the one being drawn is finished
+        current = int(trajectory.lines[step - 1]) if trajectory is not None and step else 0
+        return self.finished_lines + current
+
+    @property
+    def eta(self):
+        """The time remaining in seconds, at the rate so far; ``None`` until it can be
+        estimated."""
+
+        steps_done = self.steps_done
+        if not steps_done:
+            return None
+        return (monotonic() - self.started) / steps_done * (self.steps - steps_done)
+
+
+class PlotWorker(threading.Thread):
+    """A thread that runs a plotter's queued jobs one after another, in the order they were
+    submitted."""
+
+    def __init__(self, plotter):
+
+        super().__init__(name="plotter", daemon=True)
+        self.plotter = plotter
+        self.jobs = queue.Queue()
+
+    def run(self):
+
+        while True:
+            job = self.jobs.get()
+
+            # a job cancelled while queued is skipped
+            if not job.set_running_or_notify_cancel():
+                continue
+
+            try:
+                self.plotter.plot_layers(job.layers, job=job, **job.options)
+            except BaseException as error:
+                job.set_exception(error)
+            else:
+                if job.stopping.is_set():
+                    job.set_exception(CancelledError())
+                else:
+                    job.set_result(None)
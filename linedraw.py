@@ -35,19 +35,40 @@ def image_to_json(
     repeat_contours=1,
     draw_hatch=False,
     repeat_hatch=1,
+    min_component_size=0,
+    bounds=None,
+    pen_width=None,
+    levels=False,
 ):
 
-    lines = vectorise(
+    # fitted here rather than in vectorise(), so that the levels of detail can sample the image
+    # at the resolution that it was traced at
+    if bounds and pen_width:
+        resolution, draw_contours, draw_hatch = fit_to_pen(
+            resolution, draw_contours, draw_hatch, bounds, pen_width
+        )
+
+    layers = vectorise(
         image_filename,
         resolution,
         draw_contours,
         repeat_contours,
         draw_hatch,
         repeat_hatch,
+        min_component_size,
     )
 
+    if levels:
+        # save coarser versions too, for quick drafts and previews
+        levels = levels_of_detail(
+            layers, image=resize_image(open_image(image_filename), resolution)
+        )
+        for level, level_layers in levels.items():
+            with open(svg_folder + image_filename + "." + level + ".svg", "w") as f:
+                f.write(makesvg(layers_to_lines(level_layers)))
+
     filename = json_folder + image_filename + ".json"
-    lines_to_file(lines, filename)
+    layers_to_file(layers, filename, levels)
 
 
 def makesvg(lines):
@@ -103,8 +124,49 @@ def vectorise(
     repeat_contours=1,
     draw_hatch=False,
     repeat_hatch=1,
+    min_component_size=0,
+    bounds=None,
+    pen_width=None,
 ):
 
+    if bounds and pen_width:
+        resolution, draw_contours, draw_hatch = fit_to_pen(
+            resolution, draw_contours, draw_hatch, bounds, pen_width
+        )
+
+    image = open_image(image_filename)
+
+    # Each layer is drawn once, and then repeated as many times as required when it is plotted;
+    # we don't duplicate the lines themselves.
+    layers = []
+
+    if draw_contours and repeat_contours:
+        edges = find_contour_edges(
+            resize_image(image, resolution, draw_contours), min_component_size
+        )
+        contours = contour_lines(edges, draw_contours)
+        layers.append({"lines": contours, "repeat": repeat_contours})
+
+    if draw_hatch and repeat_hatch:
+        hatches = hatch_lines(resize_image(image, resolution), draw_hatch)
+        layers.append({"lines": hatches, "repeat": repeat_hatch})
+
+    lines = layers_to_lines(layers)
+
+    segments = 0
+    for line in lines:
+        segments = segments + len(line) - 1
+    passes = sum(layer["repeat"] for layer in layers)
+    print(len(lines), "lines,", segments, "segments,", passes, "passes.")
+
+    f = open(svg_folder + image_filename + ".svg", "w")
+    f.write(makesvg(lines))
+    f.close()
+
+    return layers
+
+
+def open_image(image_filename):
     image = None
     possible = [
         image_filename,
@@ -120,40 +182,49 @@ def vectorise(
             break
         except:
             pass
-    w, h = image.size
 
     # convert the image to greyscale
     image = image.convert("L")
 
     # maximise contrast
-    image = ImageOps.autocontrast(image, 5, preserve_tone=True)
+    return ImageOps.autocontrast(image, 5, preserve_tone=True)
 
-    lines = []
 
-    if draw_contours and repeat_contours:
-        contours = getcontours(resize_image(image, resolution, draw_contours), draw_contours)
-        contours = sortlines(contours)
-        contours = join_lines(contours)
-        for r in range(repeat_contours):
-            lines += contours
+def contour_lines(edges, draw_contours):
+    contours = trace_contours(edges, draw_contours)
+    contours = sortlines(contours)
+    return join_lines(contours)
 
-    if draw_hatch and repeat_hatch:
-        hatches = hatch(resize_image(image, resolution), line_spacing=draw_hatch)
-        hatches = sortlines(hatches)
-        hatches = join_lines(hatches)
-        for r in range(repeat_hatch):
-            lines += hatches
 
-    segments = 0
-    for line in lines:
-        segments = segments + len(line) - 1
-    print(len(lines), "lines,", segments, "segments.")
+def hatch_lines(image, draw_hatch):
+    hatches = hatch(image, line_spacing=draw_hatch)
+    hatches = sortlines(hatches)
+    return join_lines(hatches)
 
-    f = open(svg_folder + image_filename + ".svg", "w")
-    f.write(makesvg(lines))
-    f.close()
 
-    return lines
+def fit_to_pen(resolution, draw_contours, draw_hatch, bounds, pen_width):
+    # The plotter can't draw more detail than there are pen-widths across its drawing area, so
+    # there's no point tracing the image at a higher resolution than that. bounds are in cm (as
+    # for a Plotter), and pen_width in mm. The hatching and contours keep their physical size.
+
+    longest_side = max(abs(bounds[2] - bounds[0]), abs(bounds[3] - bounds[1]))
+    plottable = math.ceil(longest_side * 10 / pen_width)
+
+    if plottable >= resolution:
+        return resolution, draw_contours, draw_hatch
+
+    factor = plottable / resolution
+
+    if draw_contours:
+        draw_contours = max(1, draw_contours * factor)
+
+    if draw_hatch:
+        # hatch lines closer than two pen-widths would simply merge into a solid fill
+        draw_hatch = max(2, round(draw_hatch * factor))
+
+    print(f"Reduced resolution from {resolution} to {plottable} to match the pen.")
+
+    return plottable, draw_contours, draw_hatch
 
 
 def resize_image(image, resolution, divider=1):
@@ -165,12 +236,161 @@ def resize_image(image, resolution, divider=1):
     )
 
 
+# -------------- parameter sweeps --------------
+
+
+def sweep(
+    image_filename,
+    resolutions=[1024],
+    draw_contours=[2],
+    draw_hatch=[16],
+    min_component_size=0,
+    workers=None,
+    tile_size=320,
+):
+    # Vectorises the image with every combination of the supplied values, and saves a single
+    # contact sheet image (images/<image_filename>.sweep.png) to compare them, along with their
+    # statistics (images/<image_filename>.sweep.json). Returns a list of the variants.
+    #
+    # Work is shared: the image is prepared once, each resized image and edge map is made once,
+    # and each set of contours or hatching is made once however many variants use it. Those
+    # last, slowest, stages run in parallel on up to ``workers`` processes.
+
+    from concurrent.futures import ProcessPoolExecutor
+    from itertools import product
+
+    image = open_image(image_filename)
+
+    variants = [
+        {"resolution": r, "draw_contours": c, "draw_hatch": h}
+        for r, c, h in product(resolutions, draw_contours, draw_hatch)
+        if c or h
+    ]
+
+    resized = {}
+    edges = {}
+    jobs = {}
+
+    for variant in variants:
+        resolution, c, h = variant["resolution"], variant["draw_contours"], variant["draw_hatch"]
+
+        if c and ("contours", resolution, c) not in jobs:
+            # variants whose contour images are the same size share an edge map
+            contour_image = resize_image(image, resolution, c)
+            if contour_image.size not in edges:
+                edges[contour_image.size] = find_contour_edges(contour_image, min_component_size)
+            jobs["contours", resolution, c] = (contour_lines, edges[contour_image.size], c)
+
+        if h and ("hatch", resolution, h) not in jobs:
+            if resolution not in resized:
+                resized[resolution] = resize_image(image, resolution)
+            jobs["hatch", resolution, h] = (hatch_lines, resized[resolution], h)
+
+    if workers == 1:
+        results = {key: function(*args) for key, (function, *args) in jobs.items()}
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {key: executor.submit(*job) for key, job in jobs.items()}
+            results = {key: future.result() for key, future in futures.items()}
+
+    for variant in variants:
+        resolution, c, h = variant["resolution"], variant["draw_contours"], variant["draw_hatch"]
+        layers = []
+        if c:
+            layers.append({"lines": results["contours", resolution, c], "repeat": 1})
+        if h:
+            layers.append({"lines": results["hatch", resolution, h], "repeat": 1})
+
+        variant.update(line_statistics(layers_to_lines(layers), resolution))
+        variant["layers"] = layers
+
+    for variant in variants:
+        print(
+            f"resolution {variant['resolution']:>5}  contours {variant['draw_contours']:>4}  "
+            f"hatch {variant['draw_hatch']:>4}:  {variant['lines']:>6} lines  "
+            f"{variant['segments']:>7} segments  drawing {variant['drawing']:>7.1f}  "
+            f"travel {variant['travel']:>7.1f}"
+        )
+
+    contact_sheet(variants, tile_size).save(svg_folder + image_filename + ".sweep.png")
+
+    with open(svg_folder + image_filename + ".sweep.json", "w") as f:
+        json.dump(
+            [{k: v for k, v in variant.items() if k != "layers"} for variant in variants],
+            f,
+            indent=4,
+        )
+
+    return variants
+
+
+def line_statistics(lines, width):
+    # Drawing and travel (pen-up) distances are given in image widths, so that variants at
+    # different resolutions can be compared.
+    drawing = travel = 0
+    previous = None
+    for line in lines:
+        drawing += line_length(line)
+        if previous:
+            travel += math.hypot(line[0][0] - previous[0], line[0][1] - previous[1])
+        previous = line[-1]
+
+    return {
+        "lines": len(lines),
+        "segments": sum(len(line) - 1 for line in lines),
+        "drawing": drawing / width,
+        "travel": travel / width,
+    }
+
+
+def contact_sheet(variants, tile_size=320):
+    columns = math.ceil(math.sqrt(len(variants))) or 1
+    rows = math.ceil(len(variants) / columns) or 1
+    label_height = 30
+    sheet = Image.new("L", (columns * tile_size, rows * (tile_size + label_height)), 255)
+    draw = ImageDraw.Draw(sheet)
+
+    for n, variant in enumerate(variants):
+        left = (n % columns) * tile_size
+        top = (n // columns) * (tile_size + label_height)
+        lines = layers_to_lines(variant["layers"])
+        height = max([p[1] for line in lines for p in line], default=0)
+        scale = (tile_size - 10) / max(variant["resolution"], height)
+
+        for line in lines:
+            draw.line(
+                [(left + 5 + p[0] * scale, top + 5 + p[1] * scale) for p in line], fill=0, width=1
+            )
+
+        draw.text(
+            (left + 5, top + tile_size),
+            f"resolution {variant['resolution']} contours {variant['draw_contours']} "
+            f"hatch {variant['draw_hatch']}\n"
+            f"{variant['lines']} lines, {variant['segments']} segments, "
+            f"travel {variant['travel']:.1f}",
+            fill=0,
+        )
+
+    return sheet
+
+
 # -------------- vectorisation options --------------
 
 
-def getcontours(image, draw_contours=2):
-    print("Generating contours...")
+def getcontours(image, draw_contours=2, min_component_size=0):
+    image = find_contour_edges(image, min_component_size)
+    return trace_contours(image, draw_contours)
+
+
+def find_contour_edges(image, min_component_size=0):
     image = find_edges(image)
+    if min_component_size:
+        image = remove_small_components(image, min_component_size)
+    return image
+
+
+def trace_contours(image, draw_contours=2):
+    print("Generating contours...")
     IM1 = image.copy()
     IM2 = image.rotate(-90, expand=True).transpose(Image.FLIP_LEFT_RIGHT)
     dots1 = getdots(IM1)
@@ -310,6 +530,75 @@ def find_edges(image):
     return image.point(lambda p: p > 128 and 255)
 
 
+def remove_small_components(image, min_size):
+    # Speckle in the edge map would otherwise become a host of tiny contours, each costing a pen
+    # lift when plotted. Remove any group of connected edge pixels smaller than min_size.
+    print("Removing small edge components...")
+    import numpy as np
+
+    pixels = np.array(image) > 128
+
+    if no_cv:
+        pixels = keep_large_runs(pixels, min_size)
+    else:
+        count, labels, stats, centroids = cv2.connectedComponentsWithStats(
+            pixels.astype(np.uint8), connectivity=8
+        )
+        keep = stats[:, cv2.CC_STAT_AREA] >= min_size
+        keep[0] = False  # the background
+        pixels = keep[labels]
+
+    return Image.fromarray(pixels.astype(np.uint8) * 255)
+
+
+def keep_large_runs(pixels, min_size):
+    # Connected-component labelling without openCV: find the horizontal runs of pixels in each
+    # row, and join (union-find) the runs that touch runs in the row above, including diagonally.
+    import numpy as np
+
+    h, w = pixels.shape
+    padded = np.zeros((h, w + 2), dtype=np.int8)
+    padded[:, 1:-1] = pixels
+    changes = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(changes == 1)
+    ends = np.nonzero(changes == -1)[1]  # exclusive
+    row_first = np.searchsorted(rows, np.arange(h + 1))
+
+    parent = list(range(len(starts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    s, e = starts.tolist(), ends.tolist()
+
+    for y in range(1, h):
+        i, i_end = row_first[y - 1], row_first[y]
+        j, j_end = row_first[y], row_first[y + 1]
+        while i < i_end and j < j_end:
+            if s[j] <= e[i] and s[i] <= e[j]:
+                root_i, root_j = find(i), find(j)
+                if root_i != root_j:
+                    parent[root_j] = root_i
+            if e[i] < e[j]:
+                i += 1
+            else:
+                j += 1
+
+    roots = np.array([find(i) for i in range(len(parent))], dtype=np.intp)
+    sizes = np.bincount(roots, weights=ends - starts, minlength=len(parent))
+    keep = sizes[roots] >= min_size
+
+    # paint the surviving runs back into an image
+    marks = np.zeros((h, w + 1), dtype=np.int32)
+    np.add.at(marks, (rows[keep], starts[keep]), 1)
+    np.add.at(marks, (rows[keep], ends[keep]), -1)
+
+    return np.cumsum(marks, axis=1)[:, :w] > 0
+
+
 def getdots(IM):
     print("Getting contour points...")
     PX = IM.load()
@@ -373,6 +662,8 @@ def connectdots(dots):
 
 def sortlines(lines):
     print("Optimising line sequence...")
+    if not lines:
+        return []
     clines = lines[:]
     slines = [clines.pop(0)]
     while clines != []:
@@ -427,6 +718,145 @@ def lines_to_file(lines, filename):
         json.dump(lines, file_to_save, indent=4)
 
 
+def lines_to_ndjson(lines, filename):
+    # Saves one line per line of the file, for Plotter.plot_stream() to read one at a time.
+    with open(filename, "w") as file_to_save:
+        for line in lines:
+            file_to_save.write(json.dumps(line) + "\n")
+
+
+def layers_to_file(layers, filename, levels=None):
+    # Each layer's lines are saved once, along with the number of times the plotter should draw
+    # them. Any coarser levels of detail are saved alongside.
+    data = {"layers": layers}
+    if levels:
+        data["levels"] = levels
+    with open(filename, "w") as file_to_save:
+        json.dump(data, file_to_save, indent=4)
+
+
+def layers_to_lines(layers, repeat=False):
+    # Flattens layers into a single list of lines. With repeat=True, each layer's lines appear as
+    # many times as the layer is to be drawn (the same list objects are reused, not copied).
+    lines = []
+    for layer in layers:
+        for r in range(layer["repeat"] if repeat else 1):
+            lines.extend(layer["lines"])
+    return lines
+
+
+# -------------- levels of detail --------------
+
+# Each level, from finest to coarsest, is made by simplifying the previous one. The values are
+# proportions of the size of the image: how far a simplified line may stray from the original,
+# and the length of the shortest line worth keeping.
+detail_levels = [
+    ("medium", 0.0015, 0.01),
+    ("coarse", 0.004, 0.04),
+]
+
+
+def levels_of_detail(layers, levels=detail_levels, image=None):
+    # Returns a dictionary of progressively simpler versions of the layers, keyed by level name.
+    # Each level drops the strokes whose importance is less than its shortest length. A stroke's
+    # importance is its length, multiplied by the number of times its layer is drawn, and - given
+    # the greyscale image that the layers were traced from, at the size they were traced at - by
+    # how dark the image is along the stroke, relative to the average for all the strokes. So
+    # strokes that are drawn repeatedly, or that lie in the darkest parts of the image, outlast
+    # faint ones of the same length.
+    points = [point for layer in layers for line in layer["lines"] for point in line]
+    if not points:
+        return {name: layers for name, tolerance, shortest in levels}
+
+    xs, ys = [p[0] for p in points], [p[1] for p in points]
+    size = max(max(xs) - min(xs), max(ys) - min(ys))
+
+    weights = [[layer["repeat"]] * len(layer["lines"]) for layer in layers]
+
+    if image is not None:
+        darkness = [[line_darkness(line, image) for line in layer["lines"]] for layer in layers]
+        average = sum(map(sum, darkness)) / sum(map(len, darkness)) or 1
+        weights = [
+            [weight * dark / average for weight, dark in zip(layer_weights, layer_darkness)]
+            for layer_weights, layer_darkness in zip(weights, darkness)
+        ]
+
+    result = {}
+    for name, tolerance, shortest in levels:
+        kept = [
+            [
+                (simplify_line(line, tolerance * size), weight)
+                for line, weight in zip(layer["lines"], layer_weights)
+                if line_length(line) * weight >= shortest * size
+            ]
+            for layer, layer_weights in zip(layers, weights)
+        ]
+        layers = [
+            {"lines": [line for line, weight in strokes], "repeat": layer["repeat"]}
+            for layer, strokes in zip(layers, kept)
+        ]
+        weights = [[weight for line, weight in strokes] for strokes in kept]
+        result[name] = layers
+
+        lines = layers_to_lines(layers)
+        print(
+            f"{name}: {len(lines)} lines, {sum(len(line) - 1 for line in lines)} segments."
+        )
+
+    return result
+
+
+def line_darkness(line, image):
+    # How dark the greyscale image is, from 0 to 1, on average at the points of the line.
+    pixels = image.load()
+    width, height = image.size
+    return sum(
+        1 - pixels[min(max(int(x), 0), width - 1), min(max(int(y), 0), height - 1)] / 255
+        for x, y, *rest in line
+    ) / len(line)
+
+
+def simplify_line(line, tolerance):
+    # Ramer-Douglas-Peucker: keep the end points, and the point furthest from the line between
+    # them if it's further than tolerance; repeat for each half.
+    if len(line) < 3:
+        return line
+
+    keep = [False] * len(line)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(line) - 1)]
+
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = line[first][:2], line[last][:2]
+        dx, dy = x2 - x1, y2 - y1
+        length = math.hypot(dx, dy)
+
+        furthest, distance = None, tolerance
+        for i in range(first + 1, last):
+            x, y = line[i][0], line[i][1]
+            if length:
+                d = abs(dy * (x - x1) - dx * (y - y1)) / length
+            else:
+                d = math.hypot(x - x1, y - y1)
+            if d > distance:
+                furthest, distance = i, d
+
+        if furthest is not None:
+            keep[furthest] = True
+            stack.append((first, furthest))
+            stack.append((furthest, last))
+
+    return [point for point, kept in zip(line, keep) if kept]
+
+
+def line_length(line):
+    return sum(
+        math.hypot(line[i][0] - line[i - 1][0], line[i][1] - line[i - 1][1])
+        for i in range(1, len(line))
+    )
+
+
 # -------------- helper functions --------------
 
 
@@ -1,16 +1,30 @@
 """Contains a base class for a drawing robot."""
 
-from time import sleep, monotonic
+from contextlib import contextmanager
+from time import sleep, perf_counter
 import json
 import pprint
 import math
+import itertools
+import threading
 import readchar
-import tqdm
 import pigpio
 import numpy
+from calibration import CalibrationTable, default_cache
+from recording import MovementRecord
+from scheduling import StepScheduler
+from jobs import PlotJob, PlotWorker
+from checkpoints import Checkpoint, geometry_hash
+from telemetry import RunRecord
+from progress import Progress, TerminalSink
+from programs import ProgramRecorder, read_program
 
 
 class Plotter:
+
+    # where calibration lookup tables are saved; None to not save them
+    calibration_cache = default_cache
+
     def __init__(
         self,
         virtual: bool = False,  # a virtual plotter runs in software only
@@ -18,6 +32,8 @@ class Plotter:
         turtle_coarseness=None,  # a factor in degrees representing servo resolution
         #  ----------------- geometry of the plotter -----------------
         bounds: tuple = [-10, 5, 10, 15],  # the maximum rectangular drawing area
+        servo_1_angle_limits: tuple = None,  # the lowest and highest angles each servo may reach
+        servo_2_angle_limits: tuple = None,
         #  ----------------- naive calculation values -----------------
         servo_1_parked_pw: int = 1500,  # pulse-widths when parked
         servo_2_parked_pw: int = 1500,
@@ -37,13 +53,24 @@ class Plotter:
         #  ----------------- the pen -----------------
         pw_up: int = None,  # pulse-widths for pen up/down
         pw_down: int = None,
+        pen_width: float = None,  # the width of the pen's line in mm
+        pen_ease_step: int = 1,  # how the pen is eased up and down; see Pen.ease_pen()
+        pen_ease_duration: float = None,
+        pen_lift_overlap: bool = False,  # move the arms while the pen is still being lifted
         #  ----------------- physical control -----------------
         angular_step: float = None,  # default step of the servos in degrees
         wait: float = None,  # default wait time between operations
         resolution: float = None,  # default resolution of the plotter in cm
+        tolerance: float = None,  # default deviation from straight lines allowed, in cm
+        gap: float = None,  # gaps between lines up to this size in cm are drawn across
+        #  ----------------- motion limits for compiled drawing -----------------
+        servo_1_max_speed: float = None,  # degrees per second; None for steps at a constant rate
+        servo_2_max_speed: float = None,
+        servo_1_max_acceleration: float = None,  # degrees per second per second
+        servo_2_max_acceleration: float = None,
     ):
 
-        self.last_moved = monotonic()
+        self.scheduler = StepScheduler()
         self.virtual = virtual
         self.angle_1 = servo_1_parked_angle
         self.angle_2 = servo_2_parked_angle
@@ -62,10 +89,30 @@ class Plotter:
             self.turtle = False
 
         self.bounds = bounds
+        self.servo_1_angle_limits = servo_1_angle_limits
+        self.servo_2_angle_limits = servo_2_angle_limits
+
+        # set to a waveforms.WavePlayer to play compiled trajectories as pigpio waveforms
+        self.wave_player = None
+
+        # set to a tracing.StepTracer to time the stages of a sample of the steps
+        self.tracer = None
+
+        # counts the steps of each drawing, and shows how far it has got
+        self.progress = Progress(TerminalSink())
+
+        # the programs.ProgramRecorder recording the plotter's steps, while record_program() does
+        self.program = None
+
+        # the thread that runs jobs queued by submit(), once there are any
+        self.worker = None
+
+        # the telemetry.RunRecord of the drawing being made, and of the last one
+        self.run_record = self.last_run = None
 
         # if pulse-widths to angles are supplied for each servo, we will feed them to
-        # numpy.polyfit(), to produce a function for each one. Otherwise, we will use a simple
-        # approximation based on a centre of travel of 1500µS and 10µS per degree
+        # numpy.polyfit(), to produce a function - a CalibrationTable - for each one. Otherwise, we
+        # will use a simple approximation based on a centre of travel of 1500µS and 10µS per degree
 
         self.servo_1_parked_pw = servo_1_parked_pw
         self.servo_1_degree_ms = servo_1_degree_ms
@@ -83,10 +130,7 @@ class Plotter:
             self.hysteresis_correction_1 = numpy.mean(differences)
 
         if servo_1_angle_pws:
-            servo_1_array = numpy.array(servo_1_angle_pws)
-            self.angles_to_pw_1 = numpy.poly1d(
-                numpy.polyfit(servo_1_array[:, 0], servo_1_array[:, 1], 3)
-            )
+            self.angles_to_pw_1 = CalibrationTable(servo_1_angle_pws, cache=self.calibration_cache)
 
         else:
             self.angles_to_pw_1 = self.naive_angles_to_pulse_widths_1
@@ -107,14 +151,19 @@ class Plotter:
             self.hysteresis_correction_2 = numpy.mean(differences)
 
         if servo_2_angle_pws:
-            servo_2_array = numpy.array(servo_2_angle_pws)
-            self.angles_to_pw_2 = numpy.poly1d(
-                numpy.polyfit(servo_2_array[:, 0], servo_2_array[:, 1], 3)
-            )
+            self.angles_to_pw_2 = CalibrationTable(servo_2_angle_pws, cache=self.calibration_cache)
 
         else:
             self.angles_to_pw_2 = self.naive_angles_to_pulse_widths_2
 
+        # if maximum speeds are given, compiled drawings are timed by motion_profile()
+        self.max_speeds = None
+        if servo_1_max_speed and servo_2_max_speed:
+            self.max_speeds = numpy.array([servo_1_max_speed, servo_2_max_speed], dtype=float)
+        self.max_accelerations = numpy.array(
+            [servo_1_max_acceleration or numpy.inf, servo_2_max_acceleration or numpy.inf]
+        )
+
         # set some initial values required for moving methods
         self.previous_pw_1 = self.previous_pw_2 = 0
         self.active_hysteresis_correction_1 = self.active_hysteresis_correction_2 = 0
@@ -147,10 +196,23 @@ class Plotter:
         pw_up = pw_up or 1400
         pw_down = pw_down or 1600
 
-        self.pen = Pen(bg=self, pw_up=pw_up, pw_down=pw_down, virtual=self.virtual)
+        self.pen = Pen(
+            bg=self,
+            pw_up=pw_up,
+            pw_down=pw_down,
+            virtual=self.virtual,
+            ease_step=pen_ease_step,
+            ease_duration=pen_ease_duration,
+            lift_overlap=pen_lift_overlap,
+        )
 
         self.angular_step = angular_step or 0.1
         self.resolution = resolution or 0.1
+        self.tolerance = tolerance
+
+        # without a gap, gaps narrower than the pen's line are drawn across
+        self.pen_width = pen_width
+        self.gap = gap if gap is not None else (pen_width or 0) / 10
 
         self.set_angles(self.servo_1_parked_angle, self.servo_2_parked_angle)
         sleep(1)
@@ -182,17 +244,126 @@ class Plotter:
 
     #  ----------------- plotting methods -----------------
 
-    def plot_file(self, filename="", bounds=None, angular_step=None, wait=None, resolution=None):
+    def plot_file(
+        self,
+        filename="",
+        bounds=None,
+        angular_step=None,
+        wait=None,
+        resolution=None,
+        level=None,
+        checkpoint=None,
+        resume=False,
+        telemetry=None,
+        textfile=None,
+    ):
         """Plots and image encoded as JSON lines in ``filename``. Passes the lines in the supplied
-        JSON file to ``plot_lines()``.
+        JSON file to ``plot_lines()``, or if the file contains layers (as saved by
+        ``linedraw.image_to_json()``), passes them to ``plot_layers()``.
+
+        ``level`` selects a coarser level of detail (e.g. ``"coarse"``), if the file contains
+        them, for a quick draft. It is scaled exactly as the full version would be.
+
+        With ``checkpoint=True``, progress is saved in a checkpoint file alongside ``filename`` (or
+        in ``checkpoint``, if that is a filename). ``resume=True`` continues an interrupted drawing
+        from its last checkpoint, and carries on saving them. ``telemetry`` and ``textfile`` save a record
+        of the drawing (see ``plot_layers()``).
+
+        A file whose name ends in ``.ndjson`` is streamed by ``plot_stream()`` instead (without
+        checkpoints or a record).
         """
 
+        if filename.endswith(".ndjson"):
+            return self.plot_stream(filename, bounds, angular_step, wait, resolution)
+
         bounds = bounds or self.bounds
 
+        if checkpoint is True or (checkpoint is None and resume):
+            checkpoint = f"{filename}.{level}.checkpoint" if level else f"{filename}.checkpoint"
+
         with open(filename, "r") as line_file:
             lines = json.load(line_file)
 
-        self.plot_lines(lines, bounds, angular_step, wait, resolution, flip=True)
+        if isinstance(lines, dict):
+            layers = lines["layers"]
+
+            if level and level != "full":
+                fit_lines = [line for layer in layers for line in layer["lines"]]
+                layers = lines["levels"][level]
+            else:
+                fit_lines = None
+
+            self.plot_layers(
+                layers,
+                bounds,
+                angular_step,
+                wait,
+                resolution,
+                flip=True,
+                fit_lines=fit_lines,
+                checkpoint=checkpoint,
+                resume=resume,
+                telemetry=telemetry,
+                textfile=textfile,
+            )
+        else:
+            self.plot_lines(
+                lines,
+                bounds,
+                angular_step,
+                wait,
+                resolution,
+                flip=True,
+                checkpoint=checkpoint,
+                resume=resume,
+                telemetry=telemetry,
+                textfile=textfile,
+            )
+
+    def plot_stream(
+        self,
+        filename="",
+        bounds=None,
+        angular_step=None,
+        wait=None,
+        resolution=None,
+        flip=True,
+        chunk_size=1000,
+    ):
+        """Plots the lines in ``filename``, an NDJSON file - each line of the file a JSON list of
+        the points of one line of the drawing (see ``linedraw.lines_to_ndjson()``) - without
+        ever holding more than ``chunk_size`` of them in memory, so that a drawing of any size can
+        be plotted.
+
+        The file is read twice: once to find the extent of the drawing, and again to rotate,
+        scale, compile and play the lines, ``chunk_size`` at a time.
+        """
+
+        wait = wait if wait is not None else self.wait
+        bounds = bounds or self.bounds
+
+        fit = self.fit_extent(*self.file_extent(filename), bounds)
+
+        with self.progress.counting(description="Plotting"):
+
+            chunk = []
+            for line in self.read_lines(filename):
+                chunk.append(line)
+
+                if len(chunk) == chunk_size:
+                    self.plot_chunk(chunk, fit, flip, angular_step, wait, resolution)
+                    chunk = []
+
+            self.plot_chunk(chunk, fit, flip, angular_step, wait, resolution)
+
+            self.park()
+
+    def plot_chunk(self, lines, fit, flip, angular_step, wait, resolution):
+
+        lines = self.transform_lines(lines, *fit, flip)
+        trajectory = self.compile_lines(lines, angular_step, resolution)
+        self.scheduler.reset()
+        self.play(trajectory, wait)
 
     def plot_lines(
         self,
@@ -203,25 +374,509 @@ class Plotter:
         resolution=None,
         flip=False,
         rotate=False,
+        checkpoint=None,
+        resume=False,
+        gap=None,
+        fix=None,
+        telemetry=None,
+        textfile=None,
     ):
         """Passes each segment of each line in lines to ``draw_line()``"""
 
+        self.plot_layers(
+            [{"lines": lines, "repeat": 1}],
+            bounds,
+            angular_step,
+            wait,
+            resolution,
+            flip,
+            rotate,
+            checkpoint=checkpoint,
+            resume=resume,
+            gap=gap,
+            fix=fix,
+            telemetry=telemetry,
+            textfile=textfile,
+        )
+
+    def plot_layers(
+        self,
+        layers=[],
+        bounds=None,
+        angular_step=None,
+        wait=None,
+        resolution=None,
+        flip=False,
+        rotate=False,
+        fit_lines=None,
+        job=None,
+        checkpoint=None,
+        resume=False,
+        gap=None,
+        fix=None,
+        telemetry=None,
+        textfile=None,
+    ):
+        """Plots a list of layers, each a dictionary of ``lines`` and the number of times to
+        ``repeat`` them, e.g.::
+
+            [{"lines": contours, "repeat": 3}, {"lines": hatching, "repeat": 1}]
+
+        All the layers are rotated and scaled together, once; each layer is then drawn as many
+        times as it requires. If ``fit_lines`` are supplied, they are used instead of the layers'
+        own lines to determine the scaling.
+
+        ``job`` is the :class:`~jobs.PlotJob` that the drawing is being done for, if any.
+
+        If ``checkpoint`` is a filename, progress is saved there every few seconds (see
+        :class:`~checkpoints.Checkpoint`), and removed when the drawing is finished - or when its
+        ``job`` is stopped, as a stopped drawing isn't meant to be resumed. With
+        ``resume=True``, the plotter is parked and the drawing continues from the last checkpoint
+        saved, if there is one.
+
+        Lines that start no more than ``gap`` cm from the end of the line before are joined to it
+        without lifting the pen (see ``compile_lines()``).
+
+        Before anything moves, the lines are checked by ``check_layers()``; if any of them can't
+        be drawn, ``ValueError`` is raised, unless ``fix`` (``"clip"`` or ``"shrink"``) says what
+        to do about them.
+
+        The drawing is recorded in a :class:`~telemetry.RunRecord`, kept afterwards as
+        ``last_run`` - whether or not it was finished - and saved as JSON in ``telemetry`` and as
+        Prometheus metrics in ``textfile``, if they are filenames.
+        """
+
+        wait = wait if wait is not None else self.wait
         bounds = bounds or self.bounds
 
-        lines = self.rotate_and_scale_lines(lines=lines, bounds=bounds, flip=True)
+        record = self.run_record = RunRecord(self)
+        record.start()
+        finished = counting = False
+
+        try:
+            layers = self.checked_layers(layers, bounds, resolution, fit_lines, fix)
+
+            resume_from = None
+
+            if checkpoint:
+                checkpoint = Checkpoint(checkpoint, geometry_hash(layers), wait)
+
+                if resume:
+                    resume_from = checkpoint.load()
+                    if resume_from:
+                        self.park()
+
+            passes = self.compile_layers(layers, angular_step, resolution, resume_from, gap)
+
+            if job:
+                job.plan(passes)
+
+            # a job shows its own progress, from another thread
+            total = sum(this_pass["times"] * len(this_pass["trajectory"]) for this_pass in passes)
+            counting = self.progress.start(total, "Plotting", silent=bool(job))
+            self.scheduler.reset()
+
+            for this_pass in passes:
+                trajectory = this_pass["trajectory"]
+
+                for r in range(this_pass["times"]):
+                    if checkpoint:
+                        checkpoint.start_pass(
+                            this_pass["layer"],
+                            this_pass["repetition"] + r,
+                            this_pass.get("line_offset", 0),
+                            this_pass.get("point_offset", 0),
+                        )
+
+                    self.play(trajectory, wait, job, checkpoint)
+
+                    if job:
+                        if job.stopping.is_set():
+                            if checkpoint:
+                                checkpoint.remove()
+                            self.pen.up()
+                            return
+                        job.finish_pass(trajectory, this_pass["lines"])
+
+            if checkpoint:
+                checkpoint.remove()
+
+            record.mark("travel")
+            self.park()
+            finished = True
+
+        finally:
+            if counting:
+                self.progress.finish()
+            record.finish(finished)
+            self.run_record, self.last_run = None, record
+            if telemetry:
+                record.write(telemetry)
+            if textfile:
+                record.write_textfile(textfile)
+
+    def submit(
+        self,
+        lines=[],
+        bounds=None,
+        angular_step=None,
+        wait=None,
+        resolution=None,
+        flip=False,
+        rotate=False,
+    ):
+        """Queues ``lines`` to be plotted, as ``plot_lines()`` would, by a separate thread, and
+        returns a :class:`~jobs.PlotJob` - a future that shows the drawing's progress, and can be
+        used to stop it. Jobs are plotted one at a time, in the order they were submitted.
 
-        for line in tqdm.tqdm(lines, desc="Lines", leave=False):
-            x, y = line[0]
+        Meanwhile, the plotter can still be queried, but shouldn't be moved by anything else.
+        """
 
-            # only if we are not within 1mm of the start of the line, lift pen and go there
-            if (round(self.x, 1), round(self.y, 1)) != (round(x, 1), round(y, 1)):
-                self.xy(x, y, angular_step, wait, resolution)
+        if not self.worker:
+            self.worker = PlotWorker(self)
+            self.worker.start()
+
+        job = PlotJob(
+            [{"lines": lines, "repeat": 1}],
+            bounds=bounds,
+            angular_step=angular_step,
+            wait=wait,
+            resolution=resolution,
+            flip=flip,
+            rotate=rotate,
+        )
+        self.worker.jobs.put(job)
 
-            for point in line[1:]:
-                x, y = point
-                self.xy(x, y, angular_step, wait, resolution, draw=True)
+        return job
 
-        self.park()
+    def estimate(
+        self,
+        lines=[],
+        bounds=None,
+        angular_step=None,
+        wait=None,
+        resolution=None,
+        gap=None,
+        fix=None,
+    ):
+        """Works out how long ``plot_lines()`` would take to draw ``lines``, without drawing them.
+        See ``estimate_layers()``."""
+
+        return self.estimate_layers(
+            [{"lines": lines, "repeat": 1}],
+            bounds,
+            angular_step,
+            wait,
+            resolution,
+            gap=gap,
+            fix=fix,
+        )
+
+    def estimate_layers(
+        self,
+        layers=[],
+        bounds=None,
+        angular_step=None,
+        wait=None,
+        resolution=None,
+        fit_lines=None,
+        gap=None,
+        fix=None,
+    ):
+        """Works out how long ``plot_layers()`` would take to draw ``layers``, without drawing
+        them. The lines are checked, scaled and compiled exactly as ``plot_layers()`` would do
+        with the same ``bounds``, ``fit_lines``, ``gap`` and ``fix``, so the number of steps is
+        exact. Returns a dictionary of:
+
+        * ``drawing``, ``travel``: the time spent waiting between steps with the pen down and up
+        * ``pen``: the time spent raising and lowering the pen (less the time the arms spend
+          moving while it rises, if the pen's ``lift_overlap`` is set)
+        * ``overhead``: the time taken to compile the lines, and the time likely to be lost at
+          each step, judging by the plotter's ``scheduler`` so far
+        * ``total``: all of those, in seconds
+        * ``steps``, ``pen_movements``: the number of each
+        """
+
+        started = perf_counter()
+
+        wait = wait if wait is not None else self.wait
+        angular_step = angular_step or self.angular_step
+        bounds = bounds or self.bounds
+
+        layers = self.checked_layers(layers, bounds, resolution, fit_lines, fix)
+
+        passes = self.compile_layers(layers, angular_step, resolution, gap=gap)
+
+        steps = pen_movements = 0
+        drawing = travel = overlapped = 0.0
+        pen_down = self.pen.position == "down"
+        # the scheduler starts again with the drawing, so its first step isn't waited for
+        started_drawing = False
+        ease_time = self.pen.ease_time()
+        overlap = self.pen.lift_overlap and ease_time > 0
+
+        for this_pass in passes:
+            trajectory = this_pass["trajectory"]
+            draw = trajectory.draw
+            if not len(draw):
+                continue
+
+            if trajectory.waits is not None:
+                step_waits = trajectory.waits
+            else:
+                step_waits = numpy.full(len(draw), float(wait))
+
+            # Within a pass: the step after the pen moves is taken without waiting, because the
+            # scheduler starts again (see play()).
+            changes = draw[1:] != draw[:-1]
+            waited = ~changes
+            pass_drawing = float(step_waits[1:][waited & draw[1:]].sum())
+            pass_travel = float(step_waits[1:][waited & ~draw[1:]].sum())
+
+            if overlap:
+                # A lift at step i overlaps the travel that follows it, up to the next step
+                # with the pen down; step i itself is taken without waiting.
+                lifts = numpy.flatnonzero(~draw & numpy.concatenate(([True], draw[:-1])))
+                downs = numpy.flatnonzero(draw)
+                ends = numpy.append(downs, len(draw))[numpy.searchsorted(downs, lifts)]
+                elapsed = numpy.concatenate(([0.0], numpy.cumsum(step_waits)))
+                lift_travel = elapsed[ends] - elapsed[numpy.minimum(lifts + 1, ends)]
+                lift_overlaps = numpy.minimum(lift_travel, ease_time)
+
+            for r in range(this_pass["times"]):
+                pen_movements += int(draw[0] != pen_down) + int(changes.sum())
+                first_waits = draw[0] == pen_down and started_drawing
+                started_drawing = True
+                drawing += pass_drawing + float(step_waits[0] if first_waits and draw[0] else 0)
+                travel += pass_travel + float(step_waits[0] if first_waits and not draw[0] else 0)
+                if overlap and len(lifts):
+                    # a pass that starts with the pen up only lifts it if it was down
+                    starts_lifting = lifts[0] > 0 or pen_down
+                    overlapped += float(lift_overlaps[int(not starts_lifting) :].sum())
+                pen_down = draw[-1]
+
+            steps += len(draw) * this_pass["times"]
+
+        # finally, park() lifts the pen and moves the servos back to their parked angles
+        if passes:
+            angle_1, angle_2 = passes[-1]["trajectory"].angle_1, passes[-1]["trajectory"].angle_2
+        else:
+            angle_1, angle_2 = self.angle_1, self.angle_2
+
+        park_steps = int(
+            max(
+                abs(self.servo_1_parked_angle - angle_1) / angular_step,
+                abs(self.servo_2_parked_angle - angle_2) / angular_step,
+            )
+        ) or 1
+        pen_movements += int(pen_down)
+        steps += park_steps
+        travel += (park_steps - 1) * wait
+        if overlap and pen_down:
+            overlapped += min((park_steps - 1) * wait, ease_time)
+
+        timing = self.scheduler.statistics()
+        lost_per_step = self.scheduler.lost / timing["steps"] if timing["steps"] else 0
+
+        estimate = {
+            "drawing": drawing,
+            "travel": travel,
+            "pen": pen_movements * ease_time - overlapped,
+            "overhead": perf_counter() - started + steps * lost_per_step,
+            "steps": steps,
+            "pen_movements": pen_movements,
+        }
+        estimate["total"] = sum(estimate[key] for key in ("drawing", "travel", "pen", "overhead"))
+
+        return estimate
+
+    def check(self, lines=[], bounds=None, resolution=None, fix=None):
+        """Checks that all of ``lines`` can be drawn, without moving; see ``check_layers()``."""
+
+        return self.check_layers([{"lines": lines, "repeat": 1}], bounds, resolution, fix=fix)
+
+    def check_layers(self, layers=[], bounds=None, resolution=None, fit_lines=None, fix=None):
+        """Checks, before anything moves, that every point of ``layers`` - scaled just as
+        ``plot_layers()`` would scale them - and every step between them can be drawn: that the
+        arms can reach it, that the servos' angles are within their limits (if the plotter has
+        any), and that their pulse-widths (including hysteresis correction) are within the 500 to
+        2500µs that ``set_pulse_widths()`` accepts. Returns a dictionary of:
+
+        * ``unreachable``, ``angles``, ``pulse_widths``: the problems of each kind, each an array
+          of ``[line, point]`` pairs (lines numbered through all the layers), meaning that the
+          point, or some step of the line drawn to it from the point before, can't be drawn
+        * ``bounds`` and ``layers``: the bounds used, and the scaled layers, ready to compile
+
+        ``fix`` can be:
+
+        * ``"clip"``: leaves out the points and lines that can't be drawn (the problems returned),
+          breaking lines where they are
+        * ``"shrink"``: shrinks the bounds (about their centre) until everything can be drawn, or
+          raises ``ValueError`` if nothing can
+        """
+
+        bounds = bounds or self.bounds
+        resolution = resolution or self.resolution
+        fit_lines = fit_lines or [line for layer in layers for line in layer["lines"]]
+
+        scales = numpy.arange(1, 0, -0.02).tolist() if fix == "shrink" else [1]
+        centre_x, centre_y = (bounds[0] + bounds[2]) / 2, (bounds[1] + bounds[3]) / 2
+        width, height = bounds[2] - bounds[0], bounds[3] - bounds[1]
+
+        for scale in scales:
+            if scale == 1:
+                scaled_bounds = bounds
+            else:
+                half_x, half_y = width / 2 * scale, height / 2 * scale
+                scaled_bounds = [
+                    centre_x - half_x,
+                    centre_y - half_y,
+                    centre_x + half_x,
+                    centre_y + half_y,
+                ]
+
+            scaled = self.rotate_and_scale_layers(
+                layers, flip=True, bounds=scaled_bounds, fit_lines=fit_lines
+            )
+            lines = [line for layer in scaled for line in layer["lines"]]
+            points, ends = self.line_arrays(lines)
+            bad_points, bad_steps = self.point_problems(points, ends, resolution)
+
+            if not any(bad.any() for bad in [*bad_points.values(), *bad_steps.values()]):
+                break
+
+        else:
+            if fix == "shrink":
+                raise ValueError("The lines can't be drawn at any size within the bounds")
+
+        if fix == "clip":
+            scaled = self.clip_layers(scaled, points, ends, bad_points, bad_steps)
+
+        lengths = numpy.diff(ends, prepend=0)
+        line_of_point = numpy.repeat(numpy.arange(len(ends)), lengths)
+        point_in_line = numpy.arange(len(points)) - numpy.repeat(ends - lengths, lengths)
+
+        report = {}
+        for name in bad_points:
+            bad = bad_points[name] | bad_steps[name]
+            report[name] = numpy.column_stack((line_of_point[bad], point_in_line[bad]))
+
+        report["bounds"] = scaled_bounds
+        report["layers"] = scaled
+
+        return report
+
+    def checked_layers(self, layers=[], bounds=None, resolution=None, fit_lines=None, fix=None):
+        """Returns ``layers`` scaled and checked by ``check_layers()``, ready to compile, or
+        raises ``ValueError`` if any of their lines can't be drawn and there's no ``fix``."""
+
+        check = self.check_layers(layers, bounds, resolution, fit_lines, fix)
+
+        problems = {name: check[name] for name in ("unreachable", "angles", "pulse_widths")}
+        if not fix and any(len(found) for found in problems.values()):
+            raise ValueError(
+                "Some of the lines can't be drawn: "
+                + ", ".join(
+                    f"{len(found)} {name} (first at line {found[0][0]}, point {found[0][1]})"
+                    for name, found in problems.items()
+                    if len(found)
+                )
+            )
+
+        return check["layers"]
+
+    def point_problems(self, points, ends, resolution):
+        """Works out which of ``points`` (as returned by ``line_arrays()``) can't be drawn, and
+        which of the lines drawn to them from the point before pass through positions that can't
+        be; returns two dictionaries of boolean arrays, one for each kind of problem (see
+        ``check_layers()``)."""
+
+        lengths = numpy.diff(ends, prepend=0)
+        first = numpy.zeros(len(points), bool)
+        first[(ends - lengths)[lengths > 0]] = True
+
+        # The steps within each line drawn to a point - leaving out its ends, which are checked
+        # themselves. Moves between lines are straight in servo angles, and can't go beyond them.
+        drawn = numpy.flatnonzero(~first)
+        distances = numpy.hypot(*(points[drawn] - points[drawn - 1]).T)
+        steps = numpy.ceil(distances / resolution).astype(int)
+        inner = numpy.maximum(steps - 1, 0)
+
+        owner = numpy.repeat(drawn, inner)
+        fraction = (
+            numpy.arange(len(owner)) - numpy.repeat(numpy.cumsum(inner) - inner, inner) + 1
+        ) / numpy.repeat(steps, inner)
+        vectors = points[owner] - points[owner - 1]
+        between = points[owner - 1] + vectors * fraction[:, numpy.newaxis]
+
+        positions = numpy.concatenate((points, between))
+        angles_1, angles_2 = self.xy_to_angles_array(*positions.T, strict=False)
+
+        unreachable = numpy.isnan(angles_1) | numpy.isnan(angles_2)
+        angles_1 = numpy.where(unreachable, self.servo_1_parked_angle, angles_1)
+        angles_2 = numpy.where(unreachable, self.servo_2_parked_angle, angles_2)
+
+        outside_limits = numpy.zeros(len(positions), bool)
+        for angles, limits in (
+            (angles_1, self.servo_1_angle_limits),
+            (angles_2, self.servo_2_angle_limits),
+        ):
+            if limits:
+                outside_limits |= (angles < min(limits)) | (angles > max(limits))
+
+        outside_window = numpy.zeros(len(positions), bool)
+        for pws, correction in (
+            (self.angles_to_pw_1(angles_1), self.hysteresis_correction_1),
+            (self.angles_to_pw_2(angles_2), self.hysteresis_correction_2),
+        ):
+            pws = numpy.asarray(pws, dtype=float)
+            outside_window |= (pws - abs(correction) <= 500) | (pws + abs(correction) >= 2500)
+
+        bad_points, bad_steps = {}, {}
+        for name, bad in (
+            ("unreachable", unreachable),
+            ("angles", outside_limits & ~unreachable),
+            ("pulse_widths", outside_window & ~unreachable),
+        ):
+            bad_points[name] = bad[: len(points)]
+            bad_steps[name] = numpy.zeros(len(points), bool)
+            bad_steps[name][owner[bad[len(points) :]]] = True
+
+        return bad_points, bad_steps
+
+    def clip_layers(self, layers, points, ends, bad_points, bad_steps):
+        """Returns ``layers`` without the points and steps found by ``point_problems()``: each
+        line is broken where they were."""
+
+        bad_point = numpy.logical_or.reduce(list(bad_points.values()))
+        bad_step = numpy.logical_or.reduce(list(bad_steps.values()))
+
+        lengths = numpy.diff(ends, prepend=0)
+        line_of_point = numpy.repeat(numpy.arange(len(ends)), lengths)
+
+        # a new line starts at each point that's kept, where the line couldn't be drawn to it
+        starts = numpy.ones(len(points), bool)
+        starts[1:] = (line_of_point[1:] != line_of_point[:-1]) | bad_point[:-1]
+        starts |= bad_step
+
+        kept = ~bad_point
+        new_line = numpy.cumsum(starts)[kept]
+        new_ends = numpy.append(numpy.flatnonzero(new_line[1:] != new_line[:-1]) + 1, len(new_line))
+        if not len(new_line):
+            new_ends = new_ends[:0]
+
+        lines = self.split_lines(points[kept], new_ends)
+
+        # each new line belongs to the layer its original line did
+        layer_of_line = numpy.repeat(
+            numpy.arange(len(layers)), [len(layer["lines"]) for layer in layers]
+        )
+        layer_of_new_line = layer_of_line[line_of_point[kept][new_ends - 1]]
+
+        return [
+            dict(layer, lines=[line for line, l in zip(lines, layer_of_new_line) if l == number])
+            for number, layer in enumerate(layers)
+        ]
 
     #  ----------------- pattern-drawing methods -----------------
 
@@ -235,25 +890,27 @@ class Plotter:
         if not bounds:
             return "Box drawing is only possible when the bounds attribute is set."
 
-        self.xy(bounds[0], bounds[1], angular_step, wait, resolution)
+        with self.progress.counting(description="Box"):
 
-        for r in tqdm.tqdm(tqdm.trange(repeat), desc="Iteration", leave=False):
+            self.xy(bounds[0], bounds[1], angular_step, wait, resolution)
 
-            if not reverse:
+            for r in range(repeat):
 
-                self.xy(bounds[2], bounds[1], angular_step, wait, resolution, draw=True)
-                self.xy(bounds[2], bounds[3], angular_step, wait, resolution, draw=True)
-                self.xy(bounds[0], bounds[3], angular_step, wait, resolution, draw=True)
-                self.xy(bounds[0], bounds[1], angular_step, wait, resolution, draw=True)
+                if not reverse:
 
-            else:
+                    self.xy(bounds[2], bounds[1], angular_step, wait, resolution, draw=True)
+                    self.xy(bounds[2], bounds[3], angular_step, wait, resolution, draw=True)
+                    self.xy(bounds[0], bounds[3], angular_step, wait, resolution, draw=True)
+                    self.xy(bounds[0], bounds[1], angular_step, wait, resolution, draw=True)
 
-                self.xy(bounds[0], bounds[3], angular_step, wait, resolution, draw=True)
-                self.xy(bounds[2], bounds[3], angular_step, wait, resolution, draw=True)
-                self.xy(bounds[2], bounds[1], angular_step, wait, resolution, draw=True)
-                self.xy(bounds[0], bounds[1], angular_step, wait, resolution, draw=True)
+                else:
 
-        self.park()
+                    self.xy(bounds[0], bounds[3], angular_step, wait, resolution, draw=True)
+                    self.xy(bounds[2], bounds[3], angular_step, wait, resolution, draw=True)
+                    self.xy(bounds[2], bounds[1], angular_step, wait, resolution, draw=True)
+                    self.xy(bounds[0], bounds[1], angular_step, wait, resolution, draw=True)
+
+            self.park()
 
     def test_pattern(
         self,
@@ -353,19 +1010,59 @@ class Plotter:
         if both:
             self.xy(start_x, start_y, angular_step, wait, resolution, draw=True)
 
-    def xy(self, x=None, y=None, angular_step=None, wait=None, resolution=None, draw=False):
+    def xy(
+        self,
+        x=None,
+        y=None,
+        angular_step=None,
+        wait=None,
+        resolution=None,
+        draw=False,
+        tolerance=None,
+    ):
         """Moves the pen to the xy position; optionally draws while doing it. ``None`` for x or y
         means that the pen will not be moved in that dimension.
+
+        A line is drawn in steps no longer than ``resolution`` - or, given a ``tolerance``, in
+        steps as long as they can be without straying further than that from the line (see
+        ``chord_steps()``).
         """
 
         wait = wait if wait is not None else self.wait
         resolution = resolution or self.resolution
+        tolerance = tolerance or self.tolerance
 
         x = x if x is not None else self.x
         y = y if y is not None else self.y
         (angle_1, angle_2) = self.xy_to_angles(x, y)
 
-        if draw:
+        self.scheduler.reset()
+
+        if draw and tolerance:
+
+            (start_x, start_y) = (self.x, self.y)
+            (x_length, y_length) = (x - start_x, y - start_y)
+
+            steps, fractions = self.chord_steps(
+                numpy.array([[start_x, start_y]]), numpy.array([[x, y]]), resolution, tolerance
+            )
+            tracer = self.tracer
+
+            for fraction in fractions.tolist():
+
+                self.x = start_x + x_length * fraction
+                self.y = start_y + y_length * fraction
+
+                sampling = tracer and tracer.sampling
+                if sampling:
+                    start = tracer.clock()
+                angle_1, angle_2 = self.xy_to_angles(self.x, self.y)
+                if sampling:
+                    tracer.span("kinematics", start)
+
+                self.move_angles(angle_1, angle_2, angular_step, wait, draw)
+
+        elif draw:
 
             # calculate how many steps we need for this move, and the x/y length of each
             (x_length, y_length) = (x - self.x, y - self.y)
@@ -374,19 +1071,21 @@ class Plotter:
 
             no_of_steps = round(length / resolution) or 1
 
-            if no_of_steps < 100:
-                disable_tqdm = True
-            else:
-                disable_tqdm = False
-
             (length_of_step_x, length_of_step_y) = (x_length / no_of_steps, y_length / no_of_steps)
+            tracer = self.tracer
 
             for step in range(no_of_steps):
 
                 self.x = self.x + length_of_step_x
                 self.y = self.y + length_of_step_y
 
+                sampling = tracer and tracer.sampling
+                if sampling:
+                    start = tracer.clock()
                 angle_1, angle_2 = self.xy_to_angles(self.x, self.y)
+                if sampling:
+                    tracer.span("kinematics", start)
+
                 self.move_angles(angle_1, angle_2, angular_step, wait, draw)
 
         else:
@@ -402,11 +1101,16 @@ class Plotter:
         wait = wait if wait is not None else self.wait
         angular_step = angular_step or self.angular_step
 
+        pen_position = self.pen.position
+
         if draw:
             self.pen.down()
         else:
             self.pen.up()
 
+        if self.pen.position != pen_position:
+            self.scheduler.reset()
+
         diff_1 = diff_2 = 0
 
         if angle_1 is not None:
@@ -416,27 +1120,746 @@ class Plotter:
 
         no_of_steps = int(max(map(abs, (diff_1 / angular_step, diff_2 / angular_step)))) or 1
 
-        if no_of_steps < 100:
-            disable_tqdm = True
+        (length_of_step_1, length_of_step_2) = (diff_1 / no_of_steps, diff_2 / no_of_steps)
+        tracer = self.tracer
+        progress = self.progress
+        start_1, start_2 = self.angle_1, self.angle_2
+        played = 0
+
+        try:
+            for step in range(no_of_steps):
+
+                self.angle_1 = self.angle_1 + length_of_step_1
+                self.angle_2 = self.angle_2 + length_of_step_2
+
+                sampling = tracer and tracer.sampling
+                if sampling:
+                    start = tracer.clock()
+                self.scheduler.wait(wait)
+                if sampling:
+                    tracer.span("sleep", start)
+
+                self.set_angles(self.angle_1, self.angle_2)
+                played = step + 1
+
+                if tracer:
+                    tracer.next_step()
+
+                progress.steps += 1
+                if progress.steps >= progress.due:
+                    progress.refresh()
+
+        finally:
+            if self.run_record:
+                steps = numpy.arange(1, played + 1)
+                self.run_record.add_steps(
+                    start_1 + steps * length_of_step_1,
+                    start_2 + steps * length_of_step_2,
+                    numpy.full(played, self.pen.position == "down"),
+                    start_1,
+                    start_2,
+                )
+
+    #  ----------------- compiled drawing methods -----------------
+
+    def compile_layers(
+        self, layers, angular_step=None, resolution=None, resume_from=None, gap=None
+    ):
+        """Compiles the passes that ``plot_layers()`` makes over (already scaled) ``layers``:
+        a list of dictionaries, each with the ``trajectory``, the number of ``times`` to play it,
+        the number of ``lines`` in it, and the ``layer`` and ``repetition`` it starts.
+
+        Each layer is compiled once for its first pass, and once more for any repeats (which start
+        from the end of the layer rather than from wherever the plotter was). If ``resume_from``
+        (a checkpoint) is supplied, the layer being resumed starts with a pass over the rest of the
+        repetition that was interrupted.
+        """
+
+        passes = []
+        trajectory = None
+
+        for number, layer in enumerate(layers):
+            lines = [line for line in layer["lines"] if len(line)]
+            no_of_lines = len(lines)
+            repeat = layer.get("repeat", 1)
+            this_pass = {"layer": number, "repetition": 0, "times": 1, "lines": no_of_lines}
+
+            if resume_from:
+                if number < resume_from["layer"]:
+                    continue
+
+                if number == resume_from["layer"]:
+                    # restart the interrupted line from the start of the segment being drawn
+                    line, point = resume_from["line"], max(resume_from["point"] - 1, 0)
+                    lines = [lines[line][point:]] + lines[line + 1 :]
+                    this_pass.update(
+                        repetition=resume_from["repetition"],
+                        lines=len(lines),
+                        line_offset=line,
+                        point_offset=point,
+                    )
+
+            trajectory = self.compile_lines(
+                lines, angular_step, resolution, start=trajectory, gap=gap
+            )
+            passes.append(dict(this_pass, trajectory=trajectory))
+
+            repeats = repeat - this_pass["repetition"] - 1
+            if repeats > 0:
+                trajectory = self.compile_lines(
+                    layer["lines"], angular_step, resolution, start=trajectory, gap=gap
+                )
+                passes.append(
+                    {
+                        "layer": number,
+                        "repetition": this_pass["repetition"] + 1,
+                        "times": repeats,
+                        "lines": no_of_lines,
+                        "trajectory": trajectory,
+                    }
+                )
+
+        return passes
+
+    def compile_lines(
+        self, lines=[], angular_step=None, resolution=None, start=None, tolerance=None, gap=None
+    ):
+        """Works out in advance every step that drawing ``lines`` (already scaled to the drawing
+        area) would take, exactly as ``xy()`` and ``move_angles()`` would take them, and returns a
+        :class:`Trajectory` containing the angles and pulse-widths (hysteresis correction
+        included) of each step, ready to ``play()``.
+
+        The trajectory starts from the plotter's current position and state, or if ``start`` (a
+        ``Trajectory``) is supplied, from the end of that.
+
+        If there's a ``tolerance`` (or the plotter has one), drawn moves are divided by
+        ``chord_steps()`` rather than into steps of ``resolution``.
+
+        Where a line starts no more than ``gap`` (or the plotter's ``gap``) from the end of the
+        one before, the pen stays down and draws across to it, rather than being lifted.
+        """
+
+        angular_step = angular_step or self.angular_step
+        resolution = resolution or self.resolution
+        tolerance = tolerance or self.tolerance
+        gap = gap if gap is not None else self.gap
+
+        if start is None:
+            x, y = self.x, self.y
+            angle_1, angle_2 = self.angle_1, self.angle_2
+            previous_pw_1, previous_pw_2 = self.previous_pw_1, self.previous_pw_2
+            hysteresis_1 = self.active_hysteresis_correction_1
+            hysteresis_2 = self.active_hysteresis_correction_2
         else:
-            disable_tqdm = False
+            x, y = start.x, start.y
+            angle_1, angle_2 = start.angle_1, start.angle_2
+            previous_pw_1, previous_pw_2 = start.previous_pw_1, start.previous_pw_2
+            hysteresis_1, hysteresis_2 = start.hysteresis_1, start.hysteresis_2
+
+        # if there's nowhere to go, the trajectory is empty, and ends where it starts
+        trajectory = Trajectory()
+        trajectory.set_end(
+            x, y, angle_1, angle_2, previous_pw_1, previous_pw_2, hysteresis_1, hysteresis_2
+        )
 
-        (length_of_step_1, length_of_step_2) = (diff_1 / no_of_steps, diff_2 / no_of_steps)
+        lines = [line for line in lines if len(line)]
+        if not lines:
+            return trajectory
 
-        for step in tqdm.tqdm(
-            range(no_of_steps), desc="Progress", leave=False, disable=disable_tqdm
-        ):
+        # All the points, with the line each belongs to and its position in the line.
+        points, ends = self.line_arrays(lines)
+        lengths = numpy.diff(ends, prepend=0)
+        line_of_point = numpy.repeat(numpy.arange(len(lines)), lengths)
+        point_in_line = numpy.arange(len(points)) - numpy.repeat(
+            numpy.cumsum(lengths) - lengths, lengths
+        )
 
-            self.angle_1 = self.angle_1 + length_of_step_1
-            self.angle_2 = self.angle_2 + length_of_step_2
+        # Each point is reached by a move from the previous one; the first point of each line by a
+        # pen-up move - unless we are already within 1mm of it, or the gap from the end of the
+        # line before is small enough to draw across - and the others by drawing.
+        origins = numpy.concatenate(([[x, y]], points[:-1]))
+        draw = point_in_line > 0
+        needed = draw | numpy.any(numpy.round(origins, 1) != numpy.round(points, 1), axis=1)
+        if not needed.any():
+            return trajectory
+
+        bridged = ~draw & needed & (numpy.hypot(*(points - origins).T) <= gap)
+        bridged[0] = False
+        draw = draw | bridged
+        bridged = bridged[needed]
+
+        origins, targets = origins[needed], points[needed]
+        draw = draw[needed]
+        line_of_point, point_in_line = line_of_point[needed], point_in_line[needed]
+
+        # Drawn moves are broken into steps no longer than resolution, or as long as tolerance
+        # allows, as in xy().
+        if tolerance and draw.any():
+            xy_steps = numpy.ones(len(targets), dtype=int)
+            xy_steps[draw], drawn_fractions = self.chord_steps(
+                origins[draw], targets[draw], resolution, tolerance
+            )
+            fraction = numpy.ones(xy_steps.sum())
+            fraction[numpy.repeat(draw, xy_steps)] = drawn_fractions
+        else:
+            distances = numpy.hypot(*(targets - origins).T)
+            xy_steps = numpy.where(draw, numpy.round(distances / resolution), 1)
+            xy_steps = numpy.maximum(xy_steps, 1).astype(int)
+            fraction = self.step_fractions(xy_steps)
+
+        move = numpy.repeat(numpy.arange(len(targets)), xy_steps)
+        fraction = fraction[:, numpy.newaxis]
+        xys = origins[move] + (targets - origins)[move] * fraction
+
+        # ...and each of those is broken into steps of no more than angular_step, as in
+        # move_angles().
+        angles = numpy.column_stack(self.xy_to_angles_array(xys[:, 0], xys[:, 1]))
+        previous_angles = numpy.concatenate(([[angle_1, angle_2]], angles[:-1]))
+        differences = angles - previous_angles
+
+        angle_steps = numpy.abs(differences).max(axis=1) / angular_step
+        angle_steps = numpy.maximum(angle_steps.astype(int), 1)
+
+        move = numpy.repeat(move, angle_steps)
+        xy_move = numpy.repeat(numpy.arange(len(angles)), angle_steps)
+        fraction = self.step_fractions(angle_steps)[:, numpy.newaxis]
+        angles = previous_angles[xy_move] + differences[xy_move] * fraction
+
+        trajectory.angles_1, trajectory.angles_2 = angles[:, 0], angles[:, 1]
+        trajectory.draw = draw[move]
+        trajectory.lines = line_of_point[move]
+        trajectory.points = point_in_line[move]
+
+        first_steps = numpy.concatenate(([True], move[1:] != move[:-1]))
+        trajectory.bridges = numpy.flatnonzero(first_steps & bridged[move])
+
+        if self.max_speeds is not None:
+            trajectory.waits = self.motion_profile(
+                numpy.diff(angles, axis=0, prepend=[[angle_1, angle_2]]), trajectory.draw
+            )
+
+        pws_1 = numpy.asarray(self.angles_to_pw_1(trajectory.angles_1), dtype=float)
+        pws_2 = numpy.asarray(self.angles_to_pw_2(trajectory.angles_2), dtype=float)
+
+        trajectory.pws_1, direction_1 = self.apply_hysteresis(
+            pws_1, previous_pw_1, hysteresis_1, self.hysteresis_correction_1
+        )
+        trajectory.pws_2, direction_2 = self.apply_hysteresis(
+            pws_2, previous_pw_2, hysteresis_2, self.hysteresis_correction_2
+        )
 
-            time_since_last_moved = monotonic() - self.last_moved
-            if time_since_last_moved < wait:
-                sleep(wait - time_since_last_moved)
+        trajectory.set_end(
+            float(targets[-1, 0]),
+            float(targets[-1, 1]),
+            float(angles[-1, 0]),
+            float(angles[-1, 1]),
+            float(pws_1[-1]),
+            float(pws_2[-1]),
+            float(direction_1 * self.hysteresis_correction_1),
+            float(direction_2 * self.hysteresis_correction_2),
+        )
 
-            self.set_angles(self.angle_1, self.angle_2)
+        return trajectory
 
-            self.last_moved = monotonic()
+    def chord_steps(self, origins, targets, resolution, tolerance):
+        """Divides straight moves from ``origins`` to ``targets`` (arrays of x/y points) into as
+        few steps as possible, such that moving the servos at steady rates over each step - as
+        ``move_angles()`` does - keeps the pen within ``tolerance`` of the line.
+
+        Where a small change of angle moves the pen a long way (near the limit of the arms'
+        reach), or where the servos' movements happen to trace a nearly straight line, steps can
+        be long; where they can't, they are short. Returns the number of steps for each move, and
+        the fraction of its move that each step reaches (as ``step_fractions()`` does).
+
+        To find out how quickly the pen strays from a line, each move is measured in pieces of
+        ``resolution``. A steady movement of the servos from one end of a piece to the other
+        misses the middle of the piece by some distance; for short pieces, that's proportional to
+        the square of their length, so a step can span pieces whose ``sqrt(distance /
+        tolerance)`` add up to no more than 1.
+        """
+
+        distances = numpy.hypot(*(targets - origins).T)
+        pieces = numpy.maximum(numpy.round(distances / resolution), 1).astype(int)
+
+        move = numpy.repeat(numpy.arange(len(targets)), pieces)
+        ends = self.step_fractions(pieces)
+        starts = ends - 1 / pieces[move]
+        vectors = (targets - origins)[move]
+        piece_starts = origins[move] + vectors * starts[:, numpy.newaxis]
+        piece_ends = origins[move] + vectors * ends[:, numpy.newaxis]
+
+        start_angles = numpy.column_stack(self.xy_to_angles_array(*piece_starts.T))
+        end_angles = numpy.column_stack(self.xy_to_angles_array(*piece_ends.T))
+        middles = numpy.column_stack(
+            self.angles_to_xy_array(*((start_angles + end_angles) / 2).T)
+        )
+        misses = numpy.hypot(*(middles - (piece_starts + piece_ends) / 2).T)
+
+        # how many steps each piece needs, and so each move
+        needs = numpy.sqrt(misses / tolerance)
+        first_pieces = numpy.cumsum(pieces) - pieces
+        totals = numpy.add.reduceat(needs, first_pieces)
+        steps = numpy.maximum(numpy.ceil(totals - 1e-9), 1).astype(int)
+
+        # Each step ends where the needs of the pieces so far, as a fraction of the move's, reach
+        # its share of them. The moves are laid end to end, two apart, so that one interpolation
+        # finds them all.
+        so_far = numpy.cumsum(needs) - numpy.repeat(numpy.cumsum(totals) - totals, pieces)
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            so_far = numpy.where(totals[move] > 0, so_far / totals[move], ends)
+
+        knots = numpy.concatenate((2 * numpy.arange(len(targets)), 2 * move + so_far))
+        knot_fractions = numpy.concatenate((numpy.zeros(len(targets)), ends))
+        order = numpy.argsort(knots, kind="stable")
+
+        step_move = numpy.repeat(numpy.arange(len(targets)), steps)
+        wanted = 2 * step_move + self.step_fractions(steps)
+        fractions = numpy.interp(wanted, knots[order], knot_fractions[order])
+        fractions[numpy.cumsum(steps) - 1] = 1
+
+        return steps, fractions
+
+    def motion_profile(self, movements, draw):
+        """Works out how long each step should take, so that neither servo exceeds its maximum
+        speed or acceleration, given the movement of each servo in each step (an array of
+        angle pairs) and whether the pen is down for it. Returns an array of times in seconds.
+
+        Each step is given a speed - how fast the servo that moves furthest in it should move.
+        That is limited by:
+
+        * the maximum speed of each servo
+        * the change in the servos' velocities where the direction of movement changes from one
+          step to the next, which must be possible within the maximum acceleration, so that the
+          plotter slows down for sharp corners but not for gentle curves
+        * stopping completely whenever the pen is raised or lowered, and at the end
+
+        and then by the acceleration needed to reach each speed from the ones before it, and to
+        slow down for the ones after it - a trapezoidal speed profile, planned across the whole
+        drawing at once.
+        """
+
+        # Steps that don't move the servos (which can happen at the ends of lines) take no time,
+        # and are left out of the planning.
+        lengths = numpy.abs(movements).max(axis=1)
+        moving = lengths > 1e-9
+        waits = numpy.zeros(len(lengths))
+
+        if not moving.any():
+            return waits
+
+        if not moving.all():
+            waits[moving] = self.motion_profile(movements[moving], draw[moving])
+            return waits
+
+        directions = movements / lengths[:, numpy.newaxis]
+
+        # Where the pen moves the servos are at rest, so the direction before the first step after
+        # it, and after the last step before it, is nothing.
+        rest_before = numpy.concatenate(([True], draw[1:] != draw[:-1]))
+        rest_after = numpy.concatenate((rest_before[1:], [True]))
+        previous = numpy.concatenate(([[0, 0]], directions[:-1]))
+        previous[rest_before] = 0
+
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+
+            speeds = (self.max_speeds / numpy.abs(directions)).min(axis=1)
+            accelerations = (self.max_accelerations / numpy.abs(directions)).min(axis=1)
+
+            # Changing velocity by (speed * change in direction) within a step of (length / speed)
+            # takes an acceleration of speed² * change / length.
+            def corner_speeds(change):
+                return numpy.sqrt(
+                    self.max_accelerations * lengths[:, numpy.newaxis] / numpy.abs(change)
+                ).min(axis=1)
+
+            starting = corner_speeds(directions - previous)
+            stopping = corner_speeds(directions)
+
+        # the speed through the corner at the end of each step is the same as at the start of the
+        # next, unless the servos stop there
+        ending = numpy.where(rest_after, stopping, numpy.append(starting[1:], numpy.inf))
+        limits = numpy.minimum.reduce([speeds, starting, ending])
+
+        # Accelerating over each step can increase the square of the speed by 2 * acceleration *
+        # length (v² = u² + 2as). Going forwards, each speed is limited by the ones before it,
+        # and going backwards (slowing down), by the ones after it:
+        # speed[i]² = min(limit[i]², speed[i - 1]² + gain[i]).
+        gains = 2 * accelerations * lengths
+        squares = self.limit_gains(limits**2, gains)
+        squares = self.limit_gains(squares[::-1], numpy.append(gains[1:], 0)[::-1])[::-1]
+
+        return lengths / numpy.sqrt(squares)
+
+    @staticmethod
+    def limit_gains(limits, gains):
+        """Returns ``x`` where ``x[i] = min(limits[i], x[i - 1] + gains[i])``, without a loop:
+        unrolled, ``x[i] = min(limits[j] + gains[j + 1] + ... + gains[i])`` over ``j <= i``."""
+
+        # Nothing larger than the largest finite limit makes any difference, and infinities
+        # would spoil the sums.
+        finite = limits[numpy.isfinite(limits)]
+        ceiling = finite.max() if len(finite) else 1
+        limits, gains = numpy.minimum(limits, ceiling), numpy.minimum(gains, ceiling)
+
+        totals = numpy.cumsum(gains)
+        return totals + numpy.minimum.accumulate(limits - totals)
+
+    @staticmethod
+    def step_fractions(steps):
+        """For moves divided into the given numbers of steps, returns the fraction of its move that
+        each step has reached, e.g. ``[2, 3]`` gives ``[0.5, 1, 0.333, 0.667, 1]``."""
+
+        ends = numpy.cumsum(steps)
+        counts = numpy.arange(1, ends[-1] + 1) - numpy.repeat(ends - steps, steps)
+        return counts / numpy.repeat(steps, steps)
+
+    @staticmethod
+    def apply_hysteresis(pws, previous_pw, active_correction, correction):
+        """Adds the hysteresis correction to a series of pulse-widths, as ``set_angles()`` would:
+        added when the pulse-width is increasing, subtracted when it's decreasing, and unchanged
+        when it stays the same. Returns the corrected pulse-widths, and the final direction."""
+
+        direction = numpy.sign(numpy.diff(pws, prepend=previous_pw))
+
+        # carry the last direction of movement forward over steps where there is none
+        initial = numpy.sign(active_correction) * numpy.sign(correction)
+        moved = numpy.where(direction != 0, numpy.arange(len(direction)), -1)
+        moved = numpy.maximum.accumulate(moved)
+        direction = numpy.where(moved >= 0, direction[moved], initial)
+
+        return pws + direction * correction, direction[-1]
+
+    def play(self, trajectory, wait=None, job=None, checkpoint=None):
+        """Executes a :class:`Trajectory` prepared by ``compile_lines()``, sending its
+        pre-calculated pulse-widths to the servos step by step.
+
+        If it's being played for a :class:`~jobs.PlotJob`, the job's progress is kept up to date,
+        and if the job is stopped, playing stops before the next step (or with a ``wave_player``,
+        doesn't start). If there's a
+        :class:`~checkpoints.Checkpoint`, it's saved every so many steps, and if playing is
+        interrupted by an exception."""
+
+        wait = wait if wait is not None else self.wait
+
+        if not len(trajectory):
+            return
+
+        record = self.run_record
+        progress = self.progress
+
+        if job:
+            job.trajectory = trajectory
+
+        if self.wave_player:
+            # a trajectory played as waveforms can only be stopped before it starts
+            if job and job.stopping.is_set():
+                return
+            if record:
+                record.mark("compute")
+            self.play_waves(trajectory, wait)
+            if job:
+                job.step = len(trajectory)
+            progress.steps += len(trajectory)
+            progress.refresh()
+            if record:
+                record.mark_trajectory(trajectory, wait)
+            if checkpoint:
+                checkpoint.save(trajectory, len(trajectory))
+            return
+
+        set_pulse_widths = self.set_pulse_widths
+        turtle = self.turtle
+        pen = self.pen
+        scheduler = self.scheduler
+        tracer = self.tracer
+        angles_1, angles_2 = trajectory.angles_1.tolist(), trajectory.angles_2.tolist()
+        pws_1, pws_2 = trajectory.pws_1.tolist(), trajectory.pws_2.tolist()
+        draw = trajectory.draw.tolist()
+        waits = trajectory.waits.tolist() if trajectory.waits is not None else [wait] * len(draw)
+
+        played = 0
+        next_checkpoint = checkpoint.every if checkpoint else len(trajectory)
+
+        if record:
+            record.mark("drawing" if pen.position == "down" else "travel")
+
+        # unless the trajectory is part of a larger drawing, its steps are counted on their own
+        counting = progress.start(len(trajectory), silent=bool(job))
+
+        try:
+            for step in range(len(trajectory)):
+
+                if job:
+                    if job.stopping.is_set():
+                        break
+                    job.step = step
+
+                if step == next_checkpoint:
+                    checkpoint.save(trajectory, step)
+                    next_checkpoint += checkpoint.every
+
+                if draw[step] != (pen.position == "down"):
+                    if record:
+                        record.mark("pen")
+                    if draw[step]:
+                        pen.down()
+                    else:
+                        pen.up()
+                    if record:
+                        record.mark("drawing" if draw[step] else "travel")
+                    scheduler.reset()
+
+                sampling = tracer and tracer.sampling
+                if sampling:
+                    start = tracer.clock()
+                scheduler.wait(waits[step])
+                if sampling:
+                    start = tracer.span("sleep", start)
+
+                if turtle:
+                    turtle.set_angles(angles_1[step], angles_2[step])
+                    if sampling:
+                        tracer.span("turtle", start)
+
+                set_pulse_widths(pws_1[step], pws_2[step])
+                played = step + 1
+
+                if tracer:
+                    tracer.next_step()
+
+                progress.steps += 1
+                if progress.steps >= progress.due:
+                    progress.refresh()
+
+        except BaseException:
+            if checkpoint:
+                checkpoint.save(trajectory, played)
+            raise
+
+        finally:
+            if counting:
+                progress.finish()
+
+            if job:
+                job.step = played
+
+            if record:
+                record.mark("compute")
+
+            self.finish_trajectory(trajectory, played)
+
+    def play_waves(self, trajectory, wait=None):
+        """Plays a :class:`Trajectory` using the plotter's ``wave_player`` (a
+        :class:`waveforms.WavePlayer`), so that the timing of each step is handled by pigpio
+        rather than by Python.
+
+        Wherever the pen is raised or lowered, the arms are held where they are while the pen
+        eases through the same pulse-widths, over the same time, as ``Pen.ease_pen()`` would take
+        it, before they move on to the next step."""
+
+        wait = wait if wait is not None else self.wait
+
+        if not len(trajectory):
+            return
+
+        pen = self.pen
+        pen.settle()
+
+        draw = trajectory.draw
+        pws_1, pws_2 = trajectory.pws_1, trajectory.pws_2
+        pen_pws = numpy.where(draw, pen.pw_down, pen.pw_up)
+        waits = trajectory.waits if trajectory.waits is not None else wait
+        waits = numpy.broadcast_to(numpy.asarray(waits, dtype=float), len(trajectory))
+
+        # the steps at which the pen is raised or lowered
+        was_down = numpy.concatenate(([pen.position == "down"], draw[:-1]))
+        changes = numpy.flatnonzero(draw != was_down)
+
+        if len(changes):
+            # the pulse-widths and waits of each run of steps, with the pen easing between them
+            runs = []
+            start = 0
+            for change in changes:
+                if change:
+                    held_1, held_2 = pws_1[change - 1], pws_2[change - 1]
+                else:
+                    held_1, held_2 = self.get_pulse_widths()
+                if draw[change]:
+                    ease = pen.ease_profile(pen.pw_up, pen.pw_down)
+                else:
+                    ease = pen.ease_profile(pen.pw_down, pen.pw_up)
+                ease_time = len(ease) * 0.001 if pen.ease_duration is None else pen.ease_duration
+                ease_waits = numpy.full(len(ease), ease_time / len(ease))
+                # the pen is held where it ends up for at least one frame, so that it's not
+                # sampled in the same frame as the arms' next move
+                ease_waits[-1] = max(ease_waits[-1], self.wave_player.frame / 1000000)
+
+                runs.append(
+                    (
+                        pws_1[start:change],
+                        pws_2[start:change],
+                        pen_pws[start:change],
+                        waits[start:change],
+                    )
+                )
+                runs.append(
+                    (
+                        numpy.full(len(ease), held_1),
+                        numpy.full(len(ease), held_2),
+                        numpy.array(ease),
+                        ease_waits,
+                    )
+                )
+                start = change
+
+            runs.append((pws_1[start:], pws_2[start:], pen_pws[start:], waits[start:]))
+            pws_1, pws_2, pen_pws, waits = (numpy.concatenate(run) for run in zip(*runs))
+
+            pen.lifts += int(numpy.count_nonzero(was_down[changes]))
+
+        self.wave_player.play(pws_1, pws_2, pen_pws, waits)
+
+        if self.virtual:
+            self.virtual_pw_1 = int(pws_1[-1])
+            self.virtual_pw_2 = int(pws_2[-1])
+            pen.virtual_pw = int(pen_pws[-1])
+        pen.position = "down" if draw[-1] else "up"
+
+        self.scheduler.reset()
+        self.finish_trajectory(trajectory)
+
+    @contextmanager
+    def record_program(self, filename):
+        """Records every step that the plotter takes in the ``with`` block as a compiled program
+        in ``filename``, for ``replay()``::
+
+            with bg.record_program("africa.program"):
+                bg.plot_file("images/africa.json")
+
+        Best done with a virtual plotter, which doesn't wait between steps while recording (see
+        :class:`~programs.ProgramRecorder`), so that the program is ready as soon as the drawing
+        has been worked out.
+        """
+
+        recorder = ProgramRecorder(self, filename)
+        scheduler, self.scheduler = self.scheduler, recorder
+        # steps played as pigpio waveforms don't go through set_pulse_widths()
+        wave_player, self.wave_player = self.wave_player, None
+        self.program = recorder
+
+        try:
+            yield recorder
+        finally:
+            self.program = None
+            self.scheduler, self.wave_player = scheduler, wave_player
+            recorder.close()
+
+    def replay(self, filename, chunk_size=4096):
+        """Plays a program recorded by ``record_program()``, sending exactly the pulse-widths that
+        were recorded, with the same timing, and easing the pen wherever it was raised or lowered.
+        Nothing is worked out again, and the program is read from the file ``chunk_size`` steps
+        at a time, memory-mapped, so that a program of any length can be replayed.
+
+        Afterwards, the plotter's position is that at the end of the program - or if replaying
+        was interrupted, as near as the last pulse-widths sent can show it. The turtle isn't
+        drawn, because the program doesn't include the angles.
+        """
+
+        end_angles, steps = read_program(filename)
+
+        set_pulse_widths = self.set_pulse_widths
+        pen = self.pen
+        scheduler = self.scheduler
+        progress = self.progress
+
+        pw_1, pw_2 = self.get_pulse_widths()
+        pen_pw = pen.pw_down if pen.position == "down" else pen.pw_up
+        played = 0
+        scheduler.reset()
+
+        try:
+            with progress.counting(len(steps), "Replaying"):
+                for start in range(0, len(steps), chunk_size):
+                    chunk = steps[start : start + chunk_size].tolist()
+
+                    for step_pw_1, step_pw_2, step_pen_pw, wait in chunk:
+
+                        if step_pen_pw != pen_pw:
+                            if step_pen_pw == pen.pw_down:
+                                pen.down()
+                            elif step_pen_pw == pen.pw_up:
+                                pen.up()
+                            else:
+                                pen.pw(step_pen_pw)
+                            pen_pw = step_pen_pw
+                            scheduler.reset()
+
+                        scheduler.wait(wait / 1000000)
+
+                        set_pulse_widths(
+                            step_pw_1 if step_pw_1 != pw_1 else None,
+                            step_pw_2 if step_pw_2 != pw_2 else None,
+                        )
+                        pw_1, pw_2 = step_pw_1, step_pw_2
+                        played += 1
+
+                        progress.steps += 1
+                        if progress.steps >= progress.due:
+                            progress.refresh()
+
+        finally:
+            if played == len(steps):
+                self.angle_1, self.angle_2 = end_angles
+            else:
+                # the angles whose pulse-widths are nearest to those sent last
+                angles = numpy.arange(-180, 180.1, 0.1)
+                self.angle_1 = float(angles[numpy.abs(self.angles_to_pw_1(angles) - pw_1).argmin()])
+                self.angle_2 = float(angles[numpy.abs(self.angles_to_pw_2(angles) - pw_2).argmin()])
+
+            self.previous_pw_1 = float(self.angles_to_pw_1(self.angle_1))
+            self.previous_pw_2 = float(self.angles_to_pw_2(self.angle_2))
+            self.active_hysteresis_correction_1 = pw_1 - self.previous_pw_1
+            self.active_hysteresis_correction_2 = pw_2 - self.previous_pw_2
+            self.x, self.y = self.angles_to_xy(self.angle_1, self.angle_2)
+
+    def finish_trajectory(self, trajectory, steps=None):
+        """Updates the plotter's position and state to the end of a :class:`Trajectory` that has
+        been played - or if only its first ``steps`` were played, to the end of those."""
+
+        if self.run_record:
+            self.run_record.add_trajectory(trajectory, steps, self.angle_1, self.angle_2)
+
+        if steps is None or steps >= len(trajectory):
+            steps = len(trajectory)
+            self.angle_1, self.angle_2 = trajectory.angle_1, trajectory.angle_2
+            self.previous_pw_1 = trajectory.previous_pw_1
+            self.previous_pw_2 = trajectory.previous_pw_2
+            self.active_hysteresis_correction_1 = trajectory.hysteresis_1
+            self.active_hysteresis_correction_2 = trajectory.hysteresis_2
+
+        elif steps:
+            self.angle_1 = float(trajectory.angles_1[steps - 1])
+            self.angle_2 = float(trajectory.angles_2[steps - 1])
+            self.previous_pw_1 = float(self.angles_to_pw_1(self.angle_1))
+            self.previous_pw_2 = float(self.angles_to_pw_2(self.angle_2))
+            # whatever was added to the last pulse-widths played was the active correction
+            pw_1, pw_2 = float(trajectory.pws_1[steps - 1]), float(trajectory.pws_2[steps - 1])
+            self.active_hysteresis_correction_1 = pw_1 - self.previous_pw_1
+            self.active_hysteresis_correction_2 = pw_2 - self.previous_pw_2
+
+        else:
+            return
+
+        self.x, self.y = self.angles_to_xy(self.angle_1, self.angle_2)
+        self.lifts_saved += int(numpy.count_nonzero(trajectory.bridges < steps))
+
+        if self.movement:
+            self.movement.record_arrays(
+                trajectory.angles_1[:steps],
+                trajectory.pws_1[:steps],
+                trajectory.angles_2[:steps],
+                trajectory.pws_2[:steps],
+            )
 
     # ----------------- pen-moving methods -----------------
 
@@ -449,10 +1872,17 @@ class Plotter:
         Sets ``current_x``, ``current_y``.
         """
 
+        tracer = self.tracer
+        sampling = tracer and tracer.sampling
+        if sampling:
+            start = tracer.clock()
+
         pw_1 = pw_2 = None
 
         if angle_1 is not None:
             pw_1 = self.angles_to_pw_1(angle_1)
+            if sampling:
+                start = tracer.span("calibration", start)
 
             if pw_1 > self.previous_pw_1:
                 self.active_hysteresis_correction_1 = self.hysteresis_correction_1
@@ -464,11 +1894,13 @@ class Plotter:
             pw_1 = pw_1 + self.active_hysteresis_correction_1
 
             self.angle_1 = angle_1
-            self.angles_used_1.add(int(angle_1))
-            self.pulse_widths_used_1.add(int(pw_1))
+            if sampling:
+                start = tracer.span("hysteresis", start)
 
         if angle_2 is not None:
             pw_2 = self.angles_to_pw_2(angle_2)
+            if sampling:
+                start = tracer.span("calibration", start)
 
             if pw_2 > self.previous_pw_2:
                 self.active_hysteresis_correction_2 = self.hysteresis_correction_2
@@ -480,13 +1912,22 @@ class Plotter:
             pw_2 = pw_2 + self.active_hysteresis_correction_2
 
             self.angle_2 = angle_2
-            self.angles_used_2.add(int(angle_2))
-            self.pulse_widths_used_2.add(int(pw_2))
+            if sampling:
+                start = tracer.span("hysteresis", start)
+
+        if self.movement:
+            self.movement.record(angle_1, pw_1, angle_2, pw_2)
+            if sampling:
+                start = tracer.span("recording", start)
 
         self.x, self.y = self.angles_to_xy(self.angle_1, self.angle_2)
+        if sampling:
+            start = tracer.span("kinematics", start)
 
         if self.turtle:
             self.turtle.set_angles(self.angle_1, self.angle_2)
+            if sampling:
+                tracer.span("turtle", start)
 
         self.set_pulse_widths(pw_1, pw_2)
 
@@ -497,6 +1938,7 @@ class Plotter:
             print("Parking")
 
         self.pen.up()
+        self.scheduler.reset()
 
         self.move_angles(self.servo_1_parked_angle, self.servo_2_parked_angle)
 
@@ -512,41 +1954,155 @@ class Plotter:
 
     # ----------------- line-processing methods -----------------
 
-    def rotate_and_scale_lines(self, lines=[], rotate=False, flip=False, bounds=None):
-        """Rotates and scales the lines so that they best fit the available drawing ``bounds``."""
-        (
-            rotate,
-            x_mid_point,
-            y_mid_point,
+    def rotate_and_scale_lines(
+        self, lines=[], rotate=False, flip=False, bounds=None, fit_lines=None
+    ):
+        """Rotates and scales the lines so that they best fit the available drawing ``bounds``.
+        If ``fit_lines`` are supplied, the lines are transformed as those lines would be (so that,
+        for example, a simplified version of a drawing is placed exactly as the full one).
+
+        ``lines`` can be lists of points, or numpy arrays; they are left unchanged. The new lines
+        are returned as numpy arrays of x/y points (views of a single array).
+        """
+
+        points, ends = self.line_arrays(lines)
+        fit_points = self.line_arrays(fit_lines)[0] if fit_lines else points
+
+        fit = self.analyse_points(fit_points, bounds)
+
+        return self.split_lines(self.transform_points(points, *fit, flip), ends)
+
+    def rotate_and_scale_layers(self, layers=[], flip=False, bounds=None, fit_lines=None):
+        """Rotates and scales all the lines of ``layers`` together, as ``rotate_and_scale_lines()``
+        does, and returns new layers containing them."""
+
+        lines = self.rotate_and_scale_lines(
+            [line for layer in layers for line in layer["lines"]],
+            flip=flip,
+            bounds=bounds,
+            fit_lines=fit_lines,
+        )
+
+        new_layers = []
+        for layer in layers:
+            new_layers.append(dict(layer, lines=lines[: len(layer["lines"])]))
+            lines = lines[len(layer["lines"]) :]
+
+        return new_layers
+
+    def transform_lines(
+        self,
+        lines,
+        rotate,
+        x_mid_point,
+        y_mid_point,
+        box_x_mid_point,
+        box_y_mid_point,
+        divider,
+        flip=False,
+    ):
+        """Returns the lines rotated and scaled using the values returned by
+        ``analyse_lines()``."""
+
+        points, ends = self.line_arrays(lines)
+        return self.split_lines(
+            self.transform_points(
+                points,
+                rotate,
+                x_mid_point,
+                y_mid_point,
+                box_x_mid_point,
+                box_y_mid_point,
+                divider,
+                flip,
+            ),
+            ends,
+        )
+
+    @staticmethod
+    def transform_points(
+        points,
+        rotate,
+        x_mid_point,
+        y_mid_point,
+        box_x_mid_point,
+        box_y_mid_point,
+        divider,
+        flip=False,
+    ):
+        """Rotates and scales an array of x/y points, as ``transform_lines()`` does, all at once:
+        shifted so that they have zero as their mid-point, scaled to fit the box, flipped if
+        required, and shifted to the box's mid-point."""
+
+        if rotate:
+            points = points[:, ::-1]
+
+        # flipping (before moving back into the drawing pane) reverses the scaling of x
+        scale = numpy.array([-1 if flip ^ rotate else 1, 1])
+
+        return (points - [x_mid_point, y_mid_point]) / divider * scale + [
             box_x_mid_point,
             box_y_mid_point,
-            divider,
-        ) = self.analyse_lines(lines, rotate, bounds)
+        ]
 
-        for line in lines:
+    @staticmethod
+    def line_arrays(lines):
+        """Returns the points of all the ``lines`` (lists of points, or numpy arrays) as a single
+        numpy array of x/y values, and the index in it at which each line ends."""
 
-            for point in line:
-                if rotate:
-                    point[0], point[1] = point[1], point[0]
+        ends = numpy.cumsum([len(line) for line in lines], dtype=int)
 
-                x = point[0]
-                x = x - x_mid_point  # shift x values so that they have zero as their mid-point
-                x = x / divider  # scale x values to fit in our box width
+        if not len(lines) or not ends[-1]:
+            return numpy.empty((0, 2)), ends
 
-                if flip ^ rotate:  # flip before moving back into drawing pane
-                    x = -x
+        if all(isinstance(line, numpy.ndarray) for line in lines):
+            points = numpy.concatenate([line[:, :2] for line in lines if len(line)])
+            return points.astype(float), ends
 
-                # shift x values so that they have the box x midpoint as their endpoint
-                x = x + box_x_mid_point
+        # all the values at once, if every point is an x/y pair
+        values = numpy.fromiter(
+            itertools.chain.from_iterable(itertools.chain.from_iterable(lines)), dtype=float
+        )
+        if len(values) == 2 * ends[-1]:
+            return values.reshape(-1, 2), ends
 
-                y = point[1]
-                y = y - y_mid_point
-                y = y / divider
-                y = y + box_y_mid_point
+        return numpy.array([point[:2] for line in lines for point in line], dtype=float), ends
 
-                point[0], point[1] = x, y
+    @staticmethod
+    def split_lines(points, ends):
+        """Returns a list of lines, each an array of x/y points, from an array of points and the
+        index at which each line ends (as returned by ``line_arrays()``)."""
 
-        return lines
+        starts = [0] + ends[:-1].tolist()
+        return [points[start:end] for start, end in zip(starts, ends.tolist())]
+
+    @staticmethod
+    def read_lines(filename):
+        """Yields the lines in an NDJSON file one by one; blank lines in the file are skipped."""
+
+        with open(filename, "r") as line_file:
+            for row in line_file:
+                if row.strip():
+                    yield json.loads(row)
+
+    def file_extent(self, filename):
+        """Returns the ``min_x``, ``max_x``, ``min_y`` and ``max_y`` of the lines in an NDJSON
+        file, reading them one by one."""
+
+        min_x = min_y = math.inf
+        max_x = max_y = -math.inf
+
+        for line in self.read_lines(filename):
+            if not line:
+                continue
+            x_values, y_values = list(zip(*line))[:2]
+            min_x, max_x = min(min_x, *x_values), max(max_x, *x_values)
+            min_y, max_y = min(min_y, *y_values), max(max_y, *y_values)
+
+        if min_x > max_x:
+            raise ValueError(f"There are no lines in {filename}")
+
+        return min_x, max_x, min_y, max_y
 
     def analyse_lines(self, lines=[], rotate=False, bounds=None):
         """
@@ -580,28 +2136,24 @@ class Plotter:
             ]
         """
 
-        bounds = bounds or self.bounds
-
-        # First, we create a pair of empty sets for all the x and y values in all of the lines of
-        # the plot data.
-
-        x_values_in_lines = set()
-        y_values_in_lines = set()
+        return self.analyse_points(self.line_arrays(lines)[0], bounds)
 
-        # Loop over each line and all the points in each line, to get sets of all the x and y
-        # values:
+    def analyse_points(self, points, bounds=None):
+        """As ``analyse_lines()``, for an array of all the x/y points in the lines (as returned
+        by ``line_arrays()``)."""
 
-        for line in lines:
+        # Identify the minimum and maximum values.
 
-            x_values_in_line, y_values_in_line = zip(*line)
+        min_x, min_y = points.min(axis=0).tolist()
+        max_x, max_y = points.max(axis=0).tolist()
 
-            x_values_in_lines.update(x_values_in_line)
-            y_values_in_lines.update(y_values_in_line)
+        return self.fit_extent(min_x, max_x, min_y, max_y, bounds)
 
-        # Identify the minimum and maximum values.
+    def fit_extent(self, min_x, max_x, min_y, max_y, bounds=None):
+        """Works out how to fit a drawing that extends from ``min_x`` to ``max_x`` and ``min_y``
+        to ``max_y`` into the ``bounds``; returns the same values as ``analyse_lines()``."""
 
-        min_x, max_x = min(x_values_in_lines), max(x_values_in_lines)
-        min_y, max_y = min(y_values_in_lines), max(y_values_in_lines)
+        bounds = bounds or self.bounds
 
         # Identify the range they span.
 
@@ -632,6 +2184,9 @@ class Plotter:
             rotate = True
             x_mid_point, y_mid_point = y_mid_point, x_mid_point
 
+        # a drawing of a single point has no extent; it's placed in the middle of the box
+        divider = divider or 1
+
         return (rotate, x_mid_point, y_mid_point, box_x_mid_point, box_y_mid_point, divider)
 
     # ----------------- physical control methods -----------------
@@ -641,6 +2196,11 @@ class Plotter:
         virtual mode.
         """
 
+        tracer = self.tracer
+        sampling = tracer and tracer.sampling
+        if sampling:
+            start = tracer.clock()
+
         if self.virtual:
 
             if pw_1:
@@ -662,6 +2222,12 @@ class Plotter:
             if pw_2:
                 self.rpi.set_servo_pulsewidth(15, pw_2)
 
+        if self.program:
+            self.program.step(pw_1, pw_2)
+
+        if sampling:
+            tracer.span("io", start)
+
     def get_pulse_widths(self):
         """Returns the actual pulse-widths values; if in virtual mode, returns the nominal values -
         i.e. the values that they might be.
@@ -688,6 +2254,7 @@ class Plotter:
             print("Going quiet")
 
         else:
+            self.pen.settle()
             for servo in servos:
                 self.rpi.set_servo_pulsewidth(servo, 0)
 
@@ -869,15 +2436,15 @@ clockwise and anti-clockwise. Press "0" to exit.
     def top(self):
         return self.bounds[3]
 
-    def reset_report(self):
+    def reset_report(self, histograms=False):
+        """Starts a new record of the plotter's movement and step timing, for ``report()``. With
+        ``histograms=True``, the record includes how often each angle and pulse-width was used."""
 
-        self.angle_1 = self.angle_2 = None
+        self.movement = MovementRecord(histograms=histograms)
+        self.scheduler.clear()
 
-        # Create sets for recording movement of the plotter.
-        self.angles_used_1 = set()
-        self.angles_used_2 = set()
-        self.pulse_widths_used_1 = set()
-        self.pulse_widths_used_2 = set()
+        # the number of times the pen was kept down to draw across a gap, instead of being lifted
+        self.lifts_saved = 0
 
     # ----------------- trigonometric methods -----------------
 
@@ -891,17 +2458,66 @@ clockwise and anti-clockwise. Press "0" to exit.
         the base class; it needs to be overridden in a sub-class implementation."""
         return (0, 0)
 
+    def xy_to_angles_array(self, x, y, strict=True):
+        """Returns arrays of the servo angles required to reach arrays of x/y positions. Calls
+        ``xy_to_angles()`` for each position; sub-classes can override it with a faster
+        implementation.
+
+        If ``strict`` is ``False``, positions that can't be reached have ``nan`` angles, instead
+        of raising an exception."""
+
+        angles = []
+        for xy in zip(x, y):
+            try:
+                angles.append(self.xy_to_angles(*xy))
+            except Exception:
+                if strict:
+                    raise
+                angles.append((numpy.nan, numpy.nan))
+
+        angles = numpy.array(angles, dtype=float).reshape(-1, 2)
+        return angles[:, 0], angles[:, 1]
+
+    def angles_to_xy_array(self, angles_1, angles_2):
+        """Returns arrays of the x/y positions represented by arrays of servo angles. Calls
+        ``angles_to_xy()`` for each pair; sub-classes can override it with a faster
+        implementation."""
+
+        xys = numpy.array([self.angles_to_xy(*angles) for angles in zip(angles_1, angles_2)])
+        return xys[:, 0], xys[:, 1]
+
 
 class Pen:
-    def __init__(self, bg, pw_up=1700, pw_down=1300, pin=18, transition_time=0.25, virtual=False):
+    def __init__(
+        self,
+        bg,
+        pw_up=1700,
+        pw_down=1300,
+        pin=18,
+        transition_time=0.25,
+        virtual=False,
+        ease_step=1,  # the change in pulse-width, in µs, of each step when easing the pen
+        ease_duration=None,  # seconds to ease the pen; None for 1ms per step, 0 not to ease it
+        lift_overlap=False,  # let the arms move while the pen is still being lifted
+    ):
 
         self.bg = bg
         self.pin = pin
         self.pw_up = pw_up
         self.pw_down = pw_down
         self.transition_time = transition_time
+        self.ease_step = ease_step
+        self.ease_duration = ease_duration
+        self.lift_overlap = lift_overlap
         self.position = "down"
         self.virtual = virtual
+
+        # the thread that is lifting the pen, if lift_overlap is set and it hasn't finished yet
+        self.easing = None
+
+        # the number of times the pen has been lifted
+        self.lifts = 0
+
         if self.virtual:
 
             print("Initialising virtual Pen")
@@ -913,10 +2529,13 @@ class Pen:
 
         self.up()
 
-    def down(self):
+    def down(self, turtle=True):
+        # turtle=False leaves the turtle to be updated by show_on_turtle(), from another thread
 
         if self.position == "up":
 
+            self.settle()
+
             if self.virtual:
                 self.virtual_pw = self.pw_down
 
@@ -924,41 +2543,98 @@ class Pen:
                 self.ease_pen(self.pw_up, self.pw_down)
                 # self.rpi.set_servo_pulsewidth(self.pin, self.pw_down)
 
-            if self.bg.turtle:
-                self.bg.turtle.down()
-                self.bg.turtle.color("blue")
-                self.bg.turtle.width(1)
-
             self.position = "down"
 
-    def up(self):
+            if turtle:
+                self.show_on_turtle()
+
+    def up(self, turtle=True):
 
         if self.position == "down":
 
+            self.lifts += 1
+
             if self.virtual:
                 self.virtual_pw = self.pw_up
 
+            elif self.lift_overlap:
+                # the arms can start moving straight away; the pen has lifted off the paper long
+                # before it has finished rising
+                self.easing = threading.Thread(
+                    target=self.ease_pen, args=(self.pw_down, self.pw_up), daemon=True
+                )
+                self.easing.start()
+
             else:
                 self.ease_pen(self.pw_down, self.pw_up)
                 # self.rpi.set_servo_pulsewidth(self.pin, self.pw_up)
 
-            if self.bg.turtle:
-                self.bg.turtle.up()
-
             self.position = "up"
 
+            if turtle:
+                self.show_on_turtle()
+
+    def show_on_turtle(self):
+        """Shows the pen's position on the plotter's turtle, if it has one."""
+
+        turtle = self.bg.turtle
+        if not turtle:
+            return
+
+        if self.position == "down":
+            turtle.down()
+            turtle.color("blue")
+            turtle.width(1)
+        else:
+            turtle.up()
+
+    def settle(self):
+        """Waits for the pen to finish rising, if it's being lifted while the arms move."""
+
+        if self.easing:
+            self.easing.join()
+            self.easing = None
+
     def ease_pen(self, start, end):
         """
         Moves the pen gently instead of all at once. Slower but reduces marking on the paper.
+
+        The pen moves in steps of ``ease_step`` µs, over ``ease_duration`` seconds. The servo
+        only receives a pulse every 20ms, so steps more frequent than that are wasted; for
+        example, ``ease_step=20, ease_duration=0.2`` eases a 400µs movement in 20 steps, rather
+        than the 400 it takes by default.
         """
-        diff = end - start
-        angle = start
-        length_of_step = diff / abs(diff)
 
-        for i in range(abs(diff)):
-            angle += length_of_step
-            self.rpi.set_servo_pulsewidth(self.pin, angle)
-            sleep(0.001)
+        pws = self.ease_profile(start, end)
+        interval = self.ease_time(start, end) / len(pws)
+
+        for pw in pws:
+            self.rpi.set_servo_pulsewidth(self.pin, pw)
+            if interval:
+                sleep(interval)
+
+    def ease_profile(self, start, end):
+        """Returns the pulse-widths that ``ease_pen()`` steps through between ``start`` and
+        ``end``."""
+
+        if self.ease_duration == 0 or start == end:
+            return [end]
+
+        steps = math.ceil(abs(end - start) / self.ease_step)
+        return [round(start + (end - start) * step / steps) for step in range(1, steps + 1)]
+
+    def ease_time(self, start=None, end=None):
+        """Returns roughly how long, in seconds, ``ease_pen()`` takes to raise or lower the pen."""
+
+        if self.virtual:
+            return 0
+
+        if self.ease_duration is not None:
+            return self.ease_duration
+
+        start = self.pw_up if start is None else start
+        end = self.pw_down if end is None else end
+        return len(self.ease_profile(start, end)) * 0.001
 
     # for convenience, a quick way to set pen motor pulse-widths
     def pw(self, pulse_width):
@@ -977,3 +2653,38 @@ class Pen:
 
         else:
             return self.rpi.get_servo_pulsewidth(self.pin)
+
+
+class Trajectory:
+    """The compiled form of a series of movements, produced by ``Plotter.compile_lines()``. For
+    each step, it holds numpy arrays of:
+
+    * ``angles_1``, ``angles_2``: the servo angles
+    * ``pws_1``, ``pws_2``: the pulse-widths, including hysteresis correction
+    * ``draw``: whether the pen is down
+    * ``lines``, ``points``: the line being drawn, and the point in it being moved towards
+    * ``waits``: how long each step should take, if the plotter has motion limits (otherwise
+      ``None``, and each step takes ``wait``)
+
+    the steps that start drawing across a gap between lines (``bridges``), and the state of the
+    plotter at the end.
+    """
+
+    def __init__(self):
+        self.angles_1 = self.angles_2 = numpy.empty(0)
+        self.pws_1 = self.pws_2 = numpy.empty(0)
+        self.draw = numpy.empty(0, dtype=bool)
+        self.lines = self.points = numpy.empty(0, dtype=int)
+        self.waits = None
+        self.bridges = numpy.empty(0, dtype=int)
+
+    def set_end(
+        self, x, y, angle_1, angle_2, previous_pw_1, previous_pw_2, hysteresis_1, hysteresis_2
+    ):
+        self.x, self.y = x, y
+        self.angle_1, self.angle_2 = angle_1, angle_2
+        self.previous_pw_1, self.previous_pw_2 = previous_pw_1, previous_pw_2
+        self.hysteresis_1, self.hysteresis_2 = hysteresis_1, hysteresis_2
+
+    def __len__(self):
+        return len(self.angles_1)
@@ -0,0 +1,110 @@
+"""Compiled plot programs: every step of a drawing, recorded as the pulse-widths sent to the servos
+and the time between them, so that the drawing can be replayed without working anything out
+again."""
+
+import mmap
+import os
+import struct
+
+import numpy
+
+from scheduling import StepScheduler
+
+
+# a program starts with this, followed by the servo angles at the end of it
+MAGIC = b"BGPROG01"
+header = struct.Struct("<8sdd")
+
+# each step is the pulse-widths of the shoulder, elbow and pen servos, and the µs to wait before it
+step_dtype = numpy.dtype([("pw_1", "<u2"), ("pw_2", "<u2"), ("pen", "<u2"), ("wait", "<u4")])
+
+
+class ProgramRecorder(StepScheduler):
+    """Records the steps that ``plotter`` takes in a program saved in ``filename``. It takes the
+    place of the plotter's ``scheduler`` while recording (see ``Plotter.record_program()``), so
+    that it knows how long each step was meant to wait - and, if the plotter is virtual, doesn't
+    wait at all, so that a drawing is recorded as quickly as it can be worked out.
+
+    Pulse-widths are recorded as pigpio sends them, in whole µs. The steps are written out
+    ``batch`` at a time, so recording takes no more memory however long the drawing.
+    """
+
+    def __init__(self, plotter, filename, batch=4096):
+
+        super().__init__()
+
+        self.plotter = plotter
+        self.filename = filename
+        self.batch = batch
+        self.steps = []
+        self.count = 0
+
+        # time waited since the last step, in seconds
+        self.pending = 0.0
+        self.pws = [int(pw) for pw in plotter.get_pulse_widths()]
+
+        self.file = open(filename, "wb")
+        self.file.write(header.pack(MAGIC, plotter.angle_1, plotter.angle_2))
+
+    def wait(self, interval):
+
+        self.pending += interval or 0
+        if not self.plotter.virtual:
+            super().wait(interval)
+
+    async def wait_async(self, interval):
+
+        self.pending += interval or 0
+        if not self.plotter.virtual:
+            await super().wait_async(interval)
+
+    def step(self, pw_1=None, pw_2=None):
+        """Records pulse-widths sent to the servos; ``None`` for one that wasn't changed."""
+
+        pws = self.pws
+        if pw_1:
+            pws[0] = int(pw_1)
+        if pw_2:
+            pws[1] = int(pw_2)
+
+        pen = self.plotter.pen
+        pen_pw = pen.pw_down if pen.position == "down" else pen.pw_up
+
+        self.steps.append((pws[0], pws[1], pen_pw, round(self.pending * 1000000)))
+        self.pending = 0.0
+
+        if len(self.steps) >= self.batch:
+            self.flush()
+
+    def flush(self):
+
+        if self.steps:
+            self.file.write(numpy.array(self.steps, dtype=step_dtype).tobytes())
+            self.count += len(self.steps)
+            self.steps = []
+
+    def close(self):
+        """Writes the last steps, and the servo angles at the end of the program."""
+
+        self.flush()
+        self.file.seek(0)
+        self.file.write(header.pack(MAGIC, self.plotter.angle_1, self.plotter.angle_2))
+        self.file.close()
+
+
+def read_program(filename):
+    """Returns the servo angles at the end of the program in ``filename``, and a numpy array of
+    its steps (of ``step_dtype``) that is memory-mapped from the file, so that steps are only read
+    as they're needed."""
+
+    with open(filename, "rb") as program_file:
+        if os.fstat(program_file.fileno()).st_size < header.size:
+            raise ValueError(f"{filename} is not a plot program.")
+        # the map stays open as long as the array needs it
+        memory = mmap.mmap(program_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, angle_1, angle_2 = header.unpack_from(memory)
+    if magic != MAGIC:
+        raise ValueError(f"{filename} is not a plot program.")
+
+    return (angle_1, angle_2), numpy.frombuffer(memory, dtype=step_dtype, offset=header.size)
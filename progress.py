@@ -0,0 +1,134 @@
+"""A single progress indicator for a whole drawing, cheap enough to update at every step."""
+
+from contextlib import contextmanager
+from time import monotonic
+import sys
+
+
+class Progress:
+    """Counts the steps of a drawing, from ``start()`` to ``finish()``, and shows how far it has
+    got by calling ``sink`` with itself no more than once every ``interval`` seconds.
+
+    A step is counted by adding one to ``steps``; whoever counts it then calls ``refresh()`` once
+    ``steps`` reaches ``due``. The clock is only read then, and ``due`` is set so that that's a few
+    times every ``interval`` at the rate the steps are being taken.
+
+    ``sink`` can be a :class:`TerminalSink`, any other callable (such as a function that updates a
+    web page), or ``None`` to show nothing at all.
+    """
+
+    def __init__(self, sink=None, interval=0.2, clock=monotonic):
+
+        self.sink = sink
+        self.interval = interval
+        self.clock = clock
+
+        self.active = self.finished = False
+        self.total = None
+        self.description = ""
+        self.steps = 0
+        self.due = float("inf")
+
+    def start(self, total=None, description="Steps", silent=False):
+        """Starts counting the ``total`` steps (if they're known) of a drawing. Returns ``False``
+        without doing anything if a drawing is already being counted, so that a drawing made of
+        several parts is shown as one. ``silent=True`` counts the steps without showing them."""
+
+        if self.active:
+            return False
+
+        self.active, self.finished, self.silent = True, False, silent
+        self.total, self.description = total, description
+        self.steps = 0
+        self.started = self.shown = self.clock()
+        self.due = 1
+        return True
+
+    @contextmanager
+    def counting(self, total=None, description="Steps", silent=False):
+        """Starts counting, as ``start()`` does, and finishes when the ``with`` block does -
+        however it does."""
+
+        started = self.start(total, description, silent)
+        try:
+            yield self
+        finally:
+            if started:
+                self.finish()
+
+    def refresh(self):
+        """Shows the progress, if it hasn't been shown for ``interval`` seconds, and works out
+        when to check again."""
+
+        if not self.active:
+            self.due = float("inf")
+            return
+
+        now = self.clock()
+
+        if now - self.shown >= self.interval:
+            self.shown = now
+            self.show()
+
+        # check again about four times an interval
+        elapsed = now - self.started
+        rate = self.steps / elapsed if elapsed else 0
+        self.due = self.steps + max(int(rate * self.interval / 4), 1)
+
+    def finish(self):
+
+        self.active, self.finished = False, True
+        self.due = float("inf")
+        self.show()
+
+    def show(self):
+
+        if self.sink and not self.silent:
+            self.sink(self)
+
+    @property
+    def rate(self):
+        """Steps per second so far."""
+
+        elapsed = self.clock() - self.started
+        return self.steps / elapsed if elapsed else 0
+
+    @property
+    def eta(self):
+        """The time remaining in seconds, at the rate so far; ``None`` if it can't be
+        estimated."""
+
+        rate = self.rate
+        if self.total is None or not rate:
+            return None
+        return max(self.total - self.steps, 0) / rate
+
+
+class TerminalSink:
+    """Shows progress on a single line of the terminal (``stream``, or standard error), which is
+    cleared when the drawing is finished."""
+
+    def __init__(self, stream=None):
+
+        self.stream = stream
+        self.width = 0
+
+    def __call__(self, progress):
+
+        if progress.finished:
+            if not self.width:
+                return
+            text = ""
+        else:
+            text = f"{progress.description}: {progress.steps}"
+            if progress.total:
+                text += f"/{progress.total} ({progress.steps / progress.total:.0%})"
+            text += f" steps, {progress.rate:.0f}/s"
+            eta = progress.eta
+            if eta is not None:
+                text += f", {int(eta) // 60}:{int(eta) % 60:02} to go"
+
+        stream = self.stream or sys.stderr
+        stream.write("\r" + text.ljust(self.width) + ("\r" if progress.finished else ""))
+        stream.flush()
+        self.width = len(text)
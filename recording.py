@@ -0,0 +1,115 @@
+"""Low-overhead recording of the angles and pulse-widths used by a plotter's servos."""
+
+import numpy
+
+
+class MovementRecord:
+    """Records the angles and pulse-widths that the plotter's servos were moved to, so that
+    ``report()`` can show what range of movement a drawing used.
+
+    Each movement is added to a short list; the list is summarised with numpy once it holds
+    ``batch`` movements (and whenever the results are needed), so that recording a movement costs
+    no more than appending a tuple. The running minimum and maximum of each value are always kept.
+    With ``histograms=True``, the number of movements to each angle (in bins of one degree) and
+    pulse-width (in bins of 10µs) is counted too.
+    """
+
+    # the order of the values in each movement, and of the results
+    columns = ("angle_1", "pw_1", "angle_2", "pw_2")
+
+    angle_bins = numpy.arange(-180, 181, 1)
+    pw_bins = numpy.arange(500, 2510, 10)
+
+    def __init__(self, histograms=False, batch=1024):
+
+        self.histograms = histograms
+        self.batch = batch
+        self.pending = []
+
+        self.count = 0
+        self.minima = numpy.full(4, numpy.inf)
+        self.maxima = numpy.full(4, -numpy.inf)
+
+        if histograms:
+            self.counts = [
+                numpy.zeros(len(self.bins(column)) - 1, dtype=int) for column in self.columns
+            ]
+
+    def record(self, angle_1, pw_1, angle_2, pw_2):
+        """Records a single movement. ``None`` means that that servo didn't move."""
+
+        self.pending.append((angle_1, pw_1, angle_2, pw_2))
+        if len(self.pending) >= self.batch:
+            self.flush()
+
+    def record_arrays(self, angles_1, pws_1, angles_2, pws_2):
+        """Records a whole series of movements at once, such as a compiled trajectory."""
+
+        self.flush()
+        self.add(numpy.column_stack((angles_1, pws_1, angles_2, pws_2)).astype(float))
+
+    def flush(self):
+        """Summarises the movements waiting in the list."""
+
+        if self.pending:
+            # None becomes NaN, which is ignored below
+            values = numpy.array(self.pending, dtype=float)
+            self.pending = []
+            self.add(values)
+
+    def add(self, values):
+
+        if not len(values):
+            return
+
+        self.count += len(values)
+
+        # unlike min() and max(), fmin() and fmax() ignore NaNs
+        self.minima = numpy.fmin(self.minima, numpy.fmin.reduce(values, axis=0))
+        self.maxima = numpy.fmax(self.maxima, numpy.fmax.reduce(values, axis=0))
+
+        if self.histograms:
+            for n, column in enumerate(self.columns):
+                column_values = values[:, n]
+                column_values = column_values[~numpy.isnan(column_values)]
+                self.counts[n] += numpy.histogram(column_values, bins=self.bins(column))[0]
+
+    def bins(self, column):
+        return self.angle_bins if column.startswith("angle") else self.pw_bins
+
+    def range(self, column):
+        """Returns the minimum and maximum values recorded for ``column`` (one of ``columns``), or
+        ``None`` if there are none."""
+
+        self.flush()
+        n = self.columns.index(column)
+        if self.minima[n] > self.maxima[n]:
+            return None
+        return float(self.minima[n]), float(self.maxima[n])
+
+    def distribution(self, column, width=10):
+        """Returns a list of (start, end, count) for the values recorded for ``column``, in bins
+        of ``width`` of the original bins, from the first bin used to the last."""
+
+        if not self.histograms:
+            raise ValueError("Histograms are not being recorded.")
+
+        self.flush()
+        n = self.columns.index(column)
+        bins, counts = self.bins(column), self.counts[n]
+
+        used = numpy.flatnonzero(counts)
+        if not len(used):
+            return []
+
+        first = used[0] - used[0] % width
+        last = used[-1] + 1
+
+        return [
+            (
+                int(bins[start]),
+                int(bins[min(start + width, len(bins) - 1)]),
+                int(counts[start : start + width].sum()),
+            )
+            for start in range(first, last, width)
+        ]
@@ -0,0 +1,186 @@
+"""Pacing of servo steps against a schedule, with a record of how closely it was kept."""
+
+from array import array
+import asyncio
+from bisect import bisect_right
+import copy
+import math
+from time import perf_counter, sleep
+import numpy
+
+
+class Lateness:
+    """A summary of how late each step was, that takes the same memory however many steps there
+    are: their number, total and maximum, and a histogram of them in ``bins_per_decade``
+    logarithmic bins from ``smallest`` to ``largest`` seconds (anything outside that range is
+    counted in the first or last bin), from which the 99th percentile is estimated to within a
+    bin - about 12% with the default 20 bins a decade.
+    """
+
+    def __init__(self, smallest=1e-6, largest=10, bins_per_decade=20):
+
+        bins = round(math.log10(largest / smallest) * bins_per_decade)
+        self.edges = (smallest * 10 ** (numpy.arange(bins + 1) / bins_per_decade)).tolist()
+
+        # counts[n] is the number of steps between edges[n - 1] and edges[n] late
+        self.counts = array("q", bytes(8 * (len(self.edges) + 1)))
+        self.steps = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, late):
+
+        self.counts[bisect_right(self.edges, late)] += 1
+        self.total += late
+        if late > self.max or not self.steps:
+            self.max = late
+        self.steps += 1
+
+    def copy(self):
+        """Returns a copy, so that the steps since now can be summarised with
+        ``statistics(since=...)``."""
+
+        snapshot = copy.copy(self)
+        snapshot.counts = array("q", self.counts)
+        return snapshot
+
+    def statistics(self, since=None):
+        """Returns a dictionary of the number of steps, and their mean, 99th percentile and
+        maximum lateness in seconds. ``since``, a ``copy()`` made earlier, leaves out the steps
+        before it was made; their maximum is then estimated to within a bin, unless it's the
+        maximum of all the steps."""
+
+        counts = numpy.frombuffer(self.counts, dtype=numpy.int64)
+        steps, total, maximum = self.steps, self.total, self.max
+
+        # if the steps have been cleared since, all of them count
+        if since is not None and since.steps > steps:
+            since = None
+
+        if since is not None:
+            counts = counts - numpy.frombuffer(since.counts, dtype=numpy.int64)
+            steps, total = steps - since.steps, total - since.total
+
+        if not steps:
+            return {"steps": 0, "mean": 0.0, "p99": 0.0, "max": 0.0}
+
+        if since is not None and maximum <= since.max:
+            maximum = min(self.upper_edge(int(numpy.flatnonzero(counts)[-1])), maximum)
+
+        p99 = self.upper_edge(int(numpy.searchsorted(numpy.cumsum(counts), 0.99 * steps)))
+
+        return {
+            "steps": steps,
+            "mean": total / steps,
+            "p99": min(p99, maximum),
+            "max": maximum,
+        }
+
+    def upper_edge(self, n):
+        """Returns the upper edge of bin ``n``, or for the last bin, the maximum."""
+
+        return self.edges[n] if n < len(self.edges) else self.max
+
+
+class StepScheduler:
+    """Paces a series of steps so that each one is due a fixed interval after the one before -
+    rather than after the previous step actually happened, so that small delays don't accumulate
+    over the thousands of steps in a drawing.
+
+    Waiting for a step sleeps until shortly (``spin`` seconds) before it's due, and then checks the
+    clock continuously until it is, because ``sleep()`` alone can overshoot by a millisecond or
+    more. If a step is already late, it isn't delayed at all, so that the following steps catch up
+    with the schedule. If it's more than ``catch_up`` seconds late, it's too late to catch up
+    without rushing the servos, so the schedule starts again from that step, and the time lost is
+    added to ``lost``. After a pause of more than ``idle`` seconds, the schedule starts again
+    without counting any time as lost. The plotter calls ``reset()`` at the start of each command
+    or drawing, so that ``lost`` only counts the time lost while stepping, and not the time
+    between commands.
+
+    How late the steps were is summarised in ``lateness`` (a :class:`Lateness`), and the total
+    time spent waiting in ``slept``.
+    """
+
+    def __init__(self, spin=0.002, catch_up=0.1, idle=1, clock=perf_counter):
+
+        self.spin = spin
+        self.catch_up = catch_up
+        self.idle = idle
+        self.clock = clock
+        self.deadline = None
+        self.clear()
+
+    def clear(self):
+        """Discards the timing statistics recorded so far."""
+
+        self.lateness = Lateness()
+        self.lost = 0.0
+        self.slept = 0.0
+
+    def reset(self):
+        """Starts the schedule again, so that the next step is due immediately - for example after
+        something other than a step, such as moving the pen, has taken time."""
+
+        self.deadline = None
+
+    def wait(self, interval):
+        """Waits until the next step is due, ``interval`` seconds after the previous one."""
+
+        if not interval:
+            return
+
+        remaining = self.schedule(interval)
+
+        if remaining > 0:
+            if remaining > self.spin:
+                sleep(remaining - self.spin)
+            while self.clock() < self.deadline:
+                pass
+
+        late = self.clock() - self.deadline
+        self.lateness.add(late)
+        if remaining > 0:
+            self.slept += remaining + late
+
+    async def wait_async(self, interval):
+        """As ``wait()``, but lets other tasks run in the meantime. There's no spinning, so the
+        accuracy is that of the event loop's timer (about a millisecond), but as always the delays
+        don't accumulate."""
+
+        if not interval:
+            await asyncio.sleep(0)
+            return
+
+        remaining = self.schedule(interval)
+        await asyncio.sleep(max(remaining, 0))
+
+        late = self.clock() - self.deadline
+        self.lateness.add(late)
+        if remaining > 0:
+            self.slept += remaining + late
+
+    def schedule(self, interval):
+        """Works out when the next step is due, and returns how long there is until then."""
+
+        now = self.clock()
+
+        if self.deadline is None:
+            self.deadline = now
+        else:
+            self.deadline = self.deadline + interval
+            behind = now - self.deadline
+
+            if behind > self.catch_up:
+                if behind < self.idle:
+                    self.lost += behind
+                self.deadline = now
+
+        return self.deadline - now
+
+    def statistics(self, since=None):
+        """Returns a dictionary of the number of steps timed, their mean, 99th percentile and
+        maximum lateness, and the total time lost, all in seconds. ``since``, a copy of
+        ``lateness`` made earlier, leaves out the steps before it was made (see
+        :meth:`Lateness.statistics`)."""
+
+        return {**self.lateness.statistics(since), "lost": self.lost}
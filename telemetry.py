@@ -0,0 +1,212 @@
+"""A record of each drawing made: where the time went, how far the pen travelled and how well the
+steps kept to their schedule, to be saved as JSON or for Prometheus."""
+
+from datetime import datetime, timezone
+from time import perf_counter
+import json
+import os
+import socket
+
+import numpy
+
+
+class RunRecord:
+    """Records one drawing by ``plotter``, from ``start()`` to ``finish()``.
+
+    The time taken is divided between:
+
+    * ``compute``: preparing the lines - checking, scaling and compiling them
+    * ``pen``: raising and lowering the pen
+    * ``drawing``, ``travel``: playing steps with the pen down and up (parking at the end counts
+      as travel)
+
+    of which ``sleep``, the time spent waiting for steps to be due, is part of ``drawing`` and
+    ``travel``. The plotter marks each change from one to another; nothing is timed step by step,
+    so recording costs almost nothing while the plotter is moving.
+
+    The steps played, the distance they covered and the number of times each servo changed
+    direction are counted from each :class:`~plotter.Trajectory` as it's finished, and from each
+    move made by ``move_angles()`` (such as parking).
+    """
+
+    activities = ("compute", "pen", "drawing", "travel")
+
+    def __init__(self, plotter, clock=perf_counter):
+
+        self.plotter = plotter
+        self.clock = clock
+
+        self.seconds = dict.fromkeys(self.activities, 0.0)
+        self.steps = {"drawing": 0, "travel": 0}
+        self.distance = {"drawing": 0.0, "travel": 0.0}
+        self.reversals = [0, 0]
+        self.finished = False
+
+        # the direction each servo was last moving in: 1, -1, or 0 if it hasn't moved yet
+        self.directions = [0, 0]
+
+    def start(self):
+
+        plotter, scheduler = self.plotter, self.plotter.scheduler
+
+        self.started = datetime.now(timezone.utc)
+        self.activity, self.since = "compute", self.clock()
+        self.began = self.since
+
+        # the counters that the plotter keeps anyway, as they were at the start
+        self.initial_lateness = scheduler.lateness.copy()
+        self.initial = (scheduler.lost, scheduler.slept, plotter.pen.lifts, plotter.lifts_saved)
+
+    def mark(self, activity):
+        """Records that the plotter has moved on to ``activity``."""
+
+        now = self.clock()
+        self.seconds[self.activity] += now - self.since
+        self.activity, self.since = activity, now
+
+    def mark_trajectory(self, trajectory, wait):
+        """Divides the time since the last mark between drawing and travel in proportion to the
+        time that the steps of ``trajectory`` were scheduled to take - for a trajectory played all
+        at once, as pigpio waveforms."""
+
+        waits = trajectory.waits
+        if waits is None:
+            waits = numpy.full(len(trajectory), float(wait))
+        total = float(waits.sum())
+        drawing = float(waits[trajectory.draw].sum()) / total if total else 0
+
+        now = self.clock()
+        elapsed = now - self.since
+        self.seconds["drawing"] += elapsed * drawing
+        self.seconds["travel"] += elapsed * (1 - drawing)
+        self.activity, self.since = "compute", now
+
+    def add_trajectory(self, trajectory, steps, angle_1, angle_2):
+        """Counts the first ``steps`` steps of ``trajectory`` (or all of them, if ``steps`` is
+        ``None``), played from servo angles ``angle_1`` and ``angle_2``."""
+
+        self.add_steps(
+            trajectory.angles_1[:steps],
+            trajectory.angles_2[:steps],
+            trajectory.draw[:steps],
+            angle_1,
+            angle_2,
+        )
+
+    def add_steps(self, angles_1, angles_2, draw, angle_1, angle_2):
+        """Counts steps to the servo angles ``angles_1`` and ``angles_2``, drawn where ``draw`` is
+        true, played from servo angles ``angle_1`` and ``angle_2``."""
+
+        if not len(draw):
+            return
+
+        drawn = int(numpy.count_nonzero(draw))
+        self.steps["drawing"] += drawn
+        self.steps["travel"] += len(draw) - drawn
+
+        angles = numpy.column_stack(
+            (
+                numpy.concatenate(([angle_1], angles_1)),
+                numpy.concatenate(([angle_2], angles_2)),
+            )
+        )
+
+        x, y = self.plotter.angles_to_xy_array(angles[:, 0], angles[:, 1])
+        lengths = numpy.hypot(numpy.diff(x), numpy.diff(y))
+        self.distance["drawing"] += float(lengths[draw].sum())
+        self.distance["travel"] += float(lengths[~draw].sum())
+
+        # a reversal is a step in the opposite direction to the last step that moved that servo
+        for servo, changes in enumerate(numpy.diff(angles, axis=0).T):
+            directions = numpy.sign(changes[changes != 0])
+            if not len(directions):
+                continue
+            self.reversals[servo] += int(numpy.count_nonzero(directions[1:] != directions[:-1]))
+            if self.directions[servo] and directions[0] != self.directions[servo]:
+                self.reversals[servo] += 1
+            self.directions[servo] = int(directions[-1])
+
+    def finish(self, finished=True):
+
+        self.mark("compute")
+        self.finished = finished
+        self.duration = self.since - self.began
+
+    def as_dict(self):
+
+        plotter, scheduler = self.plotter, self.plotter.scheduler
+        lost, slept, lifts, lifts_saved = self.initial
+
+        lateness = scheduler.statistics(since=self.initial_lateness)
+        lateness["lost"] = scheduler.lost - lost
+
+        steps = sum(self.steps.values())
+
+        return {
+            "plotter": type(plotter).__name__,
+            "host": socket.gethostname(),
+            "started": self.started.isoformat(timespec="seconds"),
+            "finished": self.finished,
+            "seconds": {
+                "total": self.duration,
+                **self.seconds,
+                "sleep": scheduler.slept - slept,
+            },
+            "steps": {"total": steps, **self.steps},
+            "steps_per_second": steps / self.duration if self.duration else 0,
+            "pen_lifts": plotter.pen.lifts - lifts,
+            "pen_lifts_saved": plotter.lifts_saved - lifts_saved,
+            "distance_cm": self.distance,
+            "reversals": {"servo_1": self.reversals[0], "servo_2": self.reversals[1]},
+            "lateness": lateness,
+        }
+
+    def write(self, filename):
+        """Saves the record as JSON in ``filename``."""
+
+        with open(filename, "w") as record_file:
+            json.dump(self.as_dict(), record_file, indent=4)
+
+    def write_textfile(self, filename, prefix="brachiograph_plot"):
+        """Saves the record as Prometheus metrics in ``filename``, for the node exporter's
+        textfile collector. It's written to a temporary file first and then renamed, so that the
+        collector never reads it half-written."""
+
+        record = self.as_dict()
+        seconds = record["seconds"]
+        lateness = {key: value for key, value in record["lateness"].items() if key != "steps"}
+
+        # totals are metrics of their own, so that labelled values can be summed
+        metrics = [
+            ("duration_seconds", "Time taken by the drawing.", None, seconds["total"]),
+            ("seconds", "Time taken by each activity.", "activity", self.seconds),
+            ("sleep_seconds", "Time spent waiting for steps to be due.", None, seconds["sleep"]),
+            ("steps", "Steps played.", "pen", self.steps),
+            ("steps_per_second", "Steps played per second.", None, record["steps_per_second"]),
+            ("pen_lifts", "Times the pen was lifted.", None, record["pen_lifts"]),
+            ("pen_lifts_saved", "Pen lifts saved.", None, record["pen_lifts_saved"]),
+            ("distance_cm", "Distance moved by the pen.", "pen", record["distance_cm"]),
+            (
+                "reversals",
+                "Changes of direction of each servo.",
+                "servo",
+                dict(enumerate(self.reversals, 1)),
+            ),
+            ("lateness_seconds", "How late the steps were.", "statistic", lateness),
+            ("finished", "1 if the drawing was finished.", None, int(record["finished"])),
+        ]
+
+        text = []
+        for name, description, label, values in metrics:
+            name = f"{prefix}_{name}"
+            text.append(f"# HELP {name} {description}")
+            text.append(f"# TYPE {name} gauge")
+            if label:
+                text.extend(f'{name}{{{label}="{key}"}} {value}' for key, value in values.items())
+            else:
+                text.append(f"{name} {values}")
+
+        temporary = filename + ".tmp"
+        with open(temporary, "w") as textfile:
+            textfile.write("\n".join(text) + "\n")
+        os.replace(temporary, filename)
@@ -0,0 +1,55 @@
+import pytest
+
+from brachiograph import BrachioGraph
+from plotter import Plotter
+
+
+@pytest.fixture(autouse=True)
+def calibration_cache(tmp_path, monkeypatch):
+    """Keeps the calibration tables that tests make out of the real cache."""
+
+    cache = tmp_path / "calibration"
+    monkeypatch.setattr(Plotter, "calibration_cache", str(cache))
+    return cache
+
+
+@pytest.fixture
+def lines():
+    """A small drawing: a box, and a line inside it."""
+
+    return [[[-2, 8], [2, 8], [2, 10], [-2, 10]], [[-1, 9], [1, 9.5]]]
+
+
+@pytest.fixture
+def plotter():
+    """Returns a function that makes a virtual BrachioGraph, with steps coarse enough for a
+    drawing to be plotted quickly, and no progress shown."""
+
+    def make_plotter(wait=0, resolution=0.5):
+        bg = BrachioGraph(virtual=True, wait=wait, angular_step=1, resolution=resolution)
+        bg.progress.sink = None
+        return bg
+
+    return make_plotter
+
+
+@pytest.fixture
+def record_steps():
+    """Returns a function that makes a plotter record the state of its servos - the pulse-widths
+    and the pen's position - each time it sends pulse-widths, and raise KeyboardInterrupt instead
+    of sending any more after ``interrupt_after`` of them."""
+
+    def record(bg, interrupt_after=None):
+        sent = []
+        set_pulse_widths = bg.set_pulse_widths
+
+        def recording_set_pulse_widths(pw_1=None, pw_2=None):
+            if interrupt_after is not None and len(sent) == interrupt_after:
+                raise KeyboardInterrupt
+            set_pulse_widths(pw_1, pw_2)
+            sent.append((bg.virtual_pw_1, bg.virtual_pw_2, bg.pen.position))
+
+        bg.set_pulse_widths = recording_set_pulse_widths
+        return sent
+
+    return record
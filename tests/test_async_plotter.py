@@ -0,0 +1,127 @@
+import asyncio
+import threading
+
+import pytest
+from pytest import approx
+
+from async_plotter import AsyncPlotter
+
+
+async def wait_for_steps(async_plotter, steps):
+    while async_plotter.step < steps:
+        await asyncio.sleep(0.001)
+
+
+class TestAsyncPlotter:
+    def test_xy(self, plotter):
+        async_plotter = AsyncPlotter(plotter(wait=0.001))
+
+        asyncio.run(async_plotter.xy(-5, 10))
+        assert (async_plotter.plotter.x, async_plotter.plotter.y) == (approx(-5), approx(10))
+
+        asyncio.run(async_plotter.xy(0, 10, draw=True))
+        assert async_plotter.plotter.x == approx(0)
+        assert async_plotter.plotter.pen.position == "down"
+
+    def test_nowhere_to_go(self, plotter):
+        async_plotter = AsyncPlotter(plotter(wait=0.001))
+        bg = async_plotter.plotter
+
+        async def main():
+            await async_plotter.park()
+            await async_plotter.park()
+
+            await async_plotter.xy(-5, 10)
+            position = bg.x, bg.y
+            await async_plotter.xy()
+            await async_plotter.xy(*position)
+            return position
+
+        position = asyncio.run(main())
+        assert (bg.x, bg.y) == position
+        assert bg.x == approx(-5)
+
+    def test_plot_lines_ends_parked(self, plotter, lines):
+        bg = plotter(wait=0.001)
+        asyncio.run(AsyncPlotter(bg).plot_lines(lines))
+
+        assert (bg.angle_1, bg.angle_2) == (approx(-90), approx(90))
+        assert bg.pen.position == "up"
+
+    def test_checked_and_recorded(self, plotter, lines, record_steps):
+        bg = plotter(wait=0.001)
+        sent = record_steps(bg)
+
+        # nothing moves if any of the lines can't be drawn
+        with pytest.raises(ValueError):
+            asyncio.run(AsyncPlotter(bg).plot_lines(lines, bounds=[20, 20, 30, 30]))
+        assert not sent
+        assert bg.last_run.as_dict()["finished"] is False
+
+        gapped = [[[-4, 8], [-2, 8]], [[-1.7, 8], [0, 8]], [[1, 8], [2, 8]]]
+        asyncio.run(AsyncPlotter(bg).plot_lines(gapped, gap=1))
+        assert bg.lifts_saved == 1
+
+        record = bg.last_run.as_dict()
+        assert record["finished"]
+        assert record["steps"]["drawing"] + record["steps"]["travel"] == len(sent)
+
+    def test_turtle_in_event_loop_thread(self, plotter):
+        bg = plotter(wait=0.001)
+        threads = []
+
+        class Turtle:
+            def __getattr__(self, name):
+                return lambda *args: threads.append(threading.get_ident())
+
+        # the pen of a real plotter is eased in another thread
+        bg.turtle, bg.virtual = Turtle(), False
+        asyncio.run(AsyncPlotter(bg).pen("down"))
+        bg.turtle, bg.virtual = None, True
+
+        assert bg.pen.position == "down"
+        assert threads and set(threads) == {threading.get_ident()}
+
+    def test_pause_and_resume(self, plotter, lines):
+        async_plotter = AsyncPlotter(plotter(wait=0.001))
+
+        async def main():
+            task = asyncio.create_task(async_plotter.plot_lines(lines))
+            await wait_for_steps(async_plotter, 20)
+            async_plotter.pause()
+
+            await asyncio.sleep(0.05)
+            paused_at = async_plotter.step
+            await asyncio.sleep(0.05)
+
+            assert async_plotter.step == paused_at
+            assert async_plotter.plotter.pen.position == "up"
+
+            async_plotter.resume()
+            await task
+
+        asyncio.run(main())
+        assert async_plotter.plotter.angle_1 == approx(-90)
+
+    def test_cancel(self, plotter, lines):
+        async_plotter = AsyncPlotter(plotter(wait=0.001))
+        bg = async_plotter.plotter
+
+        async def main():
+            task = asyncio.create_task(async_plotter.plot_lines(lines))
+            await wait_for_steps(async_plotter, 30)
+            trajectory = async_plotter.trajectory
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return trajectory
+
+        trajectory = asyncio.run(main())
+        step = async_plotter.step
+
+        # the plotter knows where it stopped
+        assert bg.angle_1 == trajectory.angles_1[step - 1]
+        assert bg.get_pulse_widths() == (
+            approx(trajectory.pws_1[step - 1], abs=1),
+            approx(trajectory.pws_2[step - 1], abs=1),
+        )
+        assert bg.pen.position == "up"
@@ -1,3 +1,5 @@
+import json
+
 import pytest
 from pytest import approx
 import numpy
@@ -61,6 +63,92 @@ class TestBiDiBrachioGraph:
     def test_plot_from_file(self):
         self.bg.plot_file("test-patterns/accuracy.json")
 
+    def test_plot_layers_leaves_the_lines_unchanged(self):
+        line = [[0, 0], [10, 0], [10, 10]]
+        other_line = [[0, 10], [0, 0]]
+        self.bg.plot_layers([{"lines": [line], "repeat": 3}, {"lines": [other_line], "repeat": 1}])
+
+        assert line == [[0, 0], [10, 0], [10, 10]]
+
+    def test_rotate_and_scale_layers(self):
+        line = [[0, 0], [10, 0], [10, 10]]
+
+        # the same line can appear more than once, and each is scaled to fit the bounds once
+        layers = self.bg.rotate_and_scale_layers(
+            [{"lines": [line, line], "repeat": 3}, {"lines": [[[0, 10], [0, 0]]], "repeat": 1}],
+            flip=True,
+        )
+
+        assert [len(layer["lines"]) for layer in layers] == [2, 1]
+        assert layers[0]["repeat"] == 3
+        assert list(layers[0]["lines"][0][:, 1]) == list(layers[0]["lines"][1][:, 1]) == approx(
+            [4, 4, 13]
+        )
+        assert line == [[0, 0], [10, 0], [10, 10]]
+
+    def test_plot_level_from_file(self, tmp_path):
+        filename = tmp_path / "levels.json"
+        filename.write_text(
+            '{"layers": [{"lines": [[[0, 0], [3, 4]], [[0, 0], [0, 1]]], "repeat": 1}],'
+            '"levels": {"coarse": [{"lines": [[[0, 0], [3, 4]]], "repeat": 1}]}}'
+        )
+        self.bg.plot_file(str(filename), level="coarse")
+
+    def test_rotate_and_scale_lines_to_fit_other_lines(self):
+        lines = [[[0, 0], [5, 5]]]
+        lines = self.bg.rotate_and_scale_lines(
+            lines, bounds=(0, 0, 10, 10), fit_lines=[[[0, 0], [10, 10]]]
+        )
+
+        assert lines[0].tolist() == [[0, 0], [5, 5]]
+
+    def test_rotate_and_scale_numpy_lines(self):
+        lines = [[[0, 0, 1], [4, 2, 1]], [[1, 1, 1]], [], [[3, 6, 1], [2, 3, 1]]]
+        expected = self.bg.rotate_and_scale_lines(lines, flip=True)
+
+        arrays = [numpy.array(line, dtype=float).reshape(-1, 3) for line in lines]
+        transformed = self.bg.rotate_and_scale_lines(arrays, flip=True)
+
+        assert [line.tolist() for line in transformed] == [line.tolist() for line in expected]
+        assert arrays[0][1].tolist() == [4, 2, 1]
+        assert not numpy.shares_memory(transformed[0], arrays[0])
+
+        # the drawing is taller than it is wide, unlike the bounds, so it's rotated
+        assert self.bg.analyse_lines(lines)[0] is True
+        assert expected[2].shape == (0, 2)
+
+    def test_plot_layers_from_file(self, tmp_path):
+        filename = tmp_path / "layers.json"
+        filename.write_text('{"layers": [{"lines": [[[0, 0], [3, 4]]], "repeat": 2}]}')
+        self.bg.plot_file(str(filename))
+
+    def test_plot_stream_matches_plot_file(self, tmp_path):
+        with open("test-patterns/accuracy.json") as line_file:
+            lines = json.load(line_file)
+        linedraw.lines_to_ndjson(lines, tmp_path / "accuracy.ndjson")
+
+        assert self.bg.file_extent(tmp_path / "accuracy.ndjson") == (
+            min(point[0] for line in lines for point in line),
+            max(point[0] for line in lines for point in line),
+            min(point[1] for line in lines for point in line),
+            max(point[1] for line in lines for point in line),
+        )
+
+        sent = {}
+        set_pulse_widths = self.bg.set_pulse_widths
+
+        for name, plot in (
+            ("json", lambda: self.bg.plot_file("test-patterns/accuracy.json")),
+            ("ndjson", lambda: self.bg.plot_stream(tmp_path / "accuracy.ndjson", chunk_size=3)),
+        ):
+            sent[name] = []
+            self.bg.set_pulse_widths = lambda pw_1, pw_2: sent[name].append((pw_1, pw_2))
+            plot()
+
+        self.bg.set_pulse_widths = set_pulse_widths
+
+        assert numpy.array(sent["ndjson"]) == approx(numpy.array(sent["json"]))
+
     # ----------------- test pattern methods -----------------
 
     def test_test_pattern(self):
@@ -85,9 +173,306 @@ class TestBiDiBrachioGraph:
     def test_report(self):
         self.bg.report()
 
+    def test_report_distributions(self, capsys):
+        self.bg.reset_report(histograms=True)
+        self.bg.box()
+        self.bg.report()
+
+        output = capsys.readouterr().out
+        assert "Servo 1 angles" in output
+        assert "Servo 2 pulse-widths" in output
+
 
 class TestErrors:
     def test_maths_errors(self):
         plotter = BrachioGraph(inner_arm=8.2, outer_arm=8.85, virtual=True, wait=0)
         with pytest.raises(Exception):
             plotter.xy_to_angles(-10.2, 13.85)
+
+
+class TestCheck:
+
+    bg = BrachioGraph(virtual=True, wait=0, servo_2_angle_limits=(0, 150))
+
+    # a square, and a line across the middle of it
+    lines = [[[0, 0], [10, 0], [10, 10], [0, 10]], [[0, 5], [10, 5]]]
+
+    def test_lines_within_bounds(self):
+        check = self.bg.check(self.lines, bounds=[-6, 6, 4, 13])
+
+        for name in ("unreachable", "angles", "pulse_widths"):
+            assert check[name].shape == (0, 2)
+        assert check["bounds"] == [-6, 6, 4, 13]
+
+    def test_problems_found_before_moving(self):
+        check = self.bg.check(self.lines)
+
+        # The bottom of the square passes so close to the base that the elbow would have to fold
+        # beyond its limit, although it can reach both ends.
+        assert check["angles"].tolist() == [[0, 1]]
+        assert check["unreachable"].shape == (0, 2)
+
+        # with larger bounds, the top corners are out of reach
+        check = self.bg.check(self.lines, bounds=[-16, 0, 16, 16])
+        assert [0, 2] in check["unreachable"].tolist()
+        assert [0, 3] in check["unreachable"].tolist()
+
+        angles = (self.bg.angle_1, self.bg.angle_2)
+        with pytest.raises(ValueError):
+            self.bg.plot_lines(self.lines)
+        assert (self.bg.angle_1, self.bg.angle_2) == angles
+
+    def test_clip(self):
+        check = self.bg.check(self.lines, fix="clip")
+
+        # the bottom of the square is left out
+        clipped = [line.tolist() for line in check["layers"][0]["lines"]]
+        assert clipped == [
+            [[3.5, 4]],
+            [[-5.5, 4], [-5.5, 13], [3.5, 13]],
+            [[3.5, 8.5], [-5.5, 8.5]],
+        ]
+
+        self.bg.plot_lines(self.lines, fix="clip")
+
+    def test_shrink(self):
+        check = self.bg.check(self.lines, fix="shrink")
+
+        assert check["bounds"] == approx([-7.72, 4.18, 5.72, 12.82])
+        assert check["angles"].shape == (0, 2)
+
+        self.bg.plot_lines(self.lines, fix="shrink")
+
+
+class TestTrajectory:
+
+    bg = BrachioGraph(virtual=True, wait=0, hysteresis_correction_1=5, hysteresis_correction_2=-3)
+
+    def test_compiled_lines_match_stepwise_drawing(self):
+        lines = [[[-4, 8], [-2, 10], [0, 9]], [[0, 9.01], [1, 7]], [[3, 6], [2, 11]]]
+
+        pulse_widths = []
+        set_pulse_widths = self.bg.set_pulse_widths
+        self.bg.set_pulse_widths = lambda pw_1, pw_2: pulse_widths.append((pw_1, pw_2))
+
+        trajectory = self.bg.compile_lines(lines)
+
+        # draw the same lines with xy(), recording the pulse-widths
+        for line in lines:
+            x, y = line[0]
+            if (round(self.bg.x, 1), round(self.bg.y, 1)) != (round(x, 1), round(y, 1)):
+                self.bg.xy(x, y)
+            for x, y in line[1:]:
+                self.bg.xy(x, y, draw=True)
+
+        del self.bg.set_pulse_widths
+
+        # xy() and move_angles() accumulate small floating-point errors, that can occasionally
+        # change the number of steps in a move by one
+        assert len(trajectory) == approx(len(pulse_widths), rel=0.01)
+        assert list(trajectory.pws_1[:100]) == approx([pw_1 for pw_1, pw_2 in pulse_widths[:100]])
+        assert list(trajectory.pws_2[:100]) == approx([pw_2 for pw_1, pw_2 in pulse_widths[:100]])
+        assert (trajectory.pws_1[-1], trajectory.pws_2[-1]) == approx(pulse_widths[-1])
+        assert (trajectory.angle_1, trajectory.angle_2) == approx((self.bg.angle_1, self.bg.angle_2))
+        assert trajectory.hysteresis_1 == self.bg.active_hysteresis_correction_1
+
+        # the second line starts within 1mm of the end of the first, so the pen stays down
+        assert trajectory.draw[trajectory.lines == 1].all()
+        assert not trajectory.draw[trajectory.lines == 2][0]
+
+    def test_play(self):
+        trajectory = self.bg.compile_lines([[[-4, 8], [-2, 10]]])
+        self.bg.play(trajectory)
+
+        assert (self.bg.x, self.bg.y) == approx((-2, 10))
+        assert self.bg.get_pulse_widths() == (int(trajectory.pws_1[-1]), int(trajectory.pws_2[-1]))
+
+    def test_nowhere_to_go(self):
+        self.bg.xy(-2, 10)
+
+        trajectory = self.bg.compile_lines([[[self.bg.x, self.bg.y]]])
+        assert len(trajectory) == 0
+        assert (trajectory.x, trajectory.y) == (self.bg.x, self.bg.y)
+        assert (trajectory.angle_1, trajectory.angle_2) == (self.bg.angle_1, self.bg.angle_2)
+
+        # the second pass over a single point has nothing to do
+        self.bg.plot_layers([{"lines": [[[0, 0]]], "repeat": 2}])
+        assert (self.bg.angle_1, self.bg.angle_2) == (approx(-90), approx(90))
+
+    def test_gaps_drawn_across(self):
+        lines = [[[-4, 8], [-2, 8]], [[-1.7, 8], [0, 8]], [[1, 8], [2, 8]]]
+
+        trajectory = self.bg.compile_lines(lines, gap=0.5)
+
+        # the pen is lowered once for the first two lines, and again for the third
+        lowered = trajectory.draw & ~numpy.concatenate(([False], trajectory.draw[:-1]))
+        assert list(trajectory.lines[lowered]) == [0, 2]
+        assert len(trajectory.bridges) == 1
+        assert trajectory.lines[trajectory.bridges[0]] == 1
+
+        # plot_lines() scales the lines up by a little more than 2
+        self.bg.reset_report()
+        self.bg.plot_lines(lines, gap=1)
+        assert self.bg.lifts_saved == 1
+
+    def test_xy_to_angles_array(self):
+        angles_1, angles_2 = self.bg.xy_to_angles_array([-4, 0, 5], [8, 12, 6])
+
+        for x, y, angle_1, angle_2 in zip([-4, 0, 5], [8, 12, 6], angles_1, angles_2):
+            assert self.bg.xy_to_angles(x, y) == approx((angle_1, angle_2))
+
+        with pytest.raises(Exception):
+            self.bg.xy_to_angles_array([0, -10.2], [8, 13.85])
+
+    def test_angles_to_xy_array(self):
+        angles_1, angles_2 = numpy.array([-90, -60, -30]), numpy.array([90, 100, 130])
+        xs, ys = self.bg.angles_to_xy_array(angles_1, angles_2)
+
+        for angle_1, angle_2, x, y in zip(angles_1, angles_2, xs, ys):
+            assert self.bg.angles_to_xy(angle_1, angle_2) == approx((x, y))
+
+    def test_chord_steps(self):
+        # lines close to the base, and at the limit of the arms' reach
+        lines = [[[-6, 5], [5, 5]], [[-7, 12], [6, 12]]]
+
+        uniform = self.bg.compile_lines(lines, angular_step=1, resolution=0.02)
+        adaptive = self.bg.compile_lines(lines, angular_step=1, resolution=0.02, tolerance=0.01)
+
+        assert len(adaptive) < len(uniform) / 2
+
+        # every step drawn is within the tolerance of its line
+        xs, ys = self.bg.angles_to_xy_array(adaptive.angles_1, adaptive.angles_2)
+        for line, y in zip((0, 1), (5, 12)):
+            drawn = adaptive.draw & (adaptive.lines == line)
+            assert numpy.abs(ys[drawn] - y).max() < 0.01
+
+        # xy() divides a line in the same way
+        steps, fractions = self.bg.chord_steps(
+            numpy.array([[-6, 5], [-7, 12]]), numpy.array([[5, 5], [6, 12]]), 0.02, 0.01
+        )
+        assert fractions[steps[0] - 1] == fractions[-1] == 1
+        assert (numpy.diff(fractions[: steps[0]]) > 0).all()
+
+    def test_step_fractions(self):
+        assert list(self.bg.step_fractions(numpy.array([2, 3]))) == approx([0.5, 1, 1 / 3, 2 / 3, 1])
+
+    def test_estimate_counts_the_steps_plotted(self):
+        lines = [[[-4, 8], [-2, 10], [0, 9]], [[3, 6], [2, 11]]]
+        layers = [{"lines": lines, "repeat": 2}]
+        self.bg.park()
+
+        angles = (self.bg.angle_1, self.bg.angle_2)
+        estimate = self.bg.estimate_layers(layers, wait=0.01)
+
+        # the lines haven't been changed, and nothing has moved
+        assert lines[0][0] == [-4, 8]
+        assert (self.bg.angle_1, self.bg.angle_2) == angles
+
+        steps = []
+        self.bg.set_pulse_widths = lambda pw_1, pw_2: steps.append(self.bg.pen.position)
+        self.bg.plot_layers(layers, wait=0)
+        del self.bg.set_pulse_widths
+
+        assert estimate["steps"] == len(steps)
+        assert estimate["drawing"] + estimate["travel"] < len(steps) * 0.01
+        assert estimate["drawing"] == approx(steps.count("down") * 0.01, abs=0.1)
+        assert estimate["pen_movements"] == 8  # down and up for each line, twice
+
+    def test_estimate_follows_plot_layers_options(self):
+        # the second line starts close to where the first one ends, and runs out of reach
+        lines = [[[-4, 8], [-2, 10], [0, 9]], [[0.2, 9], [10, 16]]]
+        layers = [{"lines": lines, "repeat": 1}]
+        options = {"bounds": [-10, 2, 10, 16], "gap": 0.5, "fix": "clip"}
+        self.bg.park()
+
+        with pytest.raises(ValueError):
+            self.bg.estimate_layers(layers, bounds=options["bounds"])
+        estimate = self.bg.estimate_layers(layers, wait=0.01, **options)
+
+        steps = []
+        lifts = self.bg.pen.lifts
+        self.bg.set_pulse_widths = lambda pw_1, pw_2: steps.append(self.bg.pen.position)
+        self.bg.plot_layers(layers, wait=0, **options)
+        del self.bg.set_pulse_widths
+
+        assert estimate["steps"] == len(steps)
+        assert estimate["pen_movements"] == 2 * (self.bg.pen.lifts - lifts)
+
+    def test_estimate_overlaps_lifts_with_travel(self):
+        lines = [[[-4, 8], [-2, 10]], [[3, 6], [2, 11]]]
+        self.bg.park()
+        self.bg.pen.virtual = False
+        self.bg.pen.ease_duration = 0.2
+
+        try:
+            estimate = self.bg.estimate(lines, wait=0.01)
+            self.bg.pen.lift_overlap = True
+            overlapped = self.bg.estimate(lines, wait=0.01)
+        finally:
+            self.bg.pen.virtual = True
+            self.bg.pen.ease_duration = None
+            self.bg.pen.lift_overlap = False
+
+        assert estimate["pen"] == approx(estimate["pen_movements"] * 0.2)
+        # both lifts are followed by more than 0.2s of travel, so take no time at all
+        assert overlapped["pen"] == approx(2 * 0.2)
+        assert overlapped["travel"] == estimate["travel"]
+
+    def test_apply_hysteresis(self):
+        pws, direction = self.bg.apply_hysteresis(
+            numpy.array([1000, 1010, 1010, 1000, 1000.0]), 990, -5, 5
+        )
+
+        assert list(pws) == [1005, 1015, 1015, 995, 995]
+        assert direction == -1
+
+
+class TestMotionProfile:
+
+    bg = BrachioGraph(
+        virtual=True,
+        wait=0.01,
+        servo_1_max_speed=40,
+        servo_2_max_speed=60,
+        servo_1_max_acceleration=400,
+        servo_2_max_acceleration=400,
+    )
+
+    def test_limit_gains(self):
+        limits = numpy.array([5, 9, 1, 10, 10, 10, 2, 10.0])
+        gains = numpy.array([3, 3, 3, 3, 3, numpy.inf, 3, 3])
+
+        expected = []
+        for limit, gain in zip(limits, gains):
+            expected.append(min(limit, expected[-1] + gain) if expected else limit)
+
+        assert list(self.bg.limit_gains(limits, gains)) == approx(expected)
+
+    def test_profile_respects_limits(self):
+        lines = [[[-4, 8], [-2, 10], [0, 9], [3, 6]], [[2, 11], [-3, 12]]]
+        trajectory = self.bg.compile_lines(lines)
+
+        movements = numpy.diff(
+            numpy.column_stack((trajectory.angles_1, trajectory.angles_2)),
+            axis=0,
+            prepend=[[self.bg.angle_1, self.bg.angle_2]],
+        )
+        waits = numpy.where(trajectory.waits > 0, trajectory.waits, numpy.inf)
+        speeds = numpy.abs(movements / waits[:, numpy.newaxis])
+
+        assert speeds[:, 0].max() <= 40.001
+        assert speeds[:, 1].max() <= 60.001
+
+        # the servos start slowly, and slow down when the pen is about to be raised
+        pen_moves = numpy.flatnonzero(trajectory.draw[1:] != trajectory.draw[:-1])
+        assert speeds[0].max() < 10
+        assert speeds[pen_moves].max() < 10
+
+        # long moves are much quicker than at a constant 0.1˚ per 0.01s
+        assert trajectory.waits.sum() < len(trajectory) * 0.01 / 2
+
+    def test_play_with_profile(self):
+        trajectory = self.bg.compile_lines([[[-4, 8], [-2, 10]]])
+        self.bg.play(trajectory)
+
+        assert (self.bg.x, self.bg.y) == approx((-2, 10))
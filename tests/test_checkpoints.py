@@ -0,0 +1,103 @@
+import copy
+import json
+
+import pytest
+from pytest import approx
+
+from jobs import PlotJob
+
+
+class TestCheckpoints:
+    def test_checkpoint_removed_when_finished(self, tmp_path, plotter, lines):
+        checkpoint = tmp_path / "drawing.checkpoint"
+        plotter().plot_lines(copy.deepcopy(lines), checkpoint=str(checkpoint))
+        assert not checkpoint.exists()
+
+    def test_resume(self, tmp_path, plotter, lines, record_steps):
+        checkpoint = str(tmp_path / "drawing.checkpoint")
+        layers = [{"lines": lines + [[[0, 8], [0, 10]]], "repeat": 2}]
+
+        bg = plotter()
+        whole = record_steps(bg)
+        bg.plot_layers(copy.deepcopy(layers), checkpoint=checkpoint)
+
+        bg = plotter()
+        interrupted = record_steps(bg, interrupt_after=len(whole) * 2 // 3)
+        with pytest.raises(KeyboardInterrupt):
+            bg.plot_layers(copy.deepcopy(layers), checkpoint=checkpoint)
+
+        with open(checkpoint) as checkpoint_file:
+            saved = json.load(checkpoint_file)
+        assert saved["layer"] == 0
+        assert saved["repetition"] == 1
+        assert (bg.angle_1, bg.angle_2) == (approx(saved["angle_1"]), approx(saved["angle_2"]))
+
+        bg = plotter()
+        resumed = record_steps(bg)
+        bg.plot_layers(copy.deepcopy(layers), checkpoint=checkpoint, resume=True)
+
+        # The drawing continues from the start of the segment that was interrupted, and finishes
+        # exactly as the uninterrupted one did.
+        drawn = [step for step in resumed if step[2] == "down"]
+        assert len(drawn) < len([step for step in whole if step[2] == "down"]) / 2
+        assert resumed[-1] == whole[-1]
+        assert not (tmp_path / "drawing.checkpoint").exists()
+
+    def test_checkpoint_for_another_drawing(self, tmp_path, plotter, lines, record_steps):
+        checkpoint = str(tmp_path / "drawing.checkpoint")
+
+        bg = plotter()
+        record_steps(bg, interrupt_after=50)
+        with pytest.raises(KeyboardInterrupt):
+            bg.plot_lines(copy.deepcopy(lines), checkpoint=checkpoint)
+
+        with pytest.raises(ValueError):
+            plotter().plot_lines(copy.deepcopy(lines[:1]), checkpoint=checkpoint, resume=True)
+
+    def test_plot_file_checkpoints_only_when_asked(self, tmp_path, plotter, lines, record_steps):
+        filename = tmp_path / "drawing.json"
+        filename.write_text(json.dumps(lines))
+        checkpoint = tmp_path / "drawing.json.checkpoint"
+
+        bg = plotter()
+        record_steps(bg, interrupt_after=50)
+        with pytest.raises(KeyboardInterrupt):
+            bg.plot_file(str(filename))
+        assert not checkpoint.exists()
+
+        bg = plotter()
+        record_steps(bg, interrupt_after=50)
+        with pytest.raises(KeyboardInterrupt):
+            bg.plot_file(str(filename), checkpoint=True)
+        assert checkpoint.exists()
+
+        plotter().plot_file(str(filename), resume=True)
+        assert not checkpoint.exists()
+
+    def test_cancelled_job_removes_checkpoint(self, tmp_path, plotter, lines, record_steps):
+        checkpoint = tmp_path / "drawing.checkpoint"
+        layers = [{"lines": lines, "repeat": 1}]
+
+        bg = plotter()
+        record_steps(bg, interrupt_after=50)
+        with pytest.raises(KeyboardInterrupt):
+            bg.plot_layers(copy.deepcopy(layers), checkpoint=str(checkpoint))
+        assert checkpoint.exists()
+
+        # cancelled part of the way through the rest of the drawing
+        bg = plotter()
+        job = PlotJob(layers)
+        sent = record_steps(bg)
+        set_pulse_widths = bg.set_pulse_widths
+
+        def cancelling_set_pulse_widths(pw_1=None, pw_2=None):
+            if len(sent) == 20:
+                job.stopping.set()
+            set_pulse_widths(pw_1, pw_2)
+
+        bg.set_pulse_widths = cancelling_set_pulse_widths
+        bg.plot_layers(copy.deepcopy(layers), job=job, checkpoint=str(checkpoint), resume=True)
+
+        assert 20 < len(sent) < 50
+        assert bg.pen.position == "up"
+        assert not checkpoint.exists()
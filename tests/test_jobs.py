@@ -0,0 +1,87 @@
+from concurrent.futures import CancelledError
+from time import sleep
+
+import pytest
+from pytest import approx
+
+from brachiograph import BrachioGraph
+from jobs import PlotJob
+from waveforms import WavePlayer, MockPi
+
+
+class TestSubmit:
+
+    bg = BrachioGraph(virtual=True, wait=0.001, angular_step=1, resolution=0.5)
+
+    def test_jobs_run_in_order(self, lines):
+        finished = []
+
+        first = self.bg.submit(lines)
+        second = self.bg.submit(lines)
+        first.add_done_callback(finished.append)
+        second.add_done_callback(finished.append)
+
+        assert second.result(timeout=30) is None
+        assert finished == [first, second]
+
+        assert (first.lines_done, first.lines) == (2, 2)
+        assert first.steps_done == first.steps > 0
+        assert first.eta == 0
+        assert self.bg.angle_1 == approx(-90)
+
+    def test_progress_and_cancel(self, lines):
+        job = self.bg.submit(lines, wait=0.01)
+        queued = self.bg.submit(lines)
+
+        while job.steps_done < 20:
+            sleep(0.01)
+
+        assert 0 < job.steps_done < job.steps
+        assert job.eta > 0
+
+        assert queued.cancel()
+
+        # a running job can't be cancelled, only stopped
+        assert not job.cancel()
+        assert job.stop()
+
+        with pytest.raises(CancelledError):
+            job.result(timeout=30)
+        assert queued.cancelled()
+        assert not job.cancelled()
+        assert not job.stop()
+
+        # the plotter stopped at the last step played
+        step = job.step
+        assert self.bg.angle_1 == job.trajectory.angles_1[step - 1]
+        assert self.bg.pen.position == "up"
+
+    def test_waves(self, plotter, lines):
+        bg = plotter(wait=0.01)
+        bg.wave_player = WavePlayer(MockPi())
+        layers = [{"lines": lines, "repeat": 3}]
+
+        played = []
+        play_waves = bg.play_waves
+
+        def stopping_play_waves(trajectory, wait=None):
+            # the job is tracked while each pass is played
+            played.append((job.trajectory is trajectory, job.step))
+            play_waves(trajectory, wait)
+            job.stopping.set()
+
+        bg.play_waves = stopping_play_waves
+        job = PlotJob(layers)
+        bg.plot_layers(layers, job=job)
+
+        # stopped after the first pass
+        assert played == [(True, 0)]
+        assert job.steps_done == len(job.trajectory)
+        assert job.steps_done < job.steps
+        assert bg.pen.position == "up"
+
+        # a stopped job doesn't start another pass
+        rpi = bg.wave_player.rpi
+        sent = len(rpi.sent)
+        bg.play(bg.compile_lines(lines), job=job)
+        assert len(rpi.sent) == sent
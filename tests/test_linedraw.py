@@ -0,0 +1,185 @@
+import shutil
+
+import pytest
+from pytest import approx
+
+import linedraw
+
+
+@pytest.fixture
+def image(tmp_path, monkeypatch):
+    # vectorise() writes an SVG file alongside the image, so work in a temporary directory
+    shutil.copy("images/africa.jpg", tmp_path)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(linedraw, "svg_folder", "")
+    monkeypatch.setattr(linedraw, "json_folder", "")
+    return "africa.jpg"
+
+
+class TestLayers:
+    def test_repeats_are_not_duplicated(self, image):
+        layers = linedraw.vectorise(
+            image, resolution=256, draw_contours=2, repeat_contours=3, draw_hatch=16
+        )
+
+        assert [layer["repeat"] for layer in layers] == [3, 1]
+
+        lines = linedraw.layers_to_lines(layers)
+        assert len(lines) == len(layers[0]["lines"]) + len(layers[1]["lines"])
+        assert len(set(map(id, lines))) == len(lines)
+
+    def test_layers_to_lines_with_repeat(self, image):
+        layers = linedraw.vectorise(image, resolution=256, draw_contours=2, repeat_contours=3)
+
+        assert len(linedraw.layers_to_lines(layers, repeat=True)) == 3 * len(layers[0]["lines"])
+
+    def test_image_to_json_saves_layers(self, image):
+        import json
+
+        linedraw.image_to_json(image, resolution=256, draw_contours=2, repeat_contours=2)
+
+        with open(image + ".json") as saved:
+            data = json.load(saved)
+
+        assert data["layers"][0]["repeat"] == 2
+
+
+class TestSmallComponents:
+    def speckled_edges(self):
+        from PIL import Image, ImageDraw
+
+        image = Image.new("L", (64, 64))
+        draw = ImageDraw.Draw(image)
+        draw.line((5, 5, 50, 40), fill=255)  # a long edge
+        draw.point((60, 2), fill=255)  # speckle
+        draw.line((30, 55, 31, 56), fill=255)  # a diagonal pair of pixels
+        return image
+
+    @pytest.mark.parametrize("no_cv", [False, True])
+    def test_remove_small_components(self, no_cv, monkeypatch):
+        if not no_cv:
+            pytest.importorskip("cv2")
+        monkeypatch.setattr(linedraw, "no_cv", no_cv)
+
+        image = linedraw.remove_small_components(self.speckled_edges(), 3)
+        pixels = image.load()
+
+        assert pixels[5, 5] == pixels[50, 40] == 255
+        assert pixels[60, 2] == pixels[30, 55] == pixels[31, 56] == 0
+
+        image = linedraw.remove_small_components(self.speckled_edges(), 2)
+        assert image.load()[30, 55] == 255
+
+
+class TestFitToPen:
+    def test_resolution_reduced_to_pen_widths(self):
+        # 14cm across with a 0.5mm pen is 280 pen-widths
+        assert linedraw.fit_to_pen(1024, 2, 16, (-8, 4, 6, 13), 0.5) == (280, 1, 4)
+
+    def test_contours_keep_their_size(self):
+        assert linedraw.fit_to_pen(1024, 8, 16, (-8, 4, 6, 13), 0.5)[1] == approx(8 * 280 / 1024)
+
+    def test_fine_resolution_is_unchanged(self):
+        assert linedraw.fit_to_pen(256, 2, 16, (-8, 4, 6, 13), 0.5) == (256, 2, 16)
+
+    def test_hatching_no_finer_than_pen(self):
+        assert linedraw.fit_to_pen(1024, 0, 4, (-8, 4, 6, 13), 0.5)[2] == 2
+
+    def test_vectorise_with_pen_width(self, image):
+        layers = linedraw.vectorise(
+            image, draw_contours=2, draw_hatch=16, bounds=(-8, 4, 6, 13), pen_width=1
+        )
+
+        points = [point for layer in layers for line in layer["lines"] for point in line]
+        assert max(x for x, y in points) <= 140
+
+
+class TestLevelsOfDetail:
+    def test_simplify_line(self):
+        line = [(0, 0), (1, 0.01), (2, 0), (3, 5), (4, 0)]
+
+        assert linedraw.simplify_line(line, 0.1) == [(0, 0), (2, 0), (3, 5), (4, 0)]
+
+    def test_levels_are_progressively_simpler(self, image):
+        layers = linedraw.vectorise(image, resolution=256, draw_contours=1, draw_hatch=8)
+        levels = linedraw.levels_of_detail(layers)
+
+        def segments(layers):
+            return sum(len(line) - 1 for line in linedraw.layers_to_lines(layers))
+
+        assert segments(layers) > segments(levels["medium"]) > segments(levels["coarse"])
+
+    def test_importance(self):
+        from PIL import Image, ImageDraw
+
+        # two strokes of the same length, across the dark and the pale half of an image
+        image = Image.new("L", (100, 100), 255)
+        ImageDraw.Draw(image).rectangle((0, 0, 99, 49), fill=0)
+        dark, pale = [(10, 20), (40, 20)], [(10, 80), (40, 80)]
+        frame = [(0, 0), (0, 100)]
+        layers = [{"lines": [frame, dark, pale], "repeat": 1}]
+        levels = [("draft", 0, 0.25)]
+
+        # by length alone, both are kept
+        assert linedraw.levels_of_detail(layers, levels)["draft"][0]["lines"] == layers[0]["lines"]
+
+        # the pale one isn't as important as the dark one
+        draft = linedraw.levels_of_detail(layers, levels, image=image)["draft"]
+        assert dark in draft[0]["lines"] and pale not in draft[0]["lines"]
+
+        # and a stroke that's drawn more times is more important
+        layers = [{"lines": [frame], "repeat": 1}, {"lines": [[(10, 80), (22, 80)]], "repeat": 3}]
+        assert linedraw.levels_of_detail(layers, levels)["draft"][1]["lines"]
+
+    def test_image_to_json_saves_levels(self, image):
+        import json
+
+        linedraw.image_to_json(image, resolution=256, draw_contours=2, levels=True)
+
+        with open(image + ".json") as saved:
+            data = json.load(saved)
+
+        assert set(data["levels"]) == {"coarse", "medium"}
+
+
+class TestSweep:
+    def test_sweep(self, image):
+        variants = linedraw.sweep(
+            image, resolutions=[128, 256], draw_contours=[0, 2], draw_hatch=[0, 16], workers=1
+        )
+
+        # the variant with neither contours nor hatching is skipped
+        assert len(variants) == 6
+        assert {"lines", "segments", "drawing", "travel"} <= set(variants[0])
+
+        contours_only = [v for v in variants if v["draw_contours"] and not v["draw_hatch"]]
+        both = [v for v in variants if v["draw_contours"] and v["draw_hatch"]]
+        # contours are computed once and shared between variants
+        assert contours_only[0]["layers"][0]["lines"] is both[0]["layers"][0]["lines"]
+
+        from PIL import Image
+
+        assert Image.open(image + ".sweep.png").size == (3 * 320, 2 * 350)
+
+    def test_sweep_in_parallel(self, image):
+        variants = linedraw.sweep(image, resolutions=[128], draw_contours=[2, 4], workers=2)
+
+        assert [v["draw_contours"] for v in variants] == [2, 4]
+
+    def test_sweep_shares_edge_maps_of_the_same_size(self, image, monkeypatch):
+        sizes = []
+        find_contour_edges = linedraw.find_contour_edges
+
+        def record_size(image, *args):
+            sizes.append(image.size)
+            return find_contour_edges(image, *args)
+
+        monkeypatch.setattr(linedraw, "find_contour_edges", record_size)
+
+        # at 130 and 131, contours 2 gives images equally wide but not equally tall, while
+        # contours 4 gives the same image; 260 and 4 gives the same image as 130 and 2
+        linedraw.sweep(
+            image, resolutions=[130, 131, 260], draw_contours=[2, 4], draw_hatch=[0], workers=1
+        )
+
+        assert sorted(sizes) == [(32, 36), (65, 72), (65, 73), (130, 145)]
@@ -1,6 +1,13 @@
-from plotter import Plotter
+from time import perf_counter
+
+import numpy
 from pytest import approx
 
+from plotter import Plotter
+from calibration import CalibrationTable
+from recording import MovementRecord
+from waveforms import MockPi
+
 
 class TestBasicPlotter:
 
@@ -77,3 +84,113 @@ class TestBiDiPlotter:
             approx(617 + self.plotter.hysteresis_correction_2, abs=1e-0),
         )
         assert (self.plotter.angle_1, self.plotter.angle_2) == (0, 0)
+
+
+class TestCalibrationTable:
+
+    angle_pws = [[-90, 1900], [-45, 1470], [0, 1050], [30, 760]]
+
+    def test_matches_polynomial(self):
+        table = CalibrationTable(self.angle_pws, cache=None)
+
+        for angle in (-90, -44.999, 0.005, 29.5, -200, 100):
+            assert table(angle) == approx(table.polynomial(angle), abs=1e-3)
+
+        angles = numpy.linspace(-150, 80, 1001)
+        assert table(angles) == approx(table.polynomial(angles), abs=1e-3)
+        assert table(angles)[500] == approx(table(float(angles[500])))
+
+    def test_table_is_cached(self, tmp_path):
+        table = CalibrationTable(self.angle_pws, cache=str(tmp_path))
+        saved = list(tmp_path.iterdir())
+        assert len(saved) == 1
+
+        cached_table = CalibrationTable(self.angle_pws, cache=str(tmp_path))
+        assert list(tmp_path.iterdir()) == saved
+        assert cached_table(-60.5) == table(-60.5)
+
+        CalibrationTable(self.angle_pws + [[45, 600]], cache=str(tmp_path))
+        assert len(list(tmp_path.iterdir())) == 2
+
+    def test_damaged_cache_is_replaced(self, tmp_path):
+        table = CalibrationTable(self.angle_pws, cache=str(tmp_path))
+        (saved,) = tmp_path.iterdir()
+        contents = saved.read_bytes()
+
+        for damaged in (b"", b"not a table", contents[: len(contents) // 2]):
+            saved.write_bytes(damaged)
+            rebuilt = CalibrationTable(self.angle_pws, cache=str(tmp_path))
+            assert rebuilt(-60.5) == table(-60.5)
+
+            # made again, and saved whole in its place
+            assert list(tmp_path.iterdir()) == [saved]
+            assert CalibrationTable(self.angle_pws, cache=str(tmp_path))(-60.5) == table(-60.5)
+            assert len(saved.read_bytes()) == len(contents)
+
+
+class TestMovementRecord:
+    def test_ranges_ignore_servos_that_did_not_move(self):
+        record = MovementRecord(batch=2)
+        record.record(-90, 1500, 90, 1450)
+        record.record(-45.5, 1000, None, None)
+        record.record(None, None, 120, 1800)
+
+        assert record.range("angle_1") == (-90, -45.5)
+        assert record.range("pw_2") == (1450, 1800)
+        assert record.count == 3
+
+    def test_empty_record(self):
+        record = MovementRecord()
+        assert record.range("angle_1") is None
+        record.record(None, None, 90, 1450)
+        assert record.range("angle_1") is None
+
+    def test_histograms(self):
+        record = MovementRecord(histograms=True)
+        for angle in range(-90, -60):
+            record.record(angle, 1500, None, None)
+        record.record_arrays(numpy.full(10, -75.5), numpy.full(10, 1505), [90] * 10, [1450] * 10)
+
+        assert record.distribution("angle_1") == [(-90, -80, 10), (-80, -70, 20), (-70, -60, 10)]
+        assert record.distribution("pw_1") == [(1500, 1600, 40)]
+        assert record.distribution("angle_2") == [(90, 100, 10)]
+
+
+class TestPen:
+    def pen(self, **options):
+        # a pen driving a recording stand-in for pigpio
+        pen = Plotter(virtual=True, pw_up=1500, pw_down=1100).pen
+        pen.virtual = False
+        pen.rpi = MockPi()
+        pen.sent = []
+        pen.rpi.set_servo_pulsewidth = lambda pin, pw: pen.sent.append((pw, perf_counter()))
+        pen.position = "down"
+        for option, value in options.items():
+            setattr(pen, option, value)
+        return pen
+
+    def test_ease_profile(self):
+        pen = self.pen(ease_step=30, ease_duration=0.2)
+
+        profile = pen.ease_profile(1100, 1500)
+        assert len(profile) == 14
+        assert profile[:3] == [1129, 1157, 1186]
+        assert profile[-1] == 1500
+        assert pen.ease_time() == 0.2
+        assert self.pen().ease_profile(1500, 1100) == list(range(1499, 1099, -1))
+        assert self.pen(ease_duration=0).ease_profile(1500, 1100) == [1100]
+
+    def test_lift_overlaps_movement(self):
+        pen = self.pen(ease_step=40, ease_duration=0.1, lift_overlap=True)
+
+        started = perf_counter()
+        pen.up()
+        assert perf_counter() - started < 0.05
+        assert pen.position == "up"
+
+        # lowering the pen waits for it to finish rising first
+        pen.down()
+        assert perf_counter() - started >= 0.2
+        assert [pw for pw, time in pen.sent] == list(range(1140, 1501, 40)) + list(
+            range(1460, 1099, -40)
+        )
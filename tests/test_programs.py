@@ -0,0 +1,73 @@
+from time import perf_counter
+
+import pytest
+from pytest import approx
+
+from programs import read_program
+
+
+class TestPrograms:
+    def test_record_and_replay(self, tmp_path, plotter, lines, record_steps):
+        program = str(tmp_path / "drawing.program")
+        lines = lines + [[[0, 8], [0, 10]]]
+
+        bg = plotter(resolution=0.2)
+        drawn = record_steps(bg)
+        bg.plot_lines(lines)
+
+        # a virtual plotter records a drawing without waiting between the steps
+        bg = plotter(wait=0.05, resolution=0.2)
+        started = perf_counter()
+        with bg.record_program(program):
+            bg.plot_lines(lines)
+        assert perf_counter() - started < len(drawn) * 0.05 / 10
+
+        end_angles, steps = read_program(program)
+        assert len(steps) == len(drawn)
+        assert end_angles == (approx(bg.angle_1), approx(bg.angle_2))
+        assert set(steps["wait"][1:].tolist()) == {50000}
+        assert set(steps["pen"].tolist()) == {bg.pen.pw_up, bg.pen.pw_down}
+
+        bg = plotter(resolution=0.2)
+        replayed = record_steps(bg)
+        intervals = []
+        bg.scheduler.wait = intervals.append
+        bg.replay(program)
+
+        # exactly the same pulse-widths, with the same pen movements and the same timing
+        assert replayed == drawn
+        assert intervals[1:] == [0.05] * (len(drawn) - 1)
+        assert (bg.angle_1, bg.angle_2) == end_angles
+
+    def test_interrupted_replay(self, tmp_path, plotter, lines, record_steps):
+        program = str(tmp_path / "drawing.program")
+
+        bg = plotter(resolution=0.2)
+        with bg.record_program(program):
+            bg.plot_lines(lines[:1])
+            bg.xy(2, 10)
+            angles = bg.angle_1, bg.angle_2
+            bg.park()
+
+        # the number of steps before parking
+        unparked = plotter(resolution=0.2)
+        with unparked.record_program(str(tmp_path / "unparked.program")):
+            unparked.plot_lines(lines[:1])
+            unparked.xy(2, 10)
+        steps_before_parking = len(read_program(str(tmp_path / "unparked.program"))[1])
+
+        bg = plotter(resolution=0.2)
+        record_steps(bg, interrupt_after=steps_before_parking)
+        with pytest.raises(KeyboardInterrupt):
+            bg.replay(program)
+
+        # the position is worked out from the last pulse-widths sent
+        assert (bg.angle_1, bg.angle_2) == (approx(angles[0], abs=0.1), approx(angles[1], abs=0.1))
+        assert bg.progress.active is False
+
+    def test_not_a_program(self, tmp_path, plotter):
+        not_a_program = tmp_path / "drawing.json"
+        not_a_program.write_text("[[[0, 0], [1, 1]]]" * 3)
+
+        with pytest.raises(ValueError):
+            plotter().replay(str(not_a_program))
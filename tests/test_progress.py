@@ -0,0 +1,83 @@
+import io
+
+from progress import Progress, TerminalSink
+
+
+class FakeClock:
+    """A clock that only moves when it's told to, counting how often it's read."""
+
+    def __init__(self):
+        self.time = 0
+        self.reads = 0
+
+    def __call__(self):
+        self.reads += 1
+        return self.time
+
+
+def count(progress, steps, step_time=0):
+    for step in range(steps):
+        if step_time:
+            progress.clock.time += step_time
+        progress.steps += 1
+        if progress.steps >= progress.due:
+            progress.refresh()
+
+
+class TestProgress:
+    def test_shown_at_a_fixed_rate(self):
+        shown = []
+        progress = Progress(lambda progress: shown.append(progress.steps), interval=0.1)
+        progress.clock = FakeClock()
+
+        # a second of steps, shown every tenth of a second
+        progress.start(10000)
+        count(progress, 10000, step_time=0.0001)
+        progress.finish()
+
+        assert 9 <= len(shown) <= 11
+        assert shown[-1] == 10000
+
+        # the clock is only read a few times an interval
+        assert progress.clock.reads < 100
+
+    def test_one_drawing_at_a_time(self):
+        progress = Progress()
+
+        assert progress.start(100)
+        assert not progress.start(10)
+        assert progress.total == 100
+
+        progress.finish()
+        assert progress.start(10)
+
+    def test_drawing(self, plotter, lines):
+        bg = plotter(resolution=0.1)
+        shown = []
+        bg.progress.sink = lambda progress: shown.append((progress.steps, progress.finished))
+        bg.progress.interval = 0
+
+        bg.plot_lines(lines)
+
+        # the steps of the whole drawing, including parking, were counted together
+        steps, finished = shown[-1]
+        assert finished
+        assert steps > bg.progress.total > 0
+        assert sorted(shown) == shown
+
+        # without a sink, nothing is shown
+        bg.progress.sink = None
+        bg.plot_lines(lines)
+        assert shown[-1] == (steps, finished)
+
+    def test_terminal(self):
+        stream = io.StringIO()
+        sink = TerminalSink(stream)
+        progress = Progress(sink, interval=0)
+
+        progress.start(200, "Plotting")
+        count(progress, 50)
+        assert stream.getvalue().split("\r")[-1].startswith("Plotting: 50/200 (25%) steps")
+
+        progress.finish()
+        assert stream.getvalue().split("\r")[-2].strip() == ""
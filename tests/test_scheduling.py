@@ -0,0 +1,139 @@
+from time import sleep
+
+import numpy
+from pytest import approx
+
+import scheduling
+from scheduling import Lateness, StepScheduler
+
+
+class FakeClock:
+    """A clock that only moves when it's read (by ``tick`` each time), or slept on."""
+
+    def __init__(self, tick=0.0001):
+        self.time = 0
+        self.tick = tick
+
+    def __call__(self):
+        self.time += self.tick
+        return self.time
+
+    def sleep(self, seconds):
+        # like the real thing, oversleep a little
+        self.time += seconds + 0.0005
+
+
+class TestStepScheduler:
+    def scheduler(self, monkeypatch, **kwargs):
+        clock = FakeClock()
+        monkeypatch.setattr(scheduling, "sleep", clock.sleep)
+        return StepScheduler(clock=clock, **kwargs), clock
+
+    def test_oversleeping_does_not_accumulate(self, monkeypatch):
+        scheduler, clock = self.scheduler(monkeypatch)
+
+        for step in range(1000):
+            scheduler.wait(0.01)
+
+        # 999 intervals after the first step
+        assert clock.time == approx(9.99, abs=0.001)
+        assert scheduler.statistics()["max"] < 0.001
+
+    def test_late_steps_catch_up(self, monkeypatch):
+        scheduler, clock = self.scheduler(monkeypatch)
+
+        for step in range(100):
+            if step == 50:
+                clock.time += 0.05  # a slow step
+            scheduler.wait(0.01)
+
+        assert clock.time == approx(0.99, abs=0.001)
+        statistics = scheduler.statistics()
+        assert statistics["max"] == approx(0.04, abs=0.001)
+        assert statistics["lost"] == 0
+
+    def test_time_lost(self, monkeypatch):
+        scheduler, clock = self.scheduler(monkeypatch)
+
+        for step in range(100):
+            if step == 50:
+                clock.time += 0.5
+            scheduler.wait(0.01)
+
+        assert scheduler.statistics()["lost"] == approx(0.49, abs=0.001)
+        assert clock.time == approx(1.48, abs=0.001)
+
+    def test_idle_time_is_not_lost(self, monkeypatch):
+        scheduler, clock = self.scheduler(monkeypatch)
+
+        scheduler.wait(0.01)
+        clock.time += 60
+        scheduler.wait(0.01)
+
+        assert scheduler.statistics()["lost"] == 0
+
+    def test_statistics(self, monkeypatch):
+        scheduler, clock = self.scheduler(monkeypatch)
+        assert scheduler.statistics()["steps"] == 0
+
+        scheduler.wait(0)  # steps without a wait aren't timed
+        scheduler.wait(0.01)
+        scheduler.wait(0.01)
+        assert scheduler.statistics()["steps"] == 2
+
+        scheduler.clear()
+        assert scheduler.statistics()["steps"] == 0
+
+
+class TestLateness:
+    def test_statistics(self):
+        lateness = Lateness()
+        late = numpy.random.default_rng(0).exponential(0.0005, 100000)
+        for value in late.tolist():
+            lateness.add(value)
+
+        statistics = lateness.statistics()
+        assert statistics["steps"] == 100000
+        assert statistics["mean"] == approx(late.mean())
+        assert statistics["max"] == late.max()
+        assert statistics["p99"] == approx(numpy.percentile(late, 99), rel=0.13)
+
+        # the summary doesn't grow with the number of steps
+        assert len(lateness.counts) == 142
+
+    def test_since(self):
+        lateness = Lateness()
+        for value in (0.001, 0.05, 0.002):
+            lateness.add(value)
+        since = lateness.copy()
+
+        assert lateness.statistics(since)["steps"] == 0
+
+        for value in (0.003, 0.004):
+            lateness.add(value)
+        statistics = lateness.statistics(since)
+        assert statistics["steps"] == 2
+        assert statistics["mean"] == approx(0.0035)
+        # the maximum since then is known to within a bin
+        assert statistics["max"] == approx(0.004, rel=0.13)
+        assert statistics["max"] >= 0.004
+
+        lateness.add(0.06)
+        assert lateness.statistics(since)["max"] == 0.06
+        assert lateness.statistics()["steps"] == 6
+
+
+def test_time_between_commands_is_not_lost(plotter):
+    bg = plotter(wait=0.001)
+    bg.scheduler.clear()
+
+    # a pause shorter than the scheduler's idle time, between two commands and two drawings
+    bg.xy(-2, 8)
+    sleep(0.3)
+    bg.xy(2, 8, draw=True)
+    sleep(0.3)
+    bg.plot_lines([[[-2, 8], [2, 10]]])
+    sleep(0.3)
+    bg.plot_lines([[[-2, 10], [2, 8]]])
+
+    assert bg.scheduler.statistics()["lost"] < 0.1
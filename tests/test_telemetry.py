@@ -0,0 +1,90 @@
+import json
+
+import numpy
+import pytest
+from pytest import approx
+
+from plotter import Trajectory
+from telemetry import RunRecord
+
+
+class TestRunRecord:
+    def test_record_of_drawing(self, tmp_path, plotter, lines, record_steps):
+        bg = plotter(wait=0.0002, resolution=0.1)
+        sent = record_steps(bg)
+        bg.plot_lines(lines, telemetry=str(tmp_path / "run.json"))
+
+        with open(tmp_path / "run.json") as record_file:
+            record = json.load(record_file)
+
+        assert record["finished"]
+        assert record["pen_lifts"] == 2
+
+        seconds = record["seconds"]
+        parts = seconds["compute"] + seconds["pen"] + seconds["drawing"] + seconds["travel"]
+        assert parts == approx(seconds["total"])
+        assert 0 < seconds["sleep"] < seconds["drawing"] + seconds["travel"]
+
+        # every step, parking included, is timed, as well as counted
+        steps = record["steps"]
+        assert steps["drawing"] + steps["travel"] == steps["total"] == len(sent)
+        assert record["lateness"]["steps"] >= steps["total"]
+
+        # the lines, drawn as large as the bounds allow
+        scaled = bg.rotate_and_scale_lines(lines, flip=True)
+        length = sum(numpy.hypot(*numpy.diff(line, axis=0).T).sum() for line in scaled)
+        assert record["distance_cm"]["drawing"] == approx(length, rel=0.01)
+        assert record["reversals"]["servo_1"] > 0
+
+    def test_interrupted_drawing(self, tmp_path, plotter, lines):
+        bg = plotter(wait=0.0002, resolution=0.1)
+
+        def set_pulse_widths(pw_1=None, pw_2=None):
+            raise KeyboardInterrupt
+
+        bg.set_pulse_widths = set_pulse_widths
+        with pytest.raises(KeyboardInterrupt):
+            bg.plot_lines(lines, telemetry=str(tmp_path / "run.json"))
+
+        with open(tmp_path / "run.json") as record_file:
+            record = json.load(record_file)
+        assert not record["finished"]
+        assert record["steps"]["total"] == 0
+        assert bg.last_run.as_dict()["finished"] is False
+
+    def test_reversals(self, plotter):
+        bg = plotter(wait=0.0002, resolution=0.1)
+        record = RunRecord(bg)
+        record.start()
+
+        trajectory = Trajectory()
+        trajectory.angles_1 = numpy.array([-89, -88, -88, -89, -90, -89])
+        trajectory.angles_2 = numpy.array([90, 90, 90, 90, 90, 90])
+        trajectory.draw = numpy.ones(6, dtype=bool)
+
+        record.add_trajectory(trajectory, None, -90, 90)
+        assert record.reversals == [2, 0]
+
+        # the direction is carried over to the next trajectory
+        record.add_trajectory(trajectory, 2, -89, 90)
+        assert record.reversals == [2, 0]
+        record.add_trajectory(trajectory, 1, -88, 90)
+        assert record.reversals == [3, 0]
+
+    def test_textfile(self, tmp_path, plotter, lines):
+        bg = plotter(wait=0.0002, resolution=0.1)
+        bg.plot_lines(lines, textfile=str(tmp_path / "brachiograph.prom"))
+
+        metrics = {}
+        with open(tmp_path / "brachiograph.prom") as textfile:
+            for line in textfile:
+                if not line.startswith("#"):
+                    name, value = line.split()
+                    metrics[name] = float(value)
+
+        record = bg.last_run.as_dict()
+        assert metrics["brachiograph_plot_finished"] == 1
+        assert metrics['brachiograph_plot_steps{pen="drawing"}'] == record["steps"]["drawing"]
+        assert metrics['brachiograph_plot_reversals{servo="2"}'] == record["reversals"]["servo_2"]
+        assert metrics["brachiograph_plot_duration_seconds"] == approx(record["seconds"]["total"])
+        assert not (tmp_path / "brachiograph.prom.tmp").exists()
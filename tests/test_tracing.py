@@ -0,0 +1,61 @@
+import json
+
+import numpy
+
+from tracing import StepTracer
+
+
+class TestStepTracer:
+    def test_stages_of_sampled_steps(self, plotter):
+        bg = plotter(resolution=0.1)
+        bg.xy(-2, 8)
+        bg.tracer = StepTracer(every=10)
+        bg.xy(2, 8, draw=True)
+
+        spans = bg.tracer.records()
+        stages = {bg.tracer.stages[stage] for stage in spans[:, 0]}
+        assert stages == {"kinematics", "calibration", "hysteresis", "recording", "io", "sleep"}
+
+        # only every tenth step is timed, and each of its stages in turn
+        assert set(spans[:, 1] % 10) == {0}
+        assert (spans[:, 3] >= spans[:, 2]).all()
+        assert (spans[1:, 2] >= spans[:-1, 2]).all()
+
+        statistics = bg.tracer.statistics()
+        assert statistics["io"]["spans"] == len(range(0, bg.tracer.step, 10))
+        assert statistics["calibration"]["spans"] == 2 * statistics["io"]["spans"]
+
+    def test_compiled_drawing(self, plotter):
+        bg = plotter(resolution=0.1)
+        bg.tracer = StepTracer(every=1)
+        bg.plot_lines([[[-2, 8], [2, 8]]])
+
+        statistics = bg.tracer.statistics()
+        assert statistics["sleep"]["spans"] >= statistics["io"]["spans"] > 40
+
+    def test_ring_buffer(self):
+        tracer = StepTracer(every=1, capacity=16)
+        for step in range(10):
+            start = tracer.clock()
+            tracer.span("kinematics", start)
+            tracer.span("io", start)
+            tracer.next_step()
+
+        # the oldest spans are overwritten
+        spans = tracer.records()
+        assert len(spans) == 16
+        assert spans[:, 1].tolist() == numpy.repeat(numpy.arange(2, 10), 2).tolist()
+
+    def test_chrome_trace(self, tmp_path, plotter):
+        bg = plotter(resolution=0.1)
+        bg.tracer = StepTracer(every=5)
+        bg.xy(2, 8, draw=True)
+        bg.tracer.chrome_trace(str(tmp_path / "trace.json"))
+
+        with open(tmp_path / "trace.json") as trace_file:
+            events = json.load(trace_file)["traceEvents"]
+
+        assert len(events) == len(bg.tracer.records())
+        assert {event["ph"] for event in events} == {"X"}
+        assert events[0]["name"] in StepTracer.stages
+        assert events[-1]["dur"] >= 0
@@ -0,0 +1,93 @@
+from pytest import approx
+
+from brachiograph import BrachioGraph
+from waveforms import WavePlayer, MockPi
+
+
+class TestWavePlayer:
+    def test_frames_sample_the_steps(self):
+        player = WavePlayer(MockPi())
+        frames = player.frames([1000, 1100, 1200], [1500, 1500, 1400], [1400, 1400, 1600], 0.03)
+
+        assert frames.tolist() == [
+            [1000, 1500, 1400],
+            [1000, 1500, 1400],
+            [1100, 1500, 1400],
+            [1200, 1400, 1600],
+        ]
+
+    def test_frame_pulses(self):
+        player = WavePlayer(MockPi())
+        pulses = player.frame_pulses([1000, 1500, 1000])
+
+        assert [(p.gpio_on, p.gpio_off, p.delay) for p in pulses] == [
+            (1 << 14 | 1 << 15 | 1 << 18, 0, 1000),
+            (0, 1 << 14 | 1 << 18, 500),
+            (0, 1 << 15, 18500),
+        ]
+        assert sum(pulse.delay for pulse in player.frame_pulses([0, 0, 0])) == 20000
+
+    def test_play_streams_chunks(self):
+        rpi = MockPi()
+        player = WavePlayer(rpi, frames_per_chunk=10)
+        steps = 100
+        pws = [1000 + n for n in range(steps)]
+        player.play(pws, pws, [1500] * steps, wait=0.01)
+
+        # the last step starts after 0.99s, in the 51st frame
+        assert len(rpi.frames()) == 51
+        assert len(rpi.sent) == 6
+        assert not rpi.waves  # all deleted once transmitted
+        for pulses in rpi.sent[:-1]:
+            assert sum(pulse.delay for pulse in pulses) == 10 * 20000
+        assert rpi.frames()[-1] == [1099, 1099, 1500]
+        assert rpi.servo_pulse_widths == {14: 1099, 15: 1099, 18: 1500}
+
+
+class TestPlotterWithWaves:
+    def test_plot_lines_with_waves(self):
+        bg = BrachioGraph(virtual=True, wait=0.01)
+        rpi = MockPi()
+        bg.wave_player = WavePlayer(rpi)
+
+        trajectory = bg.compile_lines([[[-4, 8], [-2, 10]]])
+        bg.play(trajectory)
+
+        frames = rpi.frames()
+        # one frame for every two 10ms steps, and another 21 while the pen is lowered over 0.4s
+        # and then held for a frame
+        assert len(frames) == approx(len(trajectory) / 2 + 21, abs=1)
+        assert frames[0][2] == bg.pen.pw_up and frames[-1][2] == bg.pen.pw_down
+        assert bg.pen.position == "down"
+        assert (bg.x, bg.y) == approx((-2, 10))
+
+    def test_pen_eases_before_the_arms_move(self):
+        bg = BrachioGraph(virtual=True, wait=0.01)
+        bg.pen.ease_step, bg.pen.ease_duration = 20, 0.2
+        rpi = MockPi()
+        bg.wave_player = WavePlayer(rpi)
+
+        lifts = bg.pen.lifts
+        bg.play(bg.compile_lines([[[-4, 8], [-2, 10]], [[0, 8], [2, 10]]]))
+        frames = rpi.frames()
+
+        # the pen is lowered, raised and lowered again
+        pens = [pen for arm_1, arm_2, pen in frames]
+        changing = [n for n in range(1, len(frames)) if pens[n] != pens[n - 1]]
+        runs = [[changing[0]]]
+        for n in changing[1:]:
+            if n == runs[-1][-1] + 1:
+                runs[-1].append(n)
+            else:
+                runs.append([n])
+        assert len(runs) == 3
+        assert bg.pen.lifts == lifts + 1
+
+        for run in runs:
+            # the pen eases over 0.2s, or ten frames, while the arms are held where they were, and
+            # only move once it has finished
+            assert len(run) == approx(10, abs=1)
+            held = {tuple(frame[:2]) for frame in frames[run[0] : run[-1] + 1]}
+            assert len(held) == 1
+            assert pens[run[-1]] in (bg.pen.pw_up, bg.pen.pw_down)
+            assert all(bg.pen.pw_down < pen < bg.pen.pw_up for pen in pens[run[0] : run[-1]])
@@ -0,0 +1,113 @@
+"""Sampled timing of the stages of each servo step, cheap enough to leave running on a Raspberry
+Pi, and exported for Chrome's trace viewer."""
+
+from array import array
+from time import perf_counter_ns
+import json
+
+import numpy
+
+
+class StepTracer:
+    """Times the stages of every ``every``-th step that the plotter takes - working out the
+    angles (``kinematics``), converting them to pulse-widths (``calibration``), correcting those
+    for ``hysteresis``, ``recording`` the movement, mirroring it on the ``turtle``, sending it to
+    the servos (``io``) and waiting for the step to be due (``sleep``).
+
+    To trace a plotter, set its ``tracer``::
+
+        bg.tracer = StepTracer()
+
+    Each stage of a sampled step is stored as a span - its stage, the step, and its start and end
+    in nanoseconds - in a ring buffer allocated in advance, holding the last ``capacity`` spans.
+    On the steps that aren't sampled, nothing is timed; the cost is that of counting the step.
+    """
+
+    stages = ("kinematics", "calibration", "hysteresis", "recording", "turtle", "io", "sleep")
+
+    def __init__(self, every=100, capacity=65536, clock=perf_counter_ns):
+
+        self.every = every
+        self.capacity = capacity
+        self.clock = clock
+        self.codes = {stage: code for code, stage in enumerate(self.stages)}
+
+        # each span is four numbers: the stage, the step, and the start and end times
+        self.spans = array("q", bytes(8 * 4 * capacity))
+        self.clear()
+
+    def clear(self):
+        """Discards the spans recorded so far."""
+
+        self.recorded = 0  # the number of spans recorded, including any overwritten since
+        self.step = 0
+        self.sampling = True
+
+    def next_step(self):
+        """Counts a step, and decides whether the next one is sampled."""
+
+        self.step += 1
+        self.sampling = not self.step % self.every
+
+    def span(self, stage, start):
+        """Records that ``stage`` of the step being sampled took from ``start`` until now, and
+        returns the time now, so that it can be the start of the next stage."""
+
+        end = self.clock()
+        spans, position = self.spans, self.recorded % self.capacity * 4
+        spans[position] = self.codes[stage]
+        spans[position + 1] = self.step
+        spans[position + 2] = start
+        spans[position + 3] = end
+        self.recorded += 1
+        return end
+
+    def records(self):
+        """Returns the spans in the buffer, oldest first, as an array of rows of stage, step,
+        start and end."""
+
+        spans = numpy.frombuffer(self.spans, dtype=numpy.int64).reshape(-1, 4)
+        if self.recorded <= self.capacity:
+            return spans[: self.recorded].copy()
+        return numpy.roll(spans, -(self.recorded % self.capacity), axis=0)
+
+    def statistics(self):
+        """Returns a dictionary of the stages sampled, each a dictionary of the number of spans,
+        and their mean, 99th percentile and maximum duration in microseconds."""
+
+        spans = self.records()
+        durations = (spans[:, 3] - spans[:, 2]) / 1000
+
+        statistics = {}
+        for code, stage in enumerate(self.stages):
+            stage_durations = durations[spans[:, 0] == code]
+            if len(stage_durations):
+                statistics[stage] = {
+                    "spans": len(stage_durations),
+                    "mean": float(stage_durations.mean()),
+                    "p99": float(numpy.percentile(stage_durations, 99)),
+                    "max": float(stage_durations.max()),
+                }
+
+        return statistics
+
+    def chrome_trace(self, filename):
+        """Saves the spans in ``filename`` in the Trace Event Format, to be opened in
+        ``chrome://tracing`` or Perfetto."""
+
+        events = [
+            {
+                "name": self.stages[stage],
+                "cat": "step",
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": (end - start) / 1000,
+                "pid": 1,
+                "tid": 1,
+                "args": {"step": step},
+            }
+            for stage, step, start, end in self.records().tolist()
+        ]
+
+        with open(filename, "w") as trace_file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ns"}, trace_file)
@@ -0,0 +1,193 @@
+"""Hardware-timed playback of servo movements, using pigpio waveforms."""
+
+from time import sleep
+import numpy
+import pigpio
+
+
+class WavePlayer:
+    """Plays sequences of pulse-widths on the servo pins as pigpio waveforms, so that their timing
+    is handled by the Raspberry Pi's DMA engine rather than by Python.
+
+    Each frame of the waveform (20ms by default, the 50Hz period that the servos expect) starts
+    a pulse on every pin, and ends each one after its pulse-width. The frames are sent in chunks,
+    each queued to follow the one before without a gap, so that a waveform of any length can be
+    streamed.
+    """
+
+    def __init__(
+        self,
+        rpi,
+        pins=(14, 15, 18),  # shoulder, elbow and pen servos
+        frame=20000,  # the length of each frame in µs
+        frames_per_chunk=100,  # the number of frames in each waveform sent to pigpio
+        poll=0.005,  # how often, in seconds, to check whether a chunk has been transmitted
+    ):
+
+        self.rpi = rpi
+        self.pins = pins
+        self.frame = frame
+        self.frames_per_chunk = frames_per_chunk
+        self.poll = poll
+
+    def play(self, pws_1, pws_2, pws_3, wait=0):
+        """Plays a series of steps, each a set of pulse-widths (one for each pin; 0 means no
+        pulse) held for ``wait`` seconds. ``wait`` can be a single value, or one per step."""
+
+        frames = self.frames(pws_1, pws_2, pws_3, wait)
+
+        # waveforms can't share the pins with the servo pulses that pigpio generates itself
+        for pin in self.pins:
+            self.rpi.set_servo_pulsewidth(pin, 0)
+            self.rpi.set_mode(pin, pigpio.OUTPUT)
+
+        self.rpi.wave_clear()
+        previous_wave = None
+
+        for start in range(0, len(frames), self.frames_per_chunk):
+            pulses = []
+            for pws in frames[start : start + self.frames_per_chunk]:
+                pulses.extend(self.frame_pulses(pws))
+
+            self.rpi.wave_add_generic(pulses)
+            wave = self.rpi.wave_create()
+            self.rpi.wave_send_using_mode(wave, pigpio.WAVE_MODE_ONE_SHOT_SYNC)
+
+            # Once the previous chunk has been transmitted, it can be deleted to make room for
+            # the next; there are never more than two chunks waiting.
+            if previous_wave is not None:
+                while self.rpi.wave_tx_at() == previous_wave:
+                    sleep(self.poll)
+                self.rpi.wave_delete(previous_wave)
+
+            previous_wave = wave
+
+        while self.rpi.wave_tx_busy():
+            sleep(self.poll)
+
+        if previous_wave is not None:
+            self.rpi.wave_delete(previous_wave)
+
+        # hold the final position
+        for pin, pw in zip(self.pins, frames[-1]):
+            self.rpi.set_servo_pulsewidth(pin, int(pw))
+
+    def frames(self, pws_1, pws_2, pws_3, wait=0):
+        """Returns an array of the pulse-widths to be used in each frame: the latest step that has
+        started by the beginning of the frame. There is always at least one frame, for the final
+        step."""
+
+        pws = numpy.column_stack((pws_1, pws_2, pws_3)).round().astype(int)
+
+        waits = numpy.broadcast_to(numpy.asarray(wait, dtype=float) * 1e6, len(pws))
+        starts = numpy.concatenate(([0], numpy.cumsum(waits)[:-1]))
+
+        no_of_frames = max(int(numpy.ceil(starts[-1] / self.frame)), 0) + 1
+        frame_starts = numpy.arange(no_of_frames) * self.frame
+        steps = numpy.searchsorted(starts, frame_starts, side="right") - 1
+
+        frames = pws[steps]
+        frames[-1] = pws[-1]
+        return frames
+
+    def frame_pulses(self, pws):
+        """Returns the pigpio pulses for a single frame."""
+
+        pulse_widths = {}
+        for pin, pw in zip(self.pins, pws):
+            if pw > 0:
+                pulse_widths.setdefault(int(pw), []).append(pin)
+
+        if not pulse_widths:
+            return [pigpio.pulse(0, 0, self.frame)]
+
+        on = 0
+        for pins in pulse_widths.values():
+            for pin in pins:
+                on |= 1 << pin
+
+        times = sorted(pulse_widths)
+        pulses = [pigpio.pulse(on, 0, times[0])]
+
+        for time, next_time in zip(times, times[1:] + [self.frame]):
+            off = 0
+            for pin in pulse_widths[time]:
+                off |= 1 << pin
+            pulses.append(pigpio.pulse(0, off, next_time - time))
+
+        return pulses
+
+
+class MockPi:
+    """A stand-in for a ``pigpio.pi()`` instance, that records what it's asked to do instead of
+    doing it, so that playback can be tested without a Raspberry Pi. Waves are transmitted
+    instantly."""
+
+    connected = True
+
+    def __init__(self):
+        self.servo_pulse_widths = {}
+        self.modes = {}
+        self.waves = {}  # the pulses of each wave that currently exists
+        self.sent = []  # the pulses of each wave sent, in order
+        self.pending = []
+        self.next_wave = 0
+
+    def set_PWM_frequency(self, pin, frequency):
+        return frequency
+
+    def set_mode(self, pin, mode):
+        self.modes[pin] = mode
+
+    def set_servo_pulsewidth(self, pin, pulse_width):
+        self.servo_pulse_widths[pin] = pulse_width
+
+    def get_servo_pulsewidth(self, pin):
+        return self.servo_pulse_widths.get(pin, 0)
+
+    def wave_clear(self):
+        self.waves = {}
+        self.pending = []
+
+    def wave_add_generic(self, pulses):
+        self.pending.extend(pulses)
+        return len(self.pending)
+
+    def wave_create(self):
+        wave, self.next_wave = self.next_wave, self.next_wave + 1
+        self.waves[wave], self.pending = self.pending, []
+        return wave
+
+    def wave_send_using_mode(self, wave, mode):
+        self.sent.append(self.waves[wave])
+        return sum(pulse.delay for pulse in self.waves[wave])
+
+    def wave_delete(self, wave):
+        del self.waves[wave]
+
+    def wave_tx_at(self):
+        return pigpio.NO_TX_WAVE
+
+    def wave_tx_busy(self):
+        return 0
+
+    def wave_get_max_pulses(self):
+        return 12000
+
+    def frames(self, pins=(14, 15, 18)):
+        """Decodes the waves sent into a list of frames, each a list of the length of the pulse
+        on each of the ``pins``."""
+
+        frames = []
+        for pulses in self.sent:
+            for pulse in pulses:
+                # every frame starts by switching pins on, or is a single empty pulse
+                if pulse.gpio_on or not pulse.gpio_off:
+                    frames.append([0] * len(pins))
+                    elapsed = 0
+                for n, pin in enumerate(pins):
+                    if pulse.gpio_off & 1 << pin:
+                        frames[-1][n] = elapsed
+                elapsed += pulse.delay
+
+        return frames